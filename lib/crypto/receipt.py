@@ -1,4 +1,5 @@
 import json
+from multiprocessing.pool import ThreadPool
 
 from django.conf import settings
 from django_statsd.clients import statsd
@@ -6,15 +7,53 @@ from django_statsd.clients import statsd
 import commonware.log
 import jwt
 import requests
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
 
 
 log = commonware.log.getLogger('z.crypto')
 
+# The shared signing server session, see get_session.
+_session = None
+
 
 class SigningError(Exception):
     pass
 
 
+def get_session():
+    """
+    Returns the requests session used to talk to the signing server.
+
+    The session is shared by the whole process so that connections to the
+    signing server are kept alive and pooled rather than set up for every
+    receipt. Connection failures and 502, 503 and 504 responses are retried
+    with backoff.
+    """
+    global _session
+    if _session is None:
+        retries = Retry(total=settings.SIGNING_SERVER_RETRIES,
+                        backoff_factor=settings.SIGNING_SERVER_RETRY_BACKOFF,
+                        status_forcelist=[502, 503, 504],
+                        method_whitelist=frozenset(['POST']))
+        adapter = HTTPAdapter(pool_connections=1,
+                              pool_maxsize=settings.SIGNING_SERVER_POOL_SIZE,
+                              max_retries=retries)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _session = session
+    return _session
+
+
+def reset_session():
+    """Closes the pooled connections, a new session is made on next use."""
+    global _session
+    if _session is not None:
+        _session.close()
+    _session = None
+
+
 def sign(receipt):
     """
     Send the receipt to the signing service.
@@ -28,16 +67,15 @@ def sign(receipt):
     destination = settings.SIGNING_SERVER + '/1.0/sign'
     timeout = settings.SIGNING_SERVER_TIMEOUT
 
-    receipt_json = json.dumps(receipt)
-    log.info('Calling service: %s' % destination)
-    log.info('Receipt contents: %s' % receipt_json)
+    log.debug('Calling service: %s' % destination)
     headers = {'Content-Type': 'application/json'}
-    data = receipt if isinstance(receipt, basestring) else receipt_json
+    data = (receipt if isinstance(receipt, basestring)
+            else json.dumps(receipt))
 
     try:
         with statsd.timer('services.sign.receipt'):
-            req = requests.post(destination, data=data, headers=headers,
-                                timeout=timeout)
+            req = get_session().post(destination, data=data, headers=headers,
+                                     timeout=timeout)
     except requests.Timeout:
         statsd.incr('services.sign.receipt.timeout')
         log.error('Posting to receipt signing timed out')
@@ -57,6 +95,27 @@ def sign(receipt):
     return json.loads(req.content)['receipt']
 
 
+def sign_many(receipts):
+    """
+    Send a batch of receipts to the signing service, returns the signed
+    receipts in the same order.
+
+    The signing service only signs one receipt per request, so the receipts
+    are posted concurrently over the pooled session. If any of them fails
+    a SigningError is raised.
+    """
+    receipts = list(receipts)
+    if len(receipts) < 2:
+        return map(sign, receipts)
+
+    pool = ThreadPool(min(len(receipts), settings.SIGNING_SERVER_POOL_SIZE))
+    try:
+        with statsd.timer('services.sign.receipts'):
+            return pool.map(sign, receipts)
+    finally:
+        pool.close()
+
+
 def decode(receipt):
     """
     Decode and verify that the receipt is sound from a crypto point of view.
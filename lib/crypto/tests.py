@@ -14,7 +14,8 @@ from requests import Timeout
 
 import mkt.site.tests
 from lib.crypto import packaged
-from lib.crypto.receipt import crack, sign, SigningError
+from lib.crypto.receipt import (crack, get_session, reset_session, sign,
+                                sign_many, SigningError)
 from mkt.site.fixtures import fixture
 from mkt.versions.models import Version
 from mkt.webapps.models import Webapp
@@ -38,10 +39,14 @@ def mock_sign(version_id, reviewer=False):
     return path
 
 
-@mock.patch('lib.crypto.receipt.requests.post')
+@mock.patch('lib.crypto.receipt.requests.Session.post')
 @mock.patch.object(settings, 'SIGNING_SERVER', 'http://localhost')
 class TestReceipt(mkt.site.tests.TestCase):
 
+    def setUp(self):
+        reset_session()
+        self.addCleanup(reset_session)
+
     def test_called(self, get):
         get.return_value = self.get_response(200)
         sign('my-receipt')
@@ -75,6 +80,39 @@ class TestReceipt(mkt.site.tests.TestCase):
         req.return_value = self.get_response(206)
         sign('x')
 
+    def test_session_reused(self, req):
+        req.return_value = self.get_response(200)
+        session = get_session()
+        sign('x')
+        sign('y')
+        eq_(get_session(), session)
+        eq_(req.call_count, 2)
+
+    @mock.patch.object(settings, 'SIGNING_SERVER_POOL_SIZE', 3)
+    @mock.patch.object(settings, 'SIGNING_SERVER_RETRIES', 4)
+    def test_session_config(self, req):
+        adapter = get_session().get_adapter('https://localhost')
+        eq_(adapter._pool_maxsize, 3)
+        eq_(adapter.max_retries.total, 4)
+        eq_(adapter.max_retries.status_forcelist, [502, 503, 504])
+
+    def test_sign_many(self, req):
+        def response(url, data=None, **kw):
+            return mock.Mock(status_code=200,
+                             content=json.dumps({'receipt': 'signed-' + data}))
+        req.side_effect = response
+        eq_(sign_many(['a', 'b', 'c']), ['signed-a', 'signed-b', 'signed-c'])
+        eq_(req.call_count, 3)
+
+    def test_sign_many_empty(self, req):
+        eq_(sign_many([]), [])
+        assert not req.called
+
+    @raises(SigningError)
+    def test_sign_many_error(self, req):
+        req.return_value = self.get_response(500)
+        sign_many(['a', 'b'])
+
 
 class TestCrack(mkt.site.tests.TestCase):
 
@@ -2,23 +2,29 @@
 Marketplace ElasticSearch Indexer.
 
 Currently creates the indexes and re-indexes apps and feed elements.
+
+The progress of each reindexing is stored in the database, chunk by chunk. If
+it gets interrupted, call the command again with `--resume` to index the
+chunks that are not done yet and switch the aliases.
 """
 import itertools
 import logging
 import sys
 import time
 from math import ceil
+from multiprocessing.pool import ThreadPool
 from optparse import make_option
 
 import elasticsearch
-from celery import chain, chord, task
+from celery import chain, chord, group, task
 
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
 
 import mkt.feed.indexers as f_indexers
-from lib.es.models import Reindexing
-from mkt.site.utils import chunked, timestamp_index
+from lib.es.models import Reindexing, ReindexingChunk
+from mkt.site.utils import chunked_ids, timestamp_index
 from mkt.webapps.indexers import WebappIndexer
 from mkt.websites.indexers import WebsiteIndexer
 
@@ -56,6 +62,15 @@ INDEXER_MAP = dict((indexer.get_mapping_type_name(), indexer)
 
 ES = elasticsearch.Elasticsearch(hosts=settings.ES_HOSTS)
 
+# How many times a chunk is retried before being marked as failed, and how
+# long to wait before the first retry, in seconds. The wait doubles each time.
+CHUNK_RETRIES = 3
+CHUNK_RETRY_DELAY = 10
+
+# How many chunks are indexed in parallel with `--local` when `--concurrency`
+# isn't given.
+LOCAL_CONCURRENCY = 4
+
 
 def _print(msg, alias=''):
     prepend = ''
@@ -114,6 +129,11 @@ def post_index(new_index, old_index, alias, index_name, settings):
         * Output the current alias configuration.
 
     """
+    if not ReindexingChunk.is_finished(alias, new_index):
+        _print('Some chunks failed to index, leaving the alias untouched. '
+               'Run the command again with --resume to retry them.', alias)
+        return
+
     _print('Optimizing, updating settings and aliases.', alias)
 
     # Optimize.
@@ -148,24 +168,126 @@ def post_index(new_index, old_index, alias, index_name, settings):
            '{output}\n'.format(output=alias_output), alias)
 
 
-@task(ignore_result=False)
-def run_indexing(index, index_name, ids):
-    """Index the objects.
+def _index_chunk(chunk_id):
+    """Index the objects of a chunk once. Returns whether it succeeded."""
+    chunk = ReindexingChunk.objects.get(pk=chunk_id)
+    if chunk.status == ReindexingChunk.STATUS_DONE:
+        return True
+
+    indexer = INDEXER_MAP[chunk.index_name]
+    ids = list(indexer.get_indexable()
+               .filter(id__gte=chunk.first_id, id__lte=chunk.last_id)
+               .order_by('id').values_list('id', flat=True))
+
+    chunk.set_status(ReindexingChunk.STATUS_RUNNING)
+    try:
+        if ids:
+            indexer.run_indexing(ids, ES, index=chunk.new_index)
+    except Exception:
+        logger.exception('Failed to index chunk {0}-{1} of {2} '
+                         '(attempt {3})'.format(
+                             chunk.first_id, chunk.last_id, chunk.alias,
+                             chunk.attempts))
+        return False
+    chunk.set_status(ReindexingChunk.STATUS_DONE)
+    return True
+
+
+def _fail_chunk(chunk_id):
+    ReindexingChunk.objects.get(pk=chunk_id).set_status(
+        ReindexingChunk.STATUS_FAILED)
 
-    - index: name of the index
+
+@task(bind=True, ignore_result=False, max_retries=CHUNK_RETRIES)
+def index_chunk(self, chunk_id):
+    """Index the objects of a chunk, retrying up to `max_retries` times.
+
+    Retries are scheduled by celery with a backoff, so a failing chunk
+    doesn't hold the worker meanwhile. A chunk that keeps failing is marked
+    as failed instead of raising, so that the other chunks still get indexed
+    and the reindexing can be resumed.
 
     Note: `ignore_result=False` is required for the chord to work and trigger
     the callback.
 
     """
-    indexer = INDEXER_MAP[index_name]
-    indexer.run_indexing(ids, ES, index=index)
+    if _index_chunk(chunk_id):
+        return
+    retries = self.request.retries
+    if retries < self.max_retries:
+        raise self.retry(countdown=CHUNK_RETRY_DELAY * 2 ** retries)
+    _fail_chunk(chunk_id)
 
 
 def chunk_indexing(indexer, chunk_size):
-    """Chunk the items to index."""
-    chunks = list(indexer.get_indexable().values_list('id', flat=True))
-    return chunked(chunks, chunk_size), len(chunks)
+    """
+    Chunk the items to index. Returns an iterator over the (first id, last id)
+    of each chunk and the total number of items.
+    """
+    qs = indexer.get_indexable()
+    chunks = ((ids[0], ids[-1]) for ids in chunked_ids(qs, chunk_size))
+    return chunks, qs.count()
+
+
+def index_chunk_locally(chunk_id, retries=CHUNK_RETRIES):
+    """Like `index_chunk`, waiting in the current thread between retries."""
+    for attempt in range(retries + 1):
+        if _index_chunk(chunk_id):
+            return
+        if attempt < retries:
+            time.sleep(CHUNK_RETRY_DELAY * 2 ** attempt)
+    _fail_chunk(chunk_id)
+
+
+def _index_chunk_locally(chunk_id):
+    """
+    Run `index_chunk_locally` in a worker thread, which needs its own
+    connection.
+    """
+    try:
+        index_chunk_locally(chunk_id)
+    finally:
+        connection.close()
+
+
+def index_chunks_locally(chunk_ids, concurrency):
+    """Index the chunks in this process, `concurrency` chunks at a time."""
+    pool = ThreadPool(processes=concurrency)
+    try:
+        pool.map(_index_chunk_locally, chunk_ids, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def index_chunks_tasks(chunk_ids, concurrency=None):
+    """
+    Return the celery tasks indexing the chunks. With a `concurrency`, the
+    chunks are split in that many chains, each indexing one chunk at a time.
+    """
+    if not concurrency:
+        return [index_chunk.si(chunk_id) for chunk_id in chunk_ids]
+    lanes = [chunk_ids[i::concurrency] for i in range(concurrency)]
+    return [chain(*[index_chunk.si(chunk_id) for chunk_id in lane])
+            for lane in lanes if lane]
+
+
+def get_index_settings(index):
+    """Return the number of replicas and shards `index` is configured with."""
+    # See how the index is currently configured.
+    if index:
+        try:
+            s = (ES.indices.get_settings(index=index).get(
+                index, {}).get('settings', {}))
+        except elasticsearch.NotFoundError:
+            s = {}
+    else:
+        s = {}
+    num_replicas = s.get('number_of_replicas',
+                         settings.ES_DEFAULT_NUM_REPLICAS)
+    num_shards = s.get('number_of_shards',
+                       settings.ES_DEFAULT_NUM_SHARDS)
+    return num_replicas, num_shards
 
 
 class Command(BaseCommand):
@@ -181,6 +303,17 @@ class Command(BaseCommand):
                     help=('Bypass the database flag that says '
                           'another indexation is ongoing'),
                     default=False),
+        make_option('--resume', action='store_true',
+                    help=('Resume the ongoing indexation, indexing the '
+                          'chunks that are not done yet'),
+                    default=False),
+        make_option('--concurrency', action='store', type='int',
+                    help='How many chunks to index at the same time',
+                    default=None),
+        make_option('--local', action='store_true',
+                    help=('Index in this process with a pool of threads '
+                          'instead of using celery'),
+                    default=False),
     )
 
     def handle(self, *args, **kwargs):
@@ -192,6 +325,9 @@ class Command(BaseCommand):
         index_choice = kwargs.get('index', None)
         prefix = kwargs.get('prefix', '')
         force = kwargs.get('force', False)
+        resume = kwargs.get('resume', False)
+        self.concurrency = kwargs.get('concurrency', None)
+        self.local = kwargs.get('local', False)
 
         if index_choice:
             # If we only want to reindex a subset of indexes.
@@ -203,9 +339,15 @@ class Command(BaseCommand):
         else:
             INDEXES = INDEXERS
 
+        if resume:
+            for INDEXER in INDEXES:
+                self.resume(INDEXER)
+            _print('Remaining indexing tasks all queued up.')
+            return
+
         if Reindexing.is_reindexing() and not force:
             raise CommandError('Indexation already occuring - use --force to '
-                               'bypass')
+                               'bypass or --resume to continue it')
         elif force:
             Reindexing.unflag_reindexing()
 
@@ -233,19 +375,12 @@ class Command(BaseCommand):
             # Create a new index, using the index name with a timestamp.
             new_index = timestamp_index(prefix + alias)
 
-            # See how the index is currently configured.
-            if old_index:
-                try:
-                    s = (ES.indices.get_settings(index=old_index).get(
-                        old_index, {}).get('settings', {}))
-                except elasticsearch.NotFoundError:
-                    s = {}
-            else:
-                s = {}
-            num_replicas = s.get('number_of_replicas',
-                                 settings.ES_DEFAULT_NUM_REPLICAS)
-            num_shards = s.get('number_of_shards',
-                               settings.ES_DEFAULT_NUM_SHARDS)
+            num_replicas, num_shards = get_index_settings(old_index)
+
+            # Store the chunks so that we can resume if something goes wrong.
+            chunk_ids = list(ReindexingChunk.create_chunks(
+                alias, index_name, new_index, chunks)
+                .order_by('first_id').values_list('id', flat=True))
 
             pre_task = pre_index.si(new_index, old_index, alias, index_name, {
                 'analysis': INDEXER.get_analysis(),
@@ -258,22 +393,56 @@ class Command(BaseCommand):
                                       {'number_of_replicas': num_replicas,
                                        'refresh_interval': '5s'})
 
-            # Ship it.
-            if not total:
-                # If there's no data we still create the index and alias.
-                chain(pre_task, post_task).apply_async()
-            else:
-                index_tasks = [run_indexing.si(new_index, index_name, chunk)
-                               for chunk in chunks]
-
-                if settings.CELERY_ALWAYS_EAGER:
-                    # Eager mode and chords don't get along. So we serialize
-                    # the tasks as a workaround.
-                    index_tasks.insert(0, pre_task)
-                    index_tasks.append(post_task)
-                    chain(*index_tasks).apply_async()
-                else:
-                    chain(pre_task, chord(header=index_tasks,
-                                          body=post_task)).apply_async()
+            self.run_tasks(pre_task, chunk_ids, post_task)
 
         _print('New index and indexing tasks all queued up.')
+
+    def resume(self, INDEXER):
+        """Index the unfinished chunks of an interrupted reindexing."""
+        index_name = INDEXER.get_mapping_type_name()
+        alias = ES_INDEXES[index_name]
+
+        try:
+            reindexing = Reindexing.objects.get(alias=alias)
+        except Reindexing.DoesNotExist:
+            _print('No indexation to resume.', alias)
+            return
+
+        chunk_ids = list(ReindexingChunk.get_unfinished(
+            alias, reindexing.new_index).values_list('id', flat=True))
+        _print('Resuming indexation into {index}, {n} chunks left.'
+               .format(index=reindexing.new_index, n=len(chunk_ids)), alias)
+
+        num_replicas, _ = get_index_settings(reindexing.old_index)
+        post_task = post_index.si(
+            reindexing.new_index, reindexing.old_index, alias, index_name,
+            {'number_of_replicas': num_replicas, 'refresh_interval': '5s'})
+
+        self.run_tasks(None, chunk_ids, post_task)
+
+    def run_tasks(self, pre_task, chunk_ids, post_task):
+        """
+        Run `pre_task` (if any), index the chunks then run `post_task`, either
+        in this process or by queuing celery tasks.
+        """
+        if self.local:
+            if pre_task:
+                pre_task()
+            index_chunks_locally(chunk_ids,
+                                 self.concurrency or LOCAL_CONCURRENCY)
+            post_task()
+            return
+
+        pre_tasks = [pre_task] if pre_task else []
+        if not chunk_ids:
+            # If there's no data we still create the index and alias.
+            chain(*(pre_tasks + [post_task])).apply_async()
+        elif settings.CELERY_ALWAYS_EAGER:
+            # Eager mode and chords don't get along. So we serialize
+            # the tasks as a workaround.
+            index_tasks = [index_chunk.si(chunk_id) for chunk_id in chunk_ids]
+            chain(*(pre_tasks + index_tasks + [post_task])).apply_async()
+        else:
+            index_tasks = index_chunks_tasks(chunk_ids, self.concurrency)
+            chain(*(pre_tasks + [chord(header=group(index_tasks),
+                                       body=post_task)])).apply_async()
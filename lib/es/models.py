@@ -30,9 +30,12 @@ class Reindexing(models.Model):
     def unflag_reindexing(cls, alias=None):
         """Mark down that we are done reindexing"""
         qs = cls.objects.all()
+        chunks = ReindexingChunk.objects.all()
         if alias:
             qs = qs.filter(alias=alias)
+            chunks = chunks.filter(alias=alias)
         qs.delete()
+        chunks.delete()
 
     @classmethod
     def get_indices(cls, alias):
@@ -47,3 +50,66 @@ class Reindexing(models.Model):
                     if idx is not None]
         except Reindexing.DoesNotExist:
             return [alias]
+
+
+class ReindexingChunk(models.Model):
+    """
+    Progress of a reindexing: each row is a range of ids to index into the
+    new index. Rows are kept until the reindexing is unflagged, so that an
+    interrupted reindexing can be resumed with the chunks that aren't done.
+    """
+    STATUS_PENDING = 0
+    STATUS_RUNNING = 1
+    STATUS_DONE = 2
+    STATUS_FAILED = 3
+
+    alias = models.CharField(max_length=255)
+    index_name = models.CharField(max_length=255)
+    new_index = models.CharField(max_length=255)
+    first_id = models.PositiveIntegerField()
+    last_id = models.PositiveIntegerField()
+    status = models.PositiveSmallIntegerField(default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    modified = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'zadmin_reindexing_chunk'
+        index_together = (('alias', 'status'),)
+
+    @classmethod
+    def create_chunks(cls, alias, index_name, new_index, id_ranges):
+        """Store a pending chunk for each (first_id, last_id) range."""
+        cls.objects.bulk_create([
+            cls(alias=alias, index_name=index_name, new_index=new_index,
+                first_id=first_id, last_id=last_id)
+            for first_id, last_id in id_ranges])
+        return cls.objects.filter(alias=alias, new_index=new_index)
+
+    @classmethod
+    def get_unfinished(cls, alias, new_index):
+        """
+        Return the chunks of the reindexing of `alias` into `new_index` that
+        still need to be indexed, resetting them to pending.
+
+        Running chunks are included: this is meant to be called when resuming
+        a reindexing, after the process indexing them is gone.
+        """
+        qs = cls.objects.filter(alias=alias, new_index=new_index).exclude(
+            status=cls.STATUS_DONE).order_by('first_id')
+        qs.update(status=cls.STATUS_PENDING)
+        return qs
+
+    @classmethod
+    def is_finished(cls, alias, new_index):
+        """
+        Return True if every chunk of the reindexing of `alias` into
+        `new_index` has been indexed.
+        """
+        return not (cls.objects.filter(alias=alias, new_index=new_index)
+                               .exclude(status=cls.STATUS_DONE).exists())
+
+    def set_status(self, status):
+        self.status = status
+        if status == self.STATUS_RUNNING:
+            self.attempts += 1
+        self.save()
@@ -0,0 +1,85 @@
+import mock
+from celery.exceptions import Retry
+from nose.tools import eq_
+
+import mkt.site.tests
+from lib.es.management.commands import reindex
+from lib.es.models import ReindexingChunk
+from mkt.webapps.models import Webapp
+
+
+@mock.patch.object(reindex, 'CHUNK_RETRY_DELAY', 0)
+class TestIndexChunk(mkt.site.tests.TestCase):
+
+    def setUp(self):
+        self.apps = [mkt.site.tests.app_factory() for i in range(3)]
+        ids = sorted(app.pk for app in self.apps)
+        self.chunk = ReindexingChunk.create_chunks(
+            'apps', 'webapp', 'apps-new', [(ids[0], ids[1])])[0]
+        self.indexer = mock.Mock()
+        self.indexer.get_indexable.return_value = Webapp.with_deleted.all()
+        patcher = mock.patch.dict(reindex.INDEXER_MAP,
+                                  {'webapp': self.indexer})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_chunk(self):
+        return ReindexingChunk.objects.get(pk=self.chunk.pk)
+
+    def test_index_chunk(self):
+        reindex.index_chunk.apply(args=[self.chunk.pk])
+        ids = sorted(app.pk for app in self.apps)[:2]
+        self.indexer.run_indexing.assert_called_once_with(
+            ids, reindex.ES, index='apps-new')
+        eq_(self.get_chunk().status, ReindexingChunk.STATUS_DONE)
+        eq_(self.get_chunk().attempts, 1)
+
+    def test_index_chunk_done(self):
+        self.chunk.set_status(ReindexingChunk.STATUS_DONE)
+        reindex.index_chunk.apply(args=[self.chunk.pk])
+        assert not self.indexer.run_indexing.called
+
+    @mock.patch.object(reindex.index_chunk, 'max_retries', 2)
+    def test_index_chunk_retry(self):
+        self.indexer.run_indexing.side_effect = [Exception, None]
+        reindex.index_chunk.apply(args=[self.chunk.pk])
+        eq_(self.indexer.run_indexing.call_count, 2)
+        eq_(self.get_chunk().status, ReindexingChunk.STATUS_DONE)
+        eq_(self.get_chunk().attempts, 2)
+
+    @mock.patch.object(reindex.index_chunk, 'max_retries', 2)
+    def test_index_chunk_failed(self):
+        self.indexer.run_indexing.side_effect = Exception
+        reindex.index_chunk.apply(args=[self.chunk.pk])
+        eq_(self.indexer.run_indexing.call_count, 3)
+        eq_(self.get_chunk().status, ReindexingChunk.STATUS_FAILED)
+        eq_(self.get_chunk().attempts, 3)
+
+    @mock.patch.object(reindex, 'CHUNK_RETRY_DELAY', 10)
+    @mock.patch.object(reindex.index_chunk, 'retry')
+    def test_index_chunk_retry_countdown(self, retry):
+        retry.return_value = Retry()
+        self.indexer.run_indexing.side_effect = Exception
+        reindex.index_chunk.apply(args=[self.chunk.pk])
+        retry.assert_called_once_with(countdown=10)
+        eq_(self.get_chunk().status, ReindexingChunk.STATUS_RUNNING)
+
+    @mock.patch.object(reindex.time, 'sleep')
+    def test_index_chunk_locally(self, sleep):
+        self.indexer.run_indexing.side_effect = Exception
+        reindex.index_chunk_locally(self.chunk.pk, retries=2)
+        eq_(self.indexer.run_indexing.call_count, 3)
+        eq_(sleep.call_count, 2)
+        eq_(self.get_chunk().status, ReindexingChunk.STATUS_FAILED)
+
+
+class TestIndexChunksTasks(mkt.site.tests.TestCase):
+
+    def test_unbounded(self):
+        eq_(len(reindex.index_chunks_tasks([1, 2, 3, 4, 5])), 5)
+
+    def test_concurrency(self):
+        tasks = reindex.index_chunks_tasks([1, 2, 3, 4, 5], concurrency=2)
+        eq_(len(tasks), 2)
+        eq_([t.args for t in tasks[0].tasks], [(1,), (3,), (5,)])
+        eq_([t.args for t in tasks[1].tasks], [(2,), (4,)])
@@ -1,7 +1,7 @@
 from nose.tools import eq_
 
 import mkt.site.tests
-from lib.es.models import Reindexing
+from lib.es.models import Reindexing, ReindexingChunk
 
 
 class TestReindexing(mkt.site.tests.TestCase):
@@ -61,3 +61,56 @@ class TestReindexing(mkt.site.tests.TestCase):
 
         # Doesn't clash on other aliases.
         self.assertSetEqual(Reindexing.get_indices('other'), ['other'])
+
+    def test_unflag_reindexing_removes_chunks(self):
+        Reindexing.objects.create(alias='foo', new_index='bar',
+                                  old_index='baz')
+        ReindexingChunk.create_chunks('foo', 'webapp', 'bar', [(1, 10)])
+        ReindexingChunk.create_chunks('other', 'webapp', 'bar', [(1, 10)])
+
+        Reindexing.unflag_reindexing(alias='foo')
+        assert not ReindexingChunk.objects.filter(alias='foo').exists()
+        assert ReindexingChunk.objects.filter(alias='other').exists()
+
+
+class TestReindexingChunk(mkt.site.tests.TestCase):
+
+    def test_create_chunks(self):
+        chunks = ReindexingChunk.create_chunks(
+            'foo', 'webapp', 'bar', [(1, 10), (11, 20)])
+        eq_(sorted(chunks.values_list('first_id', 'last_id')),
+            [(1, 10), (11, 20)])
+        eq_(set(chunks.values_list('status', flat=True)),
+            set([ReindexingChunk.STATUS_PENDING]))
+
+    def test_set_status(self):
+        chunk = ReindexingChunk.create_chunks(
+            'foo', 'webapp', 'bar', [(1, 10)])[0]
+        chunk.set_status(ReindexingChunk.STATUS_RUNNING)
+        chunk.set_status(ReindexingChunk.STATUS_FAILED)
+        chunk.set_status(ReindexingChunk.STATUS_RUNNING)
+        chunk = ReindexingChunk.objects.get(pk=chunk.pk)
+        eq_(chunk.status, ReindexingChunk.STATUS_RUNNING)
+        eq_(chunk.attempts, 2)
+
+    def test_get_unfinished(self):
+        chunks = list(ReindexingChunk.create_chunks(
+            'foo', 'webapp', 'bar', [(1, 10), (11, 20), (21, 30)])
+            .order_by('first_id'))
+        chunks[0].set_status(ReindexingChunk.STATUS_DONE)
+        chunks[1].set_status(ReindexingChunk.STATUS_RUNNING)
+        chunks[2].set_status(ReindexingChunk.STATUS_FAILED)
+        # Chunks from another reindexing are ignored.
+        ReindexingChunk.create_chunks('foo', 'webapp', 'old', [(1, 10)])
+
+        unfinished = ReindexingChunk.get_unfinished('foo', 'bar')
+        eq_([c.pk for c in unfinished], [chunks[1].pk, chunks[2].pk])
+        eq_(set(c.status for c in unfinished),
+            set([ReindexingChunk.STATUS_PENDING]))
+
+    def test_is_finished(self):
+        chunk = ReindexingChunk.create_chunks(
+            'foo', 'webapp', 'bar', [(1, 10)])[0]
+        assert not ReindexingChunk.is_finished('foo', 'bar')
+        chunk.set_status(ReindexingChunk.STATUS_DONE)
+        assert ReindexingChunk.is_finished('foo', 'bar')
@@ -0,0 +1,13 @@
+CREATE TABLE `zadmin_reindexing_chunk` (
+    `id` int(11) NOT NULL AUTO_INCREMENT,
+    `alias` varchar(255) NOT NULL,
+    `index_name` varchar(255) NOT NULL,
+    `new_index` varchar(255) NOT NULL,
+    `first_id` int(11) unsigned NOT NULL,
+    `last_id` int(11) unsigned NOT NULL,
+    `status` smallint unsigned NOT NULL DEFAULT 0,
+    `attempts` smallint unsigned NOT NULL DEFAULT 0,
+    `modified` datetime NOT NULL,
+    PRIMARY KEY (`id`),
+    KEY `zadmin_reindexing_chunk_alias_status` (`alias`, `status`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
@@ -1,4 +1,6 @@
 from django import dispatch
+from django.conf import settings
+from django.core.cache import cache
 from django.db import models
 from django.db.models import signals
 
@@ -35,9 +37,37 @@ class GroupUser(models.Model):
         unique_together = ('group', 'user')
 
 
+def _group_names_cache_key(user_id):
+    return 'access:group-names:%s' % user_id
+
+
+def get_group_names(user_id):
+    """
+    Returns the names of the groups of a user, cached for
+    settings.API_OAUTH_CACHE_TIMEOUT since the API checks them on every
+    authenticated request.
+    """
+    cache_key = _group_names_cache_key(user_id)
+    names = cache.get(cache_key)
+    if names is None:
+        names = list(Group.objects.no_cache().filter(users=user_id)
+                     .values_list('name', flat=True))
+        cache.set(cache_key, names, settings.API_OAUTH_CACHE_TIMEOUT)
+    return names
+
+
+@dispatch.receiver(signals.post_save, sender=Group,
+                   dispatch_uid='group.post_save')
+def group_post_save(sender, instance, **kw):
+    # The group may have been renamed.
+    cache.delete_many([_group_names_cache_key(user_id) for user_id in
+                       instance.users.values_list('id', flat=True)])
+
+
 @dispatch.receiver(signals.post_save, sender=GroupUser,
                    dispatch_uid='groupuser.post_save')
 def groupuser_post_save(sender, instance, **kw):
+    cache.delete(_group_names_cache_key(instance.user_id))
     if kw.get('raw'):
         return
 
@@ -48,6 +78,7 @@ def groupuser_post_save(sender, instance, **kw):
 @dispatch.receiver(signals.post_delete, sender=GroupUser,
                    dispatch_uid='groupuser.post_delete')
 def groupuser_post_delete(sender, instance, **kw):
+    cache.delete(_group_names_cache_key(instance.user_id))
     if kw.get('raw'):
         return
 
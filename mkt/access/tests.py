@@ -2,7 +2,7 @@ from django.contrib.auth.models import AnonymousUser
 from django.http import HttpRequest
 
 import mock
-from nose.tools import assert_false
+from nose.tools import assert_false, eq_
 
 import mkt
 import mkt.site.tests
@@ -12,6 +12,7 @@ from mkt.users.models import UserProfile
 
 from .acl import (action_allowed, check_addon_ownership, check_ownership,
                   check_reviewer, match_rules)
+from .models import get_group_names, Group, GroupUser
 
 
 class ACLTestCase(mkt.site.tests.TestCase):
@@ -188,3 +189,31 @@ class TestCheckReviewer(mkt.site.tests.TestCase):
         self.grant_permission(self.user, 'Apps:Review')
         req = mkt.site.tests.req_factory_factory('noop', user=self.user)
         assert check_reviewer(req)
+
+
+class TestGetGroupNames(mkt.site.tests.TestCase):
+    fixtures = fixture('user_999')
+
+    def setUp(self):
+        self.user = UserProfile.objects.get(pk=999)
+
+    def test_group_names(self):
+        eq_(get_group_names(self.user.pk), [])
+        group = self.grant_permission(self.user, 'Apps:Review', name='Foo')
+        eq_(get_group_names(self.user.pk), ['Foo'])
+
+        Group.objects.filter(pk=group.pk).update(name='Bar')
+        # Without a post_save, the names are still cached.
+        eq_(get_group_names(self.user.pk), ['Foo'])
+        Group.objects.no_cache().get(pk=group.pk).save()
+        eq_(get_group_names(self.user.pk), ['Bar'])
+
+        GroupUser.objects.filter(user=self.user).delete()
+        eq_(get_group_names(self.user.pk), [])
+
+    def test_group_deleted(self):
+        group = Group.objects.create(name='Foo', rules='Apps:Review')
+        GroupUser.objects.create(group=group, user=self.user)
+        eq_(get_group_names(self.user.pk), ['Foo'])
+        group.delete()
+        eq_(get_group_names(self.user.pk), [])
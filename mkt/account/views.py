@@ -44,7 +44,7 @@ from mkt.constants.apps import INSTALL_TYPE_USER
 from mkt.site.mail import send_mail_jinja
 from mkt.site.utils import log_cef
 from mkt.webapps.serializers import SimpleAppSerializer
-from mkt.webapps.models import Installed, Webapp
+from mkt.webapps.models import Installed, preload_translations, Webapp
 
 
 log = commonware.log.getLogger('z.account')
@@ -80,7 +80,7 @@ class InstalledViewSet(CORSMixin, MarketplaceView, ListModelMixin,
         return Webapp.objects.no_cache().filter(
             installed__user=self.request.user,
             installed__install_type=INSTALL_TYPE_USER).order_by(
-                '-installed__created')
+                '-installed__created').transform(preload_translations)
 
     def remove_app(self, request, **kwargs):
         self.cors_allowed_methods = ['post']
@@ -1,6 +1,9 @@
 import functools
 
+from django.core.paginator import InvalidPage
 from django.db.models.sql import EmptyResultSet
+from django.http import Http404
+from django.utils.http import urlencode
 
 import commonware.log
 from rest_framework.decorators import api_view
@@ -128,14 +131,24 @@ class MarketplaceView(object):
 
     - A implementation of paginate_queryset() that goes with our custom
       pagination handler. It does tastypie-like offset pagination instead of
-      the default page mechanism.
+      the default page mechanism, or follows the `cursor` parameter on views
+      with `cursor_pagination` (see ESPaginator.cursor_page()).
     """
+    # Every walk through the results with a cursor keeps an ES scroll context
+    # open, only enable it on views restricted to authenticated users.
+    cursor_pagination = False
+
     def handle_exception(self, exc):
         exc._request = self.request._request
         exc._klass = self.__class__
         return super(MarketplaceView, self).handle_exception(exc)
 
     def paginate_queryset(self, queryset, page_size=None):
+        cursor = self.request.QUERY_PARAMS.get('cursor')
+        if (cursor is not None and page_size is None and
+                self.cursor_pagination):
+            return self.paginate_queryset_by_cursor(queryset, cursor)
+
         page = self.request.QUERY_PARAMS.get(self.page_kwarg)
         offset = self.request.QUERY_PARAMS.get('offset')
 
@@ -151,6 +164,29 @@ class MarketplaceView(object):
         return super(MarketplaceView, self).paginate_queryset(
             queryset, page_size=page_size)
 
+    def paginate_queryset_by_cursor(self, queryset, cursor):
+        page_size = self.get_paginate_by()
+        if not page_size:
+            return None
+        paginator = self.paginator_class(queryset, page_size)
+        try:
+            return paginator.cursor_page(cursor, self.get_cursor_scope())
+        except InvalidPage as exc:
+            raise Http404('Invalid cursor: %s' % exc)
+
+    def get_cursor_scope(self):
+        """
+        Returns what the cursors of this view are bound to: the view and its
+        query parameters, pagination ones aside, so that a cursor can't be
+        followed from another view or with other filters.
+        """
+        params = sorted((key, sorted(values)) for key, values
+                        in self.request.QUERY_PARAMS.lists()
+                        if key not in ('cursor', 'offset', self.page_kwarg))
+        return '%s.%s:%s' % (self.__class__.__module__,
+                             self.__class__.__name__,
+                             urlencode(params, doseq=True))
+
     def get_region_from_request(self, request):
         """
         Returns the REGION object for the passed request. If the GET param
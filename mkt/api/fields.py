@@ -9,6 +9,7 @@ from rest_framework import fields, serializers
 from rest_framework.compat import smart_text
 
 from mkt.submit.helpers import string_to_translatedfield_value
+from mkt.translations.models import convert_translation, load_translations
 from mkt.translations.utils import to_language
 
 
@@ -107,8 +108,10 @@ class TranslationSerializerField(fields.WritableField):
             self.requested_language = request.GET['lang']
 
     def fetch_all_translations(self, obj, source, field):
-        translations = field.__class__.objects.filter(
-            id=field.id, localized_string__isnull=False)
+        # Translations preloaded for the request (e.g. by a transform on the
+        # queryset) are re-used, otherwise they are fetched now.
+        translations = [convert_translation(trans, field.__class__) for trans
+                        in load_translations([field.id])[field.id]]
         return dict((to_language(trans.locale), unicode(trans))
                     for trans in translations) if translations else None
 
@@ -22,7 +22,8 @@ from multidb.middleware import PinningRouterMiddleware
 from oauthlib.common import Request
 from oauthlib.oauth1.rfc5849 import signature
 
-from mkt.api.models import Access, ACCESS_TOKEN, Token
+from mkt.access.models import get_group_names
+from mkt.api.models import get_access_credentials, get_access_tokens
 from mkt.api.oauth import server, validator
 from mkt.carriers import get_carrier
 from mkt.users.models import UserProfile
@@ -72,11 +73,13 @@ class RestOAuthMiddleware(object):
             # This is 3-legged OAuth.
             log.info('Trying 3 legged OAuth')
             try:
-                valid, oauth_req = server.validate_protected_resource_request(
-                    request.build_absolute_uri(),
-                    http_method=method,
-                    body=request.body,
-                    headers=auth_header)
+                with statsd.timer('api.oauth.validate'):
+                    valid, oauth_req = (
+                        server.validate_protected_resource_request(
+                            request.build_absolute_uri(),
+                            http_method=method,
+                            body=request.body,
+                            headers=auth_header))
             except ValueError:
                 log.warning('ValueError on verifying_request', exc_info=True)
                 return
@@ -84,35 +87,34 @@ class RestOAuthMiddleware(object):
                 log.warning(u'Cannot find APIAccess token with that key: %s'
                             % oauth_req.attempted_key)
                 return
-            uid = Token.objects.filter(
-                token_type=ACCESS_TOKEN,
-                key=oauth_req.resource_owner_key).values_list(
-                    'user_id', flat=True)[0]
-            request.user = UserProfile.objects.select_related(
-                'user').get(pk=uid)
+            uid = [user_id for creds, user_id, secret in
+                   get_access_tokens(oauth_req.resource_owner_key)
+                   if creds == oauth_req.client_key][0]
+            with statsd.timer('api.oauth.user'):
+                request.user = UserProfile.objects.get(pk=uid)
         else:
             # This is 2-legged OAuth.
             log.info('Trying 2 legged OAuth')
             try:
-                client_key = validate_2legged_oauth(
-                    server,
-                    request.build_absolute_uri(),
-                    method, auth_header)
+                with statsd.timer('api.oauth.validate'):
+                    client_key = validate_2legged_oauth(
+                        server,
+                        request.build_absolute_uri(),
+                        method, auth_header)
             except TwoLeggedOAuthError, e:
                 log.warning(str(e))
                 return
             except ValueError:
                 log.warning('ValueError on verifying_request', exc_info=True)
                 return
-            uid = Access.objects.filter(
-                key=client_key).values_list(
-                    'user_id', flat=True)[0]
-            request.user = UserProfile.objects.select_related(
-                'user').get(pk=uid)
+            uid = get_access_credentials(client_key)[0]
+            with statsd.timer('api.oauth.user'):
+                request.user = UserProfile.objects.get(pk=uid)
 
         # But you cannot have one of these roles.
         denied_groups = set(['Admins'])
-        roles = set(request.user.groups.values_list('name', flat=True))
+        with statsd.timer('api.oauth.groups'):
+            roles = set(get_group_names(request.user.pk))
         if roles and roles.intersection(denied_groups):
             log.info(u'Attempt to use API with denied role, user: %s'
                      % request.user.pk)
@@ -1,9 +1,18 @@
+import hashlib
+import threading
 import time
 
+from django import dispatch
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import request_finished
 from django.db import models
+from django.db.models import signals
 from django.utils.crypto import get_random_string
+from django.utils.encoding import smart_str
 
 from aesfield.field import AESField
+from celery.signals import task_postrun
 
 from mkt.site.models import ModelBase
 from mkt.users.models import UserProfile
@@ -13,6 +22,10 @@ REQUEST_TOKEN = 0
 ACCESS_TOKEN = 1
 TOKEN_TYPES = ((REQUEST_TOKEN, u'Request'), (ACCESS_TOKEN, u'Access'))
 
+# The OAuth cache keys invalidated during the calling thread's request or
+# task, invalidated again once it is over.
+_oauth_local = threading.local()
+
 
 class Access(ModelBase):
     key = models.CharField(max_length=255, unique=True)
@@ -61,6 +74,83 @@ class Token(ModelBase):
             user=user)
 
 
+def _oauth_cache_key(kind, key):
+    return 'api:oauth:%s:%s' % (kind, hashlib.md5(smart_str(key)).hexdigest())
+
+
+def get_access_credentials(key):
+    """
+    Returns the (user id, secret) of the Access with that client key, or None
+    if there is none. Cached for settings.API_OAUTH_CACHE_TIMEOUT, misses
+    included, so that valid and invalid keys take the same code path.
+
+    Only the encrypted secret is cached, it's decrypted on every call.
+    """
+    cache_key = _oauth_cache_key('access', key)
+    credentials = cache.get(cache_key)
+    if credentials is None:
+        # values_list() leaves the secret encrypted.
+        credentials = tuple(Access.objects.no_cache().filter(key=key)
+                            .values_list('user_id', 'secret')[:1])
+        cache.set(cache_key, credentials, settings.API_OAUTH_CACHE_TIMEOUT)
+    if not credentials:
+        return None
+    user_id, secret = credentials[0]
+    return user_id, Access._meta.get_field('secret').to_python(secret)
+
+
+def get_access_tokens(key):
+    """
+    Returns the (client key, user id, secret) of the access tokens with that
+    key. Cached like get_access_credentials().
+    """
+    cache_key = _oauth_cache_key('token', key)
+    tokens = cache.get(cache_key)
+    if tokens is None:
+        tokens = list(Token.objects.no_cache()
+                      .filter(token_type=ACCESS_TOKEN, key=key)
+                      .values_list('creds__key', 'user_id', 'secret'))
+        cache.set(cache_key, tokens, settings.API_OAUTH_CACHE_TIMEOUT)
+    return tokens
+
+
+@dispatch.receiver(signals.post_save, sender=Access,
+                   dispatch_uid='access_invalidate_oauth_cache')
+@dispatch.receiver(signals.post_delete, sender=Access,
+                   dispatch_uid='access_delete_invalidate_oauth_cache')
+def invalidate_access_credentials(sender, instance, **kw):
+    keys = Token.objects.filter(creds=instance).values_list('key', flat=True)
+    _invalidate_oauth_cache([_oauth_cache_key('access', instance.key)] +
+                            [_oauth_cache_key('token', key) for key in keys])
+
+
+@dispatch.receiver(signals.post_save, sender=Token,
+                   dispatch_uid='token_invalidate_oauth_cache')
+@dispatch.receiver(signals.post_delete, sender=Token,
+                   dispatch_uid='token_delete_invalidate_oauth_cache')
+def invalidate_access_tokens(sender, instance, **kw):
+    _invalidate_oauth_cache([_oauth_cache_key('token', instance.key)])
+
+
+def _invalidate_oauth_cache(cache_keys):
+    cache.delete_many(cache_keys)
+    # The change is only committed at the end of the request: another request
+    # could cache the old credentials in between, so delete them again then.
+    _oauth_local.__dict__.setdefault('cache_keys', set()).update(cache_keys)
+
+
+def _oauth_cache_done(**kwargs):
+    cache_keys = _oauth_local.__dict__.pop('cache_keys', None)
+    if cache_keys:
+        cache.delete_many(list(cache_keys))
+
+
+request_finished.connect(_oauth_cache_done,
+                         dispatch_uid='request_finished_oauth_cache')
+task_postrun.connect(_oauth_cache_done,
+                     dispatch_uid='task_postrun_oauth_cache')
+
+
 class Nonce(ModelBase):
     nonce = models.CharField(max_length=128)
     timestamp = models.IntegerField()
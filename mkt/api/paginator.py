@@ -1,8 +1,15 @@
 import urlparse
 
-from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.conf import settings
+from django.core import signing
+from django.core.paginator import (EmptyPage, InvalidPage, Page,
+                                   PageNotAnInteger, Paginator)
 from django.utils.http import urlencode
 
+from elasticsearch.exceptions import NotFoundError
+from elasticsearch_dsl.connections import connections
+from elasticsearch_dsl.result import Response
+from elasticsearch_dsl.search import Search
 from rest_framework import pagination, serializers
 
 
@@ -59,6 +66,72 @@ class ESPaginator(Paginator):
 
         return page
 
+    def cursor_page(self, cursor, scope=''):
+        """
+        Returns a page object for the given cursor: an empty string for the
+        first page, then the `next_cursor` of the previous page.
+
+        Unlike page(), which makes ES sort the top `offset + per_page` hits on
+        every shard, the pages are read from a scroll context kept open on ES
+        for settings.ES_SCROLL_TIMEOUT between two pages, so every page costs
+        the same at any depth. Each cursor can only be followed once.
+
+        Cursors are signed along with `scope`, a string identifying the search
+        they come from: a cursor is rejected for any other scope.
+        """
+        if not isinstance(self.object_list, Search):
+            raise InvalidPage('Cursors are not supported here')
+        es = connections.get_connection(self.object_list._using)
+        salt = 'mkt.api.paginator.cursor:%s' % scope
+        if not cursor:
+            offset = 0
+            result = self.object_list.params(
+                scroll=settings.ES_SCROLL_TIMEOUT)[:self.per_page].execute()
+        else:
+            try:
+                offset, scroll_id = signing.loads(cursor, salt=salt)
+            except (signing.BadSignature, TypeError, ValueError):
+                raise InvalidPage('That cursor is not valid')
+            try:
+                result = Response(
+                    es.scroll(scroll_id=scroll_id,
+                              scroll=settings.ES_SCROLL_TIMEOUT),
+                    callbacks=self.object_list._doc_type_map)
+            except NotFoundError:
+                raise InvalidPage('That cursor has expired')
+
+        hits = result.hits
+        self._count = hits.total
+        next_offset = offset + len(hits)
+        if len(hits) == self.per_page and next_offset < self._count:
+            next_cursor = signing.dumps([next_offset, result._scroll_id],
+                                        salt=salt, compress=True)
+        else:
+            # That was the last page, free the scroll context right away.
+            next_cursor = None
+            try:
+                es.clear_scroll(scroll_id=result._scroll_id)
+            except NotFoundError:
+                pass
+        return CursorPage(hits, offset, next_cursor, self)
+
+
+class CursorPage(Page):
+    """
+    A page returned by ESPaginator.cursor_page(). It only links to the next
+    page, through `next_cursor`.
+    """
+    def __init__(self, object_list, offset, next_cursor, paginator):
+        number = offset / paginator.per_page + 1
+        super(CursorPage, self).__init__(object_list, number, paginator)
+        self.next_cursor = next_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return False
+
 
 class MetaSerializer(serializers.Serializer):
     """
@@ -90,9 +163,21 @@ class MetaSerializer(serializers.Serializer):
         request_data = request and request.GET.dict() or {}
         return self.replace_query_params(url, request_data, params)
 
+    def get_cursor_link(self, cursor):
+        request = self.context.get('request')
+        url = request and request.get_full_path() or ''
+        request_data = request and request.GET.dict() or {}
+        # The cursor replaces the offset-based pagination parameters.
+        for param in ('offset', 'page'):
+            request_data.pop(param, None)
+        return self.replace_query_params(url, request_data,
+                                         {'cursor': cursor})
+
     def get_next(self, page):
         if not page.has_next():
             return None
+        if isinstance(page, CursorPage):
+            return self.get_cursor_link(page.next_cursor)
         return self.get_offset_link_for_page(page, page.next_page_number())
 
     def get_previous(self, page):
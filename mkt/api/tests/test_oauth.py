@@ -5,6 +5,8 @@ from functools import partial
 
 from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.signals import request_finished
 from django.core.urlresolvers import reverse
 from django.test.client import RequestFactory
 from django.utils.encoding import iri_to_uri, smart_str
@@ -18,7 +20,9 @@ from rest_framework.request import Request
 
 from mkt.api import authentication
 from mkt.api.middleware import RestOAuthMiddleware
-from mkt.api.models import Access, ACCESS_TOKEN, REQUEST_TOKEN, Token
+from mkt.api.models import (_oauth_cache_key, Access, ACCESS_TOKEN,
+                            get_access_credentials, get_access_tokens,
+                            REQUEST_TOKEN, Token)
 from mkt.api.tests import BaseAPI
 from mkt.site.fixtures import fixture
 from mkt.site.helpers import absolutify
@@ -369,3 +373,82 @@ class Test2LeggedOAuthFlow(TestCase):
         RestOAuthMiddleware().process_request(req)
         ok_(not auth.authenticate(Request(req)))
         ok_(not req.user.is_authenticated())
+
+
+class TestOAuthCache(TestCase):
+    fixtures = fixture('user_2519', 'user_999')
+
+    def setUp(self):
+        self.user = UserProfile.objects.get(pk=2519)
+        self.user2 = UserProfile.objects.get(pk=999)
+        self.access = Access.objects.create(key='oauthClientKeyForTests',
+                                            secret='super secret',
+                                            user=self.user)
+
+    def test_access_credentials(self):
+        eq_(get_access_credentials(self.access.key),
+            (self.user.pk, 'super secret'))
+
+        # Without a post_save, the credentials are still cached.
+        Access.objects.filter(pk=self.access.pk).update(user=self.user2)
+        eq_(get_access_credentials(self.access.key)[0], self.user.pk)
+
+        Access.objects.no_cache().get(pk=self.access.pk).save()
+        eq_(get_access_credentials(self.access.key)[0], self.user2.pk)
+
+        self.access.delete()
+        eq_(get_access_credentials(self.access.key), None)
+
+    def test_access_credentials_secret_not_cached(self):
+        get_access_credentials(self.access.key)
+        cached = cache.get(_oauth_cache_key('access', self.access.key))
+        eq_(cached[0][0], self.user.pk)
+        ok_('super secret' not in repr(cached))
+
+    def test_access_credentials_invalidated_after_request(self):
+        self.access.save()
+        # Another request caches the credentials before the save is
+        # committed.
+        eq_(get_access_credentials(self.access.key)[0], self.user.pk)
+        Access.objects.filter(pk=self.access.pk).update(user=self.user2)
+        request_finished.send(sender=self.__class__)
+        eq_(get_access_credentials(self.access.key)[0], self.user2.pk)
+
+    def test_access_credentials_unknown(self):
+        eq_(get_access_credentials('newClientKeyForTests'), None)
+        Access.objects.create(key='newClientKeyForTests', secret='secret',
+                              user=self.user2)
+        eq_(get_access_credentials('newClientKeyForTests'),
+            (self.user2.pk, 'secret'))
+
+    def test_access_tokens(self):
+        token = Token.generate_new(ACCESS_TOKEN, creds=self.access,
+                                   user=self.user2)
+        eq_(get_access_tokens(token.key),
+            [(self.access.key, self.user2.pk, token.secret)])
+        token.update(user=self.user)
+        eq_(get_access_tokens(token.key),
+            [(self.access.key, self.user.pk, token.secret)])
+        token.delete()
+        eq_(get_access_tokens(token.key), [])
+
+    def test_access_tokens_invalidated_after_request(self):
+        token = Token.generate_new(ACCESS_TOKEN, creds=self.access,
+                                   user=self.user2)
+        token.delete()
+        # Another request caches the token before the delete is committed.
+        cache.set(_oauth_cache_key('token', token.key),
+                  [(self.access.key, self.user2.pk, token.secret)])
+        request_finished.send(sender=self.__class__)
+        eq_(get_access_tokens(token.key), [])
+
+    def test_access_tokens_access_deleted(self):
+        token = Token.generate_new(ACCESS_TOKEN, creds=self.access,
+                                   user=self.user2)
+        eq_(len(get_access_tokens(token.key)), 1)
+        self.access.delete()
+        eq_(get_access_tokens(token.key), [])
+
+    def test_request_tokens_ignored(self):
+        token = Token.generate_new(REQUEST_TOKEN, creds=self.access)
+        eq_(get_access_tokens(token.key), [])
@@ -1,15 +1,16 @@
 # -*- coding: utf-8 -*-
 from urlparse import urlparse
 
-from django.core.paginator import Paginator
+from django.core.paginator import InvalidPage, Paginator
 from django.http import QueryDict
 from django.test.client import RequestFactory
 
-from nose.tools import eq_
+from nose.tools import eq_, ok_
 
-from mkt.api.paginator import ESPaginator, MetaSerializer
-from mkt.site.tests import ESTestCase, TestCase
+from mkt.api.paginator import CursorPage, ESPaginator, MetaSerializer
+from mkt.site.tests import app_factory, ESTestCase, TestCase
 from mkt.webapps.indexers import WebappIndexer
+from mkt.webapps.models import Webapp
 
 
 class TestSearchPaginator(ESTestCase):
@@ -32,6 +33,48 @@ class TestSearchPaginator(ESTestCase):
         es.search = orig_search
 
 
+class TestCursorPaginator(ESTestCase):
+
+    def setUp(self):
+        super(TestCursorPaginator, self).setUp()
+        self.apps = [app_factory() for i in range(5)]
+        self.refresh('webapp')
+
+    def tearDown(self):
+        for app in Webapp.objects.all():
+            app.delete()
+        self.refresh('webapp')
+        super(TestCursorPaginator, self).tearDown()
+
+    def test_walk(self):
+        paginator = ESPaginator(WebappIndexer.search().sort('id'), 2)
+        cursor = ''
+        ids = []
+        while cursor is not None:
+            page = paginator.cursor_page(cursor, 'scope')
+            eq_(paginator.count, 5)
+            ok_(not page.has_previous())
+            ids.extend(int(hit.id) for hit in page.object_list)
+            cursor = page.next_cursor
+        eq_(ids, [app.pk for app in self.apps])
+        eq_(page.number, 3)
+
+    def test_invalid_cursor(self):
+        paginator = ESPaginator(WebappIndexer.search(), 2)
+        with self.assertRaises(InvalidPage):
+            paginator.cursor_page('nope')
+        with self.assertRaises(InvalidPage):
+            paginator.cursor_page('2:nope')
+
+    def test_cursor_other_scope(self):
+        paginator = ESPaginator(WebappIndexer.search(), 2)
+        cursor = paginator.cursor_page('', 'scope').next_cursor
+        ok_(cursor)
+        with self.assertRaises(InvalidPage):
+            paginator.cursor_page(cursor, 'other scope')
+        eq_(len(paginator.cursor_page(cursor, 'scope').object_list), 2)
+
+
 class TestMetaSerializer(TestCase):
     def setUp(self):
         self.url = '/api/whatever'
@@ -141,6 +184,29 @@ class TestMetaSerializer(TestCase):
         eq_(QueryDict(next.query),
             QueryDict('limit=2&offset=4&extra=&superfluous=yes'))
 
+    def test_cursor_page(self):
+        self.url = '/api/whatever/?limit=2&offset=4&q=foo'
+        self.request = RequestFactory().get(self.url)
+
+        paginator = Paginator(['a', 'b', 'c', 'd', 'e', 'f'], 2)
+        page = CursorPage(['c', 'd'], 2, '4:abc', paginator)
+        serialized = self.get_serialized_data(page)
+        eq_(serialized['offset'], 2)
+        eq_(serialized['total_count'], 6)
+        eq_(serialized['limit'], 2)
+        eq_(serialized['previous'], None)
+
+        next = urlparse(serialized['next'])
+        eq_(next.path, '/api/whatever/')
+        eq_(QueryDict(next.query), QueryDict('limit=2&q=foo&cursor=4:abc'))
+
+    def test_last_cursor_page(self):
+        paginator = Paginator(['a', 'b', 'c'], 2)
+        page = CursorPage(['c'], 2, None, paginator)
+        serialized = self.get_serialized_data(page)
+        eq_(serialized['next'], None)
+        eq_(serialized['previous'], None)
+
     def test_urlencoded_query_string(self):
         self.url = '/api/whatever/?q=yó'
         self.request = RequestFactory().get(self.url)
@@ -52,6 +52,10 @@ MKT_TRANSACTION_CONTRIB_TYPES = {
 
 CONTRIB_TYPE_DEFAULT = CONTRIB_VOLUNTARY
 
+# Cache key of a counter bumped whenever a refund or chargeback is recorded, so
+# that the receipt verifier drops the results it has cached.
+REFUNDS_COUNTER_CACHE_KEY = 'receipts:refunds-counter'
+
 REFUND_PENDING = 0  # Just to irritate you I didn't call this REFUND_REQUESTED.
 REFUND_APPROVED = 1
 REFUND_APPROVED_INSTANT = 2
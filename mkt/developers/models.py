@@ -156,6 +156,21 @@ class AddonPaymentAccount(ModelBase):
         return self.payment_account.user
 
 
+# The payment account of an app is stored in ES, re-index it when it changes.
+def update_search_index(sender, instance, **kw):
+    from mkt.webapps.tasks import index_webapps
+    if not kw.get('raw'):
+        index_webapps.delay([instance.addon_id])
+
+
+models.signals.post_save.connect(
+    update_search_index, sender=AddonPaymentAccount,
+    dispatch_uid='addon_payment_account_search_index')
+models.signals.post_delete.connect(
+    update_search_index, sender=AddonPaymentAccount,
+    dispatch_uid='addon_payment_account_search_index_delete')
+
+
 class UserInappKey(ModelBase):
     solitude_seller = models.ForeignKey(SolitudeSeller)
     seller_product_pk = models.IntegerField(unique=True)
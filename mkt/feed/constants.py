@@ -103,3 +103,6 @@ HOME_NUM_APPS_SHELF = 0
 
 # Minimum number of apps needed after filtering to be displayed for colls.
 MIN_APPS_COLLECTION = 3
+
+# Cache namespace of the feed responses, bumped whenever the feed is indexed.
+FEED_CACHE_NAMESPACE = 'feed'
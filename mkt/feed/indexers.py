@@ -6,8 +6,8 @@ import mkt.carriers
 import mkt.feed.constants as feed
 import mkt.regions
 from mkt.search.indexers import BaseIndexer
-from mkt.translations.models import attach_trans_dict
-from mkt.webapps.models import Webapp
+from mkt.site.utils import cache_ns_key
+from mkt.translations.models import attach_trans_dicts
 
 
 def get_slug_multifield():
@@ -21,7 +21,35 @@ def get_slug_multifield():
     }
 
 
-class FeedAppIndexer(BaseIndexer):
+def invalidate_feed_cache():
+    """Bump the feed cache namespace so cached feed responses are dropped."""
+    cache_ns_key(feed.FEED_CACHE_NAMESPACE, increment=True)
+
+
+class BaseFeedIndexer(BaseIndexer):
+    """
+    Invalidates the cached feed responses whenever a feed document is written
+    or removed, so that curators' changes show up right away.
+    """
+    @classmethod
+    def index(cls, document, id_=None, es=None, index=None):
+        super(BaseFeedIndexer, cls).index(document, id_=id_, es=es,
+                                          index=index)
+        invalidate_feed_cache()
+
+    @classmethod
+    def bulk_index(cls, documents, id_field='id', es=None, index=None):
+        super(BaseFeedIndexer, cls).bulk_index(documents, id_field=id_field,
+                                               es=es, index=index)
+        invalidate_feed_cache()
+
+    @classmethod
+    def unindex(cls, id_, es=None, index=None):
+        super(BaseFeedIndexer, cls).unindex(id_, es=es, index=index)
+        invalidate_feed_cache()
+
+
+class FeedAppIndexer(BaseFeedIndexer):
     @classmethod
     def get_model(cls):
         """Returns the Django model this MappingType relates to"""
@@ -65,8 +93,7 @@ class FeedAppIndexer(BaseIndexer):
             obj = cls.get_model().objects.get(pk=pk)
 
         # Attach translations for searching and indexing.
-        attach_trans_dict(cls.get_model(), [obj])
-        attach_trans_dict(Webapp, [obj.app])
+        attach_trans_dicts([obj, obj.app])
 
         doc = {
             'id': obj.id,
@@ -96,7 +123,7 @@ class FeedAppIndexer(BaseIndexer):
         return doc
 
 
-class FeedBrandIndexer(BaseIndexer):
+class FeedBrandIndexer(BaseFeedIndexer):
     @classmethod
     def get_model(cls):
         from mkt.feed.models import FeedBrand
@@ -136,7 +163,7 @@ class FeedBrandIndexer(BaseIndexer):
         }
 
 
-class FeedCollectionIndexer(BaseIndexer):
+class FeedCollectionIndexer(BaseFeedIndexer):
     @classmethod
     def get_model(cls):
         from mkt.feed.models import FeedCollection
@@ -171,12 +198,12 @@ class FeedCollectionIndexer(BaseIndexer):
 
     @classmethod
     def extract_document(cls, pk=None, obj=None):
-        from mkt.feed.models import FeedCollectionMembership
-
         if obj is None:
             obj = cls.get_model().objects.get(pk=pk)
 
-        attach_trans_dict(cls.get_model(), [obj])
+        # Translations for the object and its memberships in one query.
+        memberships = obj.feedcollectionmembership_set.all()
+        attach_trans_dicts([obj] + list(memberships))
 
         doc = {
             'id': obj.id,
@@ -196,8 +223,6 @@ class FeedCollectionIndexer(BaseIndexer):
         }
 
         # Grouped apps. Key off of translation, pointed to app IDs.
-        memberships = obj.feedcollectionmembership_set.all()
-        attach_trans_dict(FeedCollectionMembership, memberships)
         for member in memberships:
             if member.group:
                 group_translation = cls.extract_field_translations(member,
@@ -215,7 +240,7 @@ class FeedCollectionIndexer(BaseIndexer):
         return doc
 
 
-class FeedShelfIndexer(BaseIndexer):
+class FeedShelfIndexer(BaseFeedIndexer):
     @classmethod
     def get_model(cls):
         from mkt.feed.models import FeedShelf
@@ -250,12 +275,12 @@ class FeedShelfIndexer(BaseIndexer):
 
     @classmethod
     def extract_document(cls, pk=None, obj=None):
-        from mkt.feed.models import FeedShelfMembership
-
         if obj is None:
             obj = cls.get_model().get(pk=pk)
 
-        attach_trans_dict(cls.get_model(), [obj])
+        # Translations for the object and its memberships in one query.
+        memberships = obj.feedshelfmembership_set.all()
+        attach_trans_dicts([obj] + list(memberships))
 
         doc = {
             'id': obj.id,
@@ -274,8 +299,6 @@ class FeedShelfIndexer(BaseIndexer):
         }
 
         # Grouped apps. Key off of translation, pointed to app IDs.
-        memberships = obj.feedshelfmembership_set.all()
-        attach_trans_dict(FeedShelfMembership, memberships)
         for member in memberships:
             if member.group:
                 group_translation = cls.extract_field_translations(member,
@@ -293,7 +316,7 @@ class FeedShelfIndexer(BaseIndexer):
         return doc
 
 
-class FeedItemIndexer(BaseIndexer):
+class FeedItemIndexer(BaseFeedIndexer):
 
     chunk_size = 1000
 
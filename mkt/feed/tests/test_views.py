@@ -2,6 +2,7 @@
 import json
 import os
 
+from django.conf import settings
 from django.core.urlresolvers import reverse
 from django.utils.text import slugify
 
@@ -9,6 +10,7 @@ import mock
 from elasticsearch_dsl.search import Search
 from mpconstants import collection_colors as coll_colors
 from nose.tools import eq_, ok_
+from rest_framework.response import Response
 
 import mkt
 import mkt.carriers
@@ -16,6 +18,7 @@ import mkt.feed.constants as feed
 import mkt.regions
 from mkt.api.tests.test_oauth import RestOAuth
 from mkt.constants import applications
+from mkt.feed.indexers import FeedItemIndexer
 from mkt.feed.models import (FeedApp, FeedBrand, FeedCollection, FeedItem,
                              FeedShelf)
 from mkt.feed.tests.test_models import FeedAppMixin, FeedTestMixin
@@ -1461,6 +1464,20 @@ class TestFeedView(BaseTestFeedESView, BaseTestFeedItemViewSet):
         res, data = self._get(region='us')
         eq_(len(data['objects']), len(feed_items))
 
+    def test_restofworld_fallback_round_trips(self):
+        feed_items = self.feed_factory()
+        es = FeedItemIndexer.get_es()
+        with mock.patch.object(es, 'msearch', wraps=es.msearch) as msearch, \
+                mock.patch.object(es, 'mget', wraps=es.mget) as mget, \
+                mock.patch.object(es, 'search', wraps=es.search) as search:
+            res, data = self._get(region='us')
+        eq_(len(data['objects']), len(feed_items))
+        # Region and RESTOFWORLD feed items, feed elements, then apps.
+        eq_(msearch.call_count, 1)
+        eq_(len(msearch.call_args[1]['body']), 4)
+        eq_(mget.call_count, 1)
+        eq_(search.call_count, 1)
+
     def test_restofworld_fallback_shelf_only(self):
         shelf = self.feed_shelf_factory()
         shelf.feeditem_set.create(region=mkt.regions.USA.id,
@@ -1578,6 +1595,53 @@ class TestFeedView(BaseTestFeedESView, BaseTestFeedItemViewSet):
         eq_(res.status_code, 200)
         eq_(len(data['objects']), 1)
 
+    def test_cached(self):
+        self.feed_factory()
+        res, data = self._get()
+        with mock.patch.object(FeedView, '_get') as _get:
+            cached_res, cached_data = self._get()
+        ok_(not _get.called)
+        eq_(cached_res.status_code, 200)
+        eq_(cached_data, data)
+
+    def test_cached_404(self):
+        res, data = self._get()
+        eq_(res.status_code, 404)
+        with mock.patch.object(FeedView, '_get') as _get:
+            res, data = self._get()
+        ok_(not _get.called)
+        eq_(res.status_code, 404)
+
+    def test_cache_key_per_params(self):
+        self.feed_factory()
+        self._get()
+        with mock.patch.object(FeedView, '_get') as _get:
+            _get.return_value = Response({'objects': []})
+            self._get(region=1)
+            self._get(carrier='vimpelcom')
+            self._get(limit=1)
+            self._get(lang='fr')
+        eq_(_get.call_count, 4)
+
+    def test_cache_invalidated_on_index(self):
+        self.feed_item_factory()
+        res, data = self._get()
+        eq_(len(data['objects']), 1)
+
+        self.feed_item_factory(item_type=feed.FEED_TYPE_COLL)
+        res, data = self._get()
+        eq_(len(data['objects']), 2)
+
+    def test_cache_invalidated_on_unindex(self):
+        feed_items = self.feed_factory(item_types=[feed.FEED_TYPE_APP,
+                                                   feed.FEED_TYPE_COLL])
+        res, data = self._get()
+        eq_(len(data['objects']), 2)
+
+        feed_items[1].delete()
+        res, data = self._get()
+        eq_(len(data['objects']), 1)
+
 
 class TestFeedViewDeviceFiltering(BaseTestFeedESView, BaseTestFeedItemViewSet):
     fixtures = BaseTestFeedItemViewSet.fixtures + FeedTestMixin.fixtures
@@ -1715,6 +1779,15 @@ class TestFeedViewRegionFiltering(BaseTestFeedESView, BaseTestFeedItemViewSet):
         res, data = self._get(region='us')
         ok_(data['objects'])
 
+    @mock.patch('mkt.feed.views.get_excluded_in')
+    def test_feedapp_stale_index(self, get_excluded_in_mock):
+        feed_item = self.feed_item_factory(item_type=feed.FEED_TYPE_APP)
+        # Excluded from Germany, but the index doesn't know about it yet.
+        get_excluded_in_mock.return_value = set([feed_item.app.app.id])
+        res, data = self._get(region='de')
+        eq_(res.status_code, 404)
+        get_excluded_in_mock.assert_called_with(mkt.regions.DEU.id)
+
     def test_coll(self):
         app_excluded_br = mkt.site.tests.app_factory()
         app_excluded_de = mkt.site.tests.app_factory()
@@ -1857,15 +1930,12 @@ class TestFeedViewQueries(BaseTestFeedItemViewSet, TestCase):
             ['field_value_factor'], {'field': 'order',
                                      'modifier': 'reciprocal'})
 
-    def test_element_query(self):
+    def test_element_docs(self):
         feed_item = self.feed_item_factory()
         item = feed_item.get_indexer().extract_document(None, obj=feed_item)
-        sq = self.fv.get_es_feed_element_query(self.sq, [item]).to_dict()
-        ok_({'bool': {'must': [{'term': {'id': feed_item.app_id}},
-                               {'term': {'item_type': 'app'}}]}}
-            in sq['query']['filtered']['filter']['bool']['should'])
-        eq_(sq['from'], 0)
-        eq_(sq['size'], 1)
+        docs = self.fv.get_feed_element_docs([item, item])
+        eq_(docs, [{'_index': settings.ES_INDEXES['mkt_feed_app'],
+                    '_id': feed_item.app_id}])
 
 
 class TestFeedElementGetView(BaseTestFeedESView, BaseTestFeedItemViewSet):
@@ -1,9 +1,14 @@
+import hashlib
+
 from django.conf import settings
+from django.core.cache import cache
 from django.core.files.storage import default_storage as storage
 from django.db.models import Q
 from django.db.transaction import non_atomic_requests
 from django.utils.datastructures import MultiValueDictKeyError
-from django.http import Http404
+from django.http import Http404, HttpResponse
+from django.utils import translation
+from django.utils.http import urlencode
 from django.views.decorators.cache import cache_control
 
 import commonware
@@ -11,6 +16,7 @@ from django_statsd.clients import statsd
 from elasticsearch_dsl import filter as es_filter
 from elasticsearch_dsl import function as es_function
 from elasticsearch_dsl import query, Search
+from elasticsearch_dsl.result import Result
 from PIL import Image
 from rest_framework import generics, response, status, viewsets
 from rest_framework.exceptions import ParseError, PermissionDenied
@@ -26,8 +32,10 @@ from mkt.api.authentication import (RestAnonymousAuthentication,
                                     RestOAuthAuthentication,
                                     RestSharedSecretAuthentication)
 from mkt.api.authorization import AllowReadOnly, AnyOf, GroupPermission
-from mkt.api.base import CORSMixin, MarketplaceView, SlugOrIdMixin
+from mkt.api.base import (CORSMixin, get_region_from_request,
+                          MarketplaceView, SlugOrIdMixin)
 from mkt.api.paginator import ESPaginator
+from mkt.api.renderers import SuccinctJSONRenderer
 from mkt.constants.carriers import CARRIER_MAP
 from mkt.constants.regions import REGIONS_DICT
 from mkt.developers.tasks import pngcrush_image
@@ -35,9 +43,12 @@ from mkt.feed.indexers import FeedItemIndexer
 from mkt.operators.models import OperatorPermission
 from mkt.search.filters import (DeviceTypeFilter, ProfileFilter,
                                 PublicAppsFilter, RegionFilter)
-from mkt.site.utils import HttpResponseSendFile
+from mkt.search.utils import MultiSearch, source_fields
+from mkt.site.utils import cache_ns_key, HttpResponseSendFile
 from mkt.webapps.indexers import WebappIndexer
-from mkt.webapps.models import Webapp
+from mkt.webapps.models import get_excluded_in, Webapp
+from mkt.webapps.serializers import (ESAppFeedCollectionSerializer,
+                                     ESAppFeedSerializer)
 
 from .authorization import FeedAuthorization
 from .fields import DataURLImageField, ImageURLField
@@ -568,6 +579,10 @@ class BaseFeedESView(CORSMixin, APIView):
     filter_backends = [PublicAppsFilter, DeviceTypeFilter, RegionFilter,
                        ProfileFilter]
 
+    # The serializers used on the apps returned by get_apps(), to only fetch
+    # what they need. Whole app documents are fetched if it's empty.
+    app_serializer_classes = ()
+
     def __init__(self, *args, **kw):
         self.ITEM_TYPES = {
             'apps': feed.FEED_TYPE_APP,
@@ -617,17 +632,24 @@ class BaseFeedESView(CORSMixin, APIView):
         Takes a list of app_ids. Gets the apps, including filters.
         Returns an app_map for serializer context.
         """
-        sq = WebappIndexer.search()
+        sq = source_fields(WebappIndexer.search(),
+                           *self.app_serializer_classes)
+        excluded = set()
         if request.QUERY_PARAMS.get('filtering', '1') == '1':
             # With filtering (default).
             for backend in self.filter_backends:
                 sq = backend().filter_queryset(request, sq, self)
+            # The index can lag behind region exclusion changes, so also
+            # check the apps against the region's cached set of exclusions.
+            region = get_region_from_request(request)
+            if region:
+                excluded = get_excluded_in(region.id)
         sq = WebappIndexer.filter_by_apps(app_ids, sq)
 
         # Store the apps to attach to feed elements later.
         with statsd.timer('mkt.feed.views.apps_query'):
             apps = sq.execute().hits
-        return dict((app.id, app) for app in apps)
+        return dict((app.id, app) for app in apps if app.id not in excluded)
 
     def filter_feed_items(self, request, feed_items):
         """
@@ -736,14 +758,17 @@ class FeedElementSearchView(BaseFeedESView):
 class FeedView(MarketplaceView, BaseFeedESView, generics.GenericAPIView):
     """
     THE feed view. It hits ES with:
-    - a weighted function score query to get feed items
-    - a filter to deserialize feed elements
+    - a weighted function score query to get feed items, for the region and
+      the RESTOFWORLD fallback at once
+    - a multi-get to deserialize feed elements
     - a filter to deserialize apps
     """
     authentication_classes = []
     cors_allowed_methods = ('get',)
     paginator_class = ESPaginator
     permission_classes = []
+    app_serializer_classes = (ESAppFeedSerializer,
+                              ESAppFeedCollectionSerializer)
 
     def get_es_feed_query(self, sq, region=mkt.regions.RESTOFWORLD.id,
                           carrier=None, original_region=None):
@@ -797,127 +822,151 @@ class FeedView(MarketplaceView, BaseFeedESView, generics.GenericAPIView):
                     must_not=[es_filter.Term(carrier=carrier)])])
         )
 
-    def get_es_feed_element_query(self, sq, feed_items):
+    def get_feed_element_docs(self, feed_items):
         """
-        From a list of FeedItems with normalized feed element IDs,
-        return an ES query that fetches the feed elements for each feed item.
+        From a list of FeedItems with normalized feed element IDs, return the
+        mget docs that fetch the feed element of each feed item.
         """
-        filters = []
+        docs = []
         for feed_item in feed_items:
             item_type = feed_item['item_type']
-            filters.append(es_filter.Bool(
-                must=[es_filter.Term(id=feed_item[item_type]),
-                      es_filter.Term(item_type=item_type)]))
-
-        return sq.filter(es_filter.Bool(should=filters))[0:len(feed_items)]
+            doc = {'_index': self.INDICES[item_type],
+                   '_id': feed_item[item_type]}
+            if doc not in docs:
+                docs.append(doc)
+        return docs
 
-    def _check_empty_feed(self, items, rest_of_world):
+    def get_feed_element_map(self, es, feed_items):
         """
-        Return -1 if feed is empty and we are already falling back to RoW.
-        Return 0 if feed is empty and we are not falling back to RoW yet.
-        Return 1 if at least one feed item and the only feed item is not shelf.
+        Fetch the feed elements of the FeedItems in one mget, and return them
+        keyed by item type and ID for the serializer context.
         """
-        if not items or (len(items) == 1 and items[0].get('shelf')):
-            # Empty feed.
-            if rest_of_world:
-                return -1
-            return 0
-        return 1
+        feed_element_map = {
+            feed.FEED_TYPE_APP: {},
+            feed.FEED_TYPE_BRAND: {},
+            feed.FEED_TYPE_COLL: {},
+            feed.FEED_TYPE_SHELF: {},
+        }
+        docs = self.get_feed_element_docs(feed_items)
+        if not docs:
+            return feed_element_map
 
-    def _handle_empty_feed(self, empty_feed_code, region, request, args,
-                           kwargs):
-        """
-        If feed is empty, this method handles appropriately what to return.
-        If empty_feed_code == 0: try to fallback to RoW.
-        If empty_feed_code == -1: 404.
-        """
-        if empty_feed_code == 0:
-            return self._get(request, rest_of_world=True,
-                             original_region=region, *args, **kwargs)
-        return response.Response(status=status.HTTP_404_NOT_FOUND)
+        with statsd.timer('mkt.feed.view.feed_element_query'):
+            res = es.mget(body={'docs': docs})
+        for doc in res['docs']:
+            # Handle edge case where the ES index might get stale.
+            if not doc.get('found'):
+                continue
+            feed_elm = Result(doc)
+            feed_element_map[feed_elm['item_type']][feed_elm['id']] = feed_elm
+        return feed_element_map
 
-    def _get(self, request, rest_of_world=False, original_region=None,
-             *args, **kwargs):
+    def _is_empty_feed(self, items):
+        """An empty feed has no items, or only a shelf."""
+        return not items or (len(items) == 1 and items[0].get('shelf'))
+
+    def _get(self, request, *args, **kwargs):
         es = FeedItemIndexer.get_es()
 
         # Parse region.
-        if rest_of_world:
-            region = mkt.regions.RESTOFWORLD.id
-        else:
-            region = request.REGION.id
+        region = request.REGION.id
         # Parse carrier.
         carrier = None
         q = request.QUERY_PARAMS
         if q.get('carrier') and q['carrier'] in mkt.carriers.CARRIER_MAP:
             carrier = mkt.carriers.CARRIER_MAP[q['carrier']].id
 
-        # Fetch FeedItems.
-        sq = self.get_es_feed_query(FeedItemIndexer.search(using=es),
-                                    region=region, carrier=carrier,
-                                    original_region=original_region)
+        # Fetch FeedItems. Unless we are already there, also fetch the
+        # RESTOFWORLD FeedItems we fall back to if the region's feed turns out
+        # to be empty, in the same msearch request.
+        searches = [self.get_es_feed_query(FeedItemIndexer.search(using=es),
+                                           region=region, carrier=carrier)]
+        if region != mkt.regions.RESTOFWORLD.id:
+            searches.append(self.get_es_feed_query(
+                FeedItemIndexer.search(using=es), carrier=carrier,
+                original_region=region))
+        sq = MultiSearch(searches)
+
         # The paginator triggers the ES request.
         with statsd.timer('mkt.feed.view.feed_query'):
-            feed_items = self.paginate_queryset(sq)
-        feed_ok = self._check_empty_feed(feed_items, rest_of_world)
-        if feed_ok != 1:
-            return self._handle_empty_feed(feed_ok, region, request, args,
-                                           kwargs)
-
-        # Build the meta object.
-        meta = mkt.api.paginator.CustomPaginationSerializer(
-            feed_items, context={'request': request}).data['meta']
-
-        # Set up serializer context.
-        feed_element_map = {
-            feed.FEED_TYPE_APP: {},
-            feed.FEED_TYPE_BRAND: {},
-            feed.FEED_TYPE_COLL: {},
-            feed.FEED_TYPE_SHELF: {},
-        }
+            feeds = [self.paginate_queryset(sq)]
+        for i in range(1, len(searches)):
+            try:
+                feeds.append(self.paginate_queryset(sq.select(i)))
+            except Http404:
+                # The fallback feed doesn't go as far as the region's one.
+                pass
+        feeds = [page for page in feeds if not self._is_empty_feed(page)]
+        if not feeds:
+            return response.Response(status=status.HTTP_404_NOT_FOUND)
 
-        # Fetch feed elements to attach to FeedItems later.
-        apps = []
-        sq = self.get_es_feed_element_query(
-            Search(using=es, index=self.get_feed_element_index()), feed_items)
-        with statsd.timer('mkt.feed.view.feed_element_query'):
-            feed_elements = sq.execute().hits
-        for feed_elm in feed_elements:
-            # Store the feed elements to attach to FeedItems later.
-            feed_element_map[feed_elm['item_type']][feed_elm['id']] = feed_elm
-            # Store the apps to retrieve later.
-            apps += self.get_app_ids(feed_elm)
-
-        # Remove dupes from apps list.
-        apps = list(set(apps))
-
-        # Fetch apps to attach to feed elements later.
-        app_map = self.get_apps(request, apps)
-
-        # Super serialize.
-        with statsd.timer('mkt.feed.view.serialize'):
-            feed_items = FeedItemESSerializer(feed_items, many=True, context={
-                'app_map': app_map,
-                'feed_element_map': feed_element_map,
-                'request': request
-            }).data
-
-        # Filter excluded apps. If there are feed items that have all their
-        # apps excluded, they will be removed from the feed.
-        feed_items = self.filter_feed_items(request, feed_items)
-        feed_ok = self._check_empty_feed(feed_items, rest_of_world)
-        if feed_ok != 1:
-            if not rest_of_world:
-                log.warning('Feed empty for region {0}. Requerying feed with '
+        # Fetch feed elements and apps of all the feeds we might serve to
+        # attach to FeedItems later.
+        feed_element_map = self.get_feed_element_map(
+            es, [feed_item for page in feeds for feed_item in page])
+        apps = set()
+        for feed_elms in feed_element_map.values():
+            for feed_elm in feed_elms.values():
+                apps.update(self.get_app_ids(feed_elm))
+        app_map = self.get_apps(request, list(apps))
+
+        for page in feeds:
+            # Super serialize.
+            with statsd.timer('mkt.feed.view.serialize'):
+                feed_items = FeedItemESSerializer(page, many=True, context={
+                    'app_map': app_map,
+                    'feed_element_map': feed_element_map,
+                    'request': request
+                }).data
+
+            # Filter excluded apps. If there are feed items that have all
+            # their apps excluded, they will be removed from the feed.
+            feed_items = self.filter_feed_items(request, feed_items)
+            if not self._is_empty_feed(feed_items):
+                # Build the meta object.
+                meta = mkt.api.paginator.CustomPaginationSerializer(
+                    page, context={'request': request}).data['meta']
+                return response.Response({'meta': meta,
+                                          'objects': feed_items},
+                                         status=status.HTTP_200_OK)
+
+            if page is not feeds[-1]:
+                log.warning('Feed empty for region {0}. Falling back to '
                             'region=RESTOFWORLD'.format(region))
-            return self._handle_empty_feed(feed_ok, region, request, args,
-                                           kwargs)
 
-        return response.Response({'meta': meta, 'objects': feed_items},
-                                 status=status.HTTP_200_OK)
+        return response.Response(status=status.HTTP_404_NOT_FOUND)
+
+    def get_cache_key(self, request):
+        """
+        Key a feed response on everything that changes its content: the
+        region, the query string (carrier, pagination, device and filtering
+        parameters), the API version and the language.
+        """
+        key = u':'.join([
+            unicode(request.REGION.id),
+            unicode(getattr(request, 'API_VERSION', '')),
+            translation.get_language(),
+            urlencode(sorted(request.QUERY_PARAMS.lists()), doseq=True)])
+        return 'feed:%s:%s' % (cache_ns_key(feed.FEED_CACHE_NAMESPACE),
+                               hashlib.md5(key.encode('utf-8')).hexdigest())
 
     def get(self, request, *args, **kwargs):
-        with statsd.timer('mkt.feed.view'):
-            return self._get(request, *args, **kwargs)
+        cache_key = self.get_cache_key(request)
+        cached = cache.get(cache_key)
+        if cached is None:
+            statsd.incr('mkt.feed.view.cache.miss')
+            with statsd.timer('mkt.feed.view'):
+                res = self._get(request, *args, **kwargs)
+            # Cache the rendered content, ES hits don't pickle reliably.
+            renderer = SuccinctJSONRenderer()
+            cached = (renderer.render(res.data), res.status_code)
+            cache.set(cache_key, cached, settings.FEED_CACHE_TIMEOUT)
+        else:
+            statsd.incr('mkt.feed.view.cache.hit')
+
+        content, status_code = cached
+        return HttpResponse(content, status=status_code,
+                            content_type=SuccinctJSONRenderer.media_type)
 
 
 class FeedElementGetView(BaseFeedESView):
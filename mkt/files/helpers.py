@@ -1,11 +1,17 @@
 import codecs
+import cPickle
+import hashlib
 import json
 import mimetypes
 import os
-import stat
+import struct
+import time
+import zipfile
+import zlib
 from collections import OrderedDict
 
 from django.conf import settings
+from django.core.cache import cache
 from django.core.files.storage import default_storage as storage
 from django.core.urlresolvers import reverse
 from django.template.defaultfilters import filesizeformat
@@ -13,7 +19,7 @@ from django.utils.encoding import smart_unicode
 
 import commonware.log
 import jinja2
-from cache_nuggets.lib import memoize, Message
+from cache_nuggets.lib import Message
 from jingo import env, register
 from tower import ugettext as _
 from appvalidator.testcases.packagelayout import (
@@ -21,8 +27,7 @@ from appvalidator.testcases.packagelayout import (
     blacklisted_magic_numbers as blocked_magic_numbers)
 
 import mkt
-from mkt.files.utils import extract_zip, get_md5
-from mkt.site.storage_utils import walk_storage
+from mkt.files.utils import SafeUnzip
 
 
 # Allow files with a shebang through.
@@ -32,6 +37,49 @@ blocked_extensions = [
     b for b in list(blocked_extensions) if b != 'sh']
 task_log = commonware.log.getLogger('z.task')
 
+# Files never change once uploaded, so their index can be kept for a while.
+FILE_VIEWER_INDEX_TIMEOUT = 60 * 60 * 24
+# Memcached silently refuses items over 1MB: the index of a zip with many
+# entries is compressed and stored in pieces of this size.
+FILE_VIEWER_INDEX_CHUNK_SIZE = 512 * 1024
+
+
+def cache_set_chunked(key, value, timeout):
+    """
+    Caches `value` under `key` compressed and split in pieces that each fit
+    in a memcached item, whatever its size.
+    """
+    data = zlib.compress(cPickle.dumps(value, cPickle.HIGHEST_PROTOCOL))
+    size = FILE_VIEWER_INDEX_CHUNK_SIZE
+    chunks = [data[i:i + size] for i in xrange(0, len(data), size)]
+    items = dict(('%s:%s' % (key, i), chunk)
+                 for i, chunk in enumerate(chunks))
+    items[key] = len(chunks)
+    cache.set_many(items, timeout)
+
+
+def cache_get_chunked(key):
+    """
+    Returns the value cached by cache_set_chunked() under `key`, or None if
+    it or any of its pieces isn't cached.
+    """
+    count = cache.get(key)
+    if count is None:
+        return None
+    keys = ['%s:%s' % (key, i) for i in xrange(count)]
+    chunks = cache.get_many(keys)
+    if len(chunks) != count:
+        return None
+    return cPickle.loads(zlib.decompress(''.join(chunks[k] for k in keys)))
+
+
+def cache_delete_chunked(*keys):
+    """Deletes values cached by cache_set_chunked() and their pieces."""
+    counts = cache.get_many(keys)
+    cache.delete_many(list(keys) + [
+        '%s:%s' % (key, i) for key, count in counts.items()
+        for i in xrange(count)])
+
 
 @register.function
 def file_viewer_class(value, key):
@@ -65,9 +113,14 @@ def file_tree(files, selected):
 
 class FileViewer(object):
     """
-    Provide access to a storage-managed file by copying it locally and
-    extracting info from it. `src` is a storage-managed path and `dest` is a
-    local temp path.
+    Provide access to the contents of a storage-managed zip file without
+    extracting it. `src` is a storage-managed path.
+
+    extract() reads the zip into an index of its entries (name, size, CRC32,
+    SHA-256, mimetype, syntax...) cached per file id in pieces that fit in
+    memcached, along with the much smaller fingerprints (path to SHA-256)
+    DiffHelper compares. Entries are then listed from that index and read
+    straight out of the zip from their offset.
     """
 
     def __init__(self, file_obj):
@@ -76,8 +129,6 @@ class FileViewer(object):
         self.src = (file_obj.guarded_file_path
                     if file_obj.status == mkt.STATUS_DISABLED
                     else file_obj.file_path)
-        self.dest = os.path.join(settings.TMP_PATH, 'file_viewer',
-                                 str(file_obj.pk))
         self._files, self.selected = None, None
 
     def __str__(self):
@@ -87,47 +138,62 @@ class FileViewer(object):
         return ('%s:file-viewer:extraction-in-progress:%s' %
                 (settings.CACHE_PREFIX, self.file.id))
 
+    def _index_cache_key(self):
+        return '%s:file-viewer:index:%s' % (settings.CACHE_PREFIX,
+                                            self.file.id)
+
+    def _fingerprints_cache_key(self):
+        return '%s:file-viewer:fingerprints:%s' % (settings.CACHE_PREFIX,
+                                                   self.file.id)
+
     def extract(self):
         """
-        Will make all the directories and expand the files.
+        Will index the entries of the zip.
         Raises error on nasty files.
         """
         try:
-            tempdir = extract_zip(self.src)
-            # Move extracted files into persistent storage.
-            for root, subdirs, files in os.walk(tempdir):
-                storage_root = root.replace(tempdir, self.dest, 1)
-                for fname in files:
-                    file_src = os.path.join(root, fname)
-                    file_dest = os.path.join(storage_root, fname)
-                    copyfileobj(open(file_src), storage.open(file_dest, 'w'))
+            zip_ = SafeUnzip(self.src)
+            zip_.is_valid()
+            try:
+                index = self._get_index(zip_)
+            finally:
+                zip_.close()
+            cache_set_chunked(self._index_cache_key(), index,
+                              FILE_VIEWER_INDEX_TIMEOUT)
+            cache_set_chunked(self._fingerprints_cache_key(),
+                              self._get_fingerprints(index),
+                              FILE_VIEWER_INDEX_TIMEOUT)
+            if cache_get_chunked(self._index_cache_key()) is None:
+                # Don't leave the viewer waiting for an index that will never
+                # show up.
+                raise IOError('The index could not be cached')
         except Exception, err:
             task_log.error('Error (%s) extracting %s' % (err, self.src))
             raise
 
     def cleanup(self):
-        if storage.exists(self.dest):
-            for root, dirs, files in walk_storage(self.dest):
-                for fname in files:
-                    storage.delete(os.path.join(root, fname))
+        cache_delete_chunked(self._index_cache_key(),
+                             self._fingerprints_cache_key())
+        self._files = None
 
     def is_extracted(self):
-        """If the file has been extracted or not."""
-        return (storage.exists(os.path.join(self.dest, 'manifest.webapp')) and
+        """If the file has been indexed or not."""
+        return (cache_get_chunked(self._index_cache_key()) is not None and
                 not Message(self._extraction_cache_key()).get())
 
-    def _is_binary(self, mimetype, path):
-        """Uses the filename to see if the file can be shown in HTML or not."""
+    def _is_binary(self, mimetype, path, head=''):
+        """
+        Uses the filename and the first bytes of the file to see if the file
+        can be shown in HTML or not.
+        """
         # Re-use the blocked data from amo-validator to spot binaries.
         ext = os.path.splitext(path)[1][1:]
         if ext in blocked_extensions:
             return True
 
-        if os.path.exists(path) and not os.path.isdir(path):
-            with storage.open(path, 'r') as rfile:
-                bytes = tuple(map(ord, rfile.read(4)))
-            if any(bytes[:len(x)] == x for x in blocked_magic_numbers):
-                return True
+        bytes = tuple(map(ord, head))
+        if any(bytes[:len(x)] == x for x in blocked_magic_numbers):
+            return True
 
         if mimetype:
             major, minor = mimetype.split('/')
@@ -151,7 +217,7 @@ class FileViewer(object):
                 file_data = self._process_manifest(file_data)
 
             return file_data
-        except (IOError, OSError):
+        except (IOError, OSError, zipfile.BadZipfile):
             self.selected['msg'] = _('That file no longer exists.')
             return ''
 
@@ -166,17 +232,52 @@ class FileViewer(object):
             self.selected['msg'] = msg
             return ''
 
-        with storage.open(self.selected['full'], 'r') as opened:
-            cont = opened.read()
-            codec = 'utf-16' if cont.startswith(codecs.BOM_UTF16) else 'utf-8'
+        cont = self.read_entry(self.selected)
+        codec = 'utf-16' if cont.startswith(codecs.BOM_UTF16) else 'utf-8'
+        try:
+            return cont.decode(codec)
+        except UnicodeDecodeError:
+            cont = cont.decode(codec, 'ignore')
+            # L10n: {0} is the filename.
+            self.selected['msg'] = (
+                _('Problems decoding {0}.').format(codec))
+            return cont
+
+    def read_entry(self, entry):
+        """
+        Returns the uncompressed contents of an entry of get_files(), read
+        straight from its offset in the zip.
+
+        Raises zipfile.BadZipfile if the zip doesn't match the index anymore.
+        """
+        with storage.open(self.src, 'rb') as fobj:
+            fobj.seek(entry['offset'])
+            header = fobj.read(zipfile.sizeFileHeader)
+            if (len(header) != zipfile.sizeFileHeader or
+                    header[:4] != zipfile.stringFileHeader):
+                raise zipfile.BadZipfile('Bad local file header for %s' %
+                                         entry['short'])
+            header = struct.unpack(zipfile.structFileHeader, header)
+            fobj.seek(header[zipfile._FH_FILENAME_LENGTH] +
+                      header[zipfile._FH_EXTRA_FIELD_LENGTH], os.SEEK_CUR)
+            data = fobj.read(entry['compress_size'])
+
+        if entry['compress_type'] == zipfile.ZIP_DEFLATED:
             try:
-                return cont.decode(codec)
-            except UnicodeDecodeError:
-                cont = cont.decode(codec, 'ignore')
-                # L10n: {0} is the filename.
-                self.selected['msg'] = (
-                    _('Problems decoding {0}.').format(codec))
-                return cont
+                # Never inflate more than the entry claims to hold.
+                data = zlib.decompressobj(-zlib.MAX_WBITS).decompress(
+                    data, entry['size'] + 1)
+            except zlib.error, err:
+                raise zipfile.BadZipfile('Error inflating %s: %s' %
+                                         (entry['short'], err))
+        elif entry['compress_type'] != zipfile.ZIP_STORED:
+            raise zipfile.BadZipfile('Unsupported compression for %s' %
+                                     entry['short'])
+
+        if (len(data) != entry['size'] or
+                zlib.crc32(data) & 0xffffffff != entry['crc']):
+            raise zipfile.BadZipfile('Bad CRC-32 for %s' % entry['short'])
+        return data
 
     def _process_manifest(self, data):
         """
@@ -240,15 +341,39 @@ class FileViewer(object):
         if self._files:
             return self._files
 
-        if not self.is_extracted():
+        index = self.get_index()
+        if index is None:
             return {}
-        # In case a cron job comes along and deletes the files
-        # mid tree building.
-        try:
-            self._files = self._get_files()
-            return self._files
-        except (OSError, IOError):
+        self._files = self._get_files(index)
+        return self._files
+
+    def get_index(self):
+        """
+        Returns the cached index of the entries of the zip, or None if the
+        file isn't indexed yet.
+        """
+        if Message(self._extraction_cache_key()).get():
+            return None
+        return cache_get_chunked(self._index_cache_key())
+
+    def get_fingerprints(self):
+        """
+        Returns a dict of the path of every entry of the zip to its
+        fingerprint: the SHA-256 of its contents for files, None for
+        directories.
+        Returns an empty dict if the file isn't indexed yet.
+        """
+        if Message(self._extraction_cache_key()).get():
             return {}
+        fingerprints = cache_get_chunked(self._fingerprints_cache_key())
+        if fingerprints is None:
+            index = cache_get_chunked(self._index_cache_key())
+            if index is None:
+                return {}
+            fingerprints = self._get_fingerprints(index)
+            cache_set_chunked(self._fingerprints_cache_key(), fingerprints,
+                              FILE_VIEWER_INDEX_TIMEOUT)
+        return fingerprints
 
     def truncate(self, filename, pre_length=15, post_length=10,
                  ellipsis=u'..'):
@@ -287,62 +412,110 @@ class FileViewer(object):
                 return short
         return 'plain'
 
-    @memoize(prefix='file-viewer', time=60 * 60)
-    def _get_files(self):
-        all_files, res = [], OrderedDict()
-        # Not using os.path.walk so we get just the right order.
+    def _get_index(self, zip_):
+        """
+        Returns the list of the entries of a (validated) SafeUnzip, in the
+        order of the file tree: directories first, then files, both sorted.
+        Directories that only exist as a prefix of other entries are added.
+        """
+        entries, children = {}, {}
+
+        def add(entry):
+            short = entry['short']
+            if short in entries:
+                return
+            entries[short] = entry
+            parent = os.path.dirname(short)
+            children.setdefault(parent, ([], []))[
+                0 if entry['directory'] else 1].append(short)
+            if parent:
+                add(self._index_entry(parent, entry['modified']))
+
+        for info in zip_.info:
+            short = smart_unicode(info.filename.rstrip('/'), errors='replace')
+            if not short:
+                continue
+            modified = time.mktime(info.date_time + (0, 0, -1))
+            if info.filename.endswith('/'):
+                add(self._index_entry(short, modified))
+            else:
+                with zip_.zip.open(info) as opened:
+                    head = opened.read(4)
+                    sha256 = hashlib.sha256(head)
+                    for chunk in iter(lambda: opened.read(64 * 1024), ''):
+                        sha256.update(chunk)
+                add(self._index_entry(short, modified, info, head,
+                                      sha256.hexdigest()))
+
+        index = []
 
         def iterate(path):
-            path_dirs, path_files = storage.listdir(path)
-            for dirname in sorted(path_dirs):
-                full = os.path.join(path, dirname)
-                all_files.append(full)
-                iterate(full)
-
-            for filename in sorted(path_files):
-                full = os.path.join(path, filename)
-                all_files.append(full)
-
-        iterate(self.dest)
-
-        for path in all_files:
-            filename = smart_unicode(os.path.basename(path), errors='replace')
-            short = smart_unicode(path[len(self.dest) + 1:], errors='replace')
-            mime, encoding = mimetypes.guess_type(filename)
-            if not mime and filename == 'manifest.webapp':
-                mime = 'application/x-web-app-manifest+json'
-            directory = os.path.isdir(path)
-
-            res[short] = {
-                'binary': self._is_binary(mime, path),
-                'depth': short.count(os.sep),
-                'directory': directory,
-                'filename': filename,
-                'full': path,
-                'md5': get_md5(path) if not directory else '',
-                'mimetype': mime or 'application/octet-stream',
-                'syntax': self.get_syntax(filename),
-                'modified': os.stat(path)[stat.ST_MTIME],
-                'short': short,
-                'size': os.stat(path)[stat.ST_SIZE],
-                'truncated': self.truncate(filename),
+            path_dirs, path_files = children.get(path, ([], []))
+            for short in sorted(path_dirs):
+                index.append(entries[short])
+                iterate(short)
+            for short in sorted(path_files):
+                index.append(entries[short])
+
+        iterate(u'')
+        return index
+
+    def _index_entry(self, short, modified, info=None, head='', sha256=''):
+        filename = os.path.basename(short)
+        mime, encoding = mimetypes.guess_type(filename)
+        if not mime and filename == 'manifest.webapp':
+            mime = 'application/x-web-app-manifest+json'
+        return {
+            'binary': self._is_binary(mime, filename, head) if info else False,
+            'compress_size': info.compress_size if info else 0,
+            'compress_type': info.compress_type if info else None,
+            'crc': info.CRC if info else 0,
+            'directory': info is None,
+            'filename': filename,
+            'mimetype': mime or 'application/octet-stream',
+            'modified': modified,
+            'offset': info.header_offset if info else None,
+            'sha256': sha256,
+            'short': short,
+            'size': info.file_size if info else 0,
+            'syntax': self.get_syntax(filename),
+        }
+
+    def _get_fingerprints(self, index):
+        return dict((entry['short'],
+                     None if entry['directory'] else entry['sha256'])
+                    for entry in index)
+
+    def _get_files(self, index):
+        res = OrderedDict()
+        for entry in index:
+            short = entry['short']
+            res[short] = dict(entry, **{
+                'depth': short.count('/'),
+                'hash': entry['sha256'],
+                'truncated': self.truncate(entry['filename']),
                 'url': reverse('mkt.files.list',
                                args=[self.file.id, 'file', short]),
                 'url_serve': reverse('mkt.files.redirect',
                                      args=[self.file.id, short]),
                 'version': self.file.version.version,
-            }
-
+            })
         return res
 
 
 class DiffHelper(object):
+    """
+    Compares two files, `left` being the newer one. What changed between them
+    is worked out from the fingerprints of their entries alone, the contents
+    of a file are only read once it's selected.
+    """
 
     def __init__(self, left, right):
         self.left = FileViewer(left)
         self.right = FileViewer(right)
         self.addon = self.left.addon
         self.key = None
+        self._changes = None
 
     def __str__(self):
         return '%s:%s' % (self.left, self.right)
@@ -362,28 +535,41 @@ class DiffHelper(object):
                        args=[self.left.file.id, self.right.file.id,
                              'file', short])
 
+    def get_changes(self):
+        """
+        Returns the sets of the paths changed, added and deleted between
+        right and left, from the fingerprints of both files.
+        """
+        if self._changes is None:
+            left = self.left.get_fingerprints()
+            right = self.right.get_fingerprints()
+            changed = set(key for key, fingerprint in left.iteritems()
+                          if key in right and right[key] != fingerprint)
+            added = set(left).difference(right)
+            deleted = set(right).difference(left)
+            self._changes = changed, added, deleted
+        return self._changes
+
     def get_files(self):
         """
         Get the files from the primary and:
         - remap any diffable ones to the compare url as opposed to the other
         - highlight any diffs
         """
+        changed, added, deleted = self.get_changes()
+        different = changed | added
         left_files = self.left.get_files()
-        right_files = self.right.get_files()
-        different = []
         for key, file in left_files.items():
             file['url'] = self.get_url(file['short'])
-            diff = file['md5'] != right_files.get(key, {}).get('md5')
-            file['diff'] = diff
-            if diff:
-                different.append(file)
+            file['diff'] = key in different
 
         # Now mark every directory above each different file as different.
-        for diff in different:
-            for depth in range(diff['depth']):
-                key = '/'.join(diff['short'].split('/')[:depth + 1])
-                if key in left_files:
-                    left_files[key]['diff'] = True
+        for key in different:
+            parts = key.split('/')
+            for depth in range(1, len(parts)):
+                parent = '/'.join(parts[:depth])
+                if parent in left_files:
+                    left_files[parent]['diff'] = True
 
         return left_files
 
@@ -393,22 +579,54 @@ class DiffHelper(object):
         are files that have been deleted between the two versions.
         Every element will be marked as a diff.
         """
-        different = OrderedDict()
-
-        left_files = self.left.get_files()
-        right_files = self.right.get_files()
-        for key, file in right_files.items():
-            if key not in left_files:
-                copy = right_files[key]
-                copy.update({'url': self.get_url(file['short']), 'diff': True})
-                different[key] = copy
-
+        deleted = self.get_changes()[2]
+        if not deleted:
+            return OrderedDict()
+
+        # Only build the deleted entries, not the whole of right's tree.
+        different = self.right._get_files(
+            [entry for entry in self.right.get_index() or []
+             if entry['short'] in deleted])
+        for key, file in different.items():
+            file.update({'url': self.get_url(file['short']), 'diff': True})
         return different
 
+    def _contents_cache_key(self):
+        """
+        The contents of the two selected files, cached per pair of files and
+        the path and SHA-256 of both entries.
+        """
+        left, right = self.left.selected, self.right.selected
+        if (not left or not right or left['directory'] or
+                right['directory']):
+            return None
+        return '%s:file-viewer:contents:%s:%s:%s' % (
+            settings.CACHE_PREFIX, self.left.file.id, self.right.file.id,
+            hashlib.md5(repr((left['short'], left['hash'],
+                              right['hash']))).hexdigest())
+
     def read_file(self):
         """Reads both selected files."""
-        return [self.left.read_file(allow_empty=True),
-                self.right.read_file(allow_empty=True)]
+        key = self._contents_cache_key()
+        contents = cache.get(key) if key else None
+        if contents is not None:
+            return contents
+
+        left = self.left.read_file(allow_empty=True)
+        if (key and self.left.selected['hash'] ==
+                self.right.selected['hash'] and
+                not self.left.selected.get('msg')):
+            # The file didn't change, no need to read it twice.
+            right = left
+        else:
+            right = self.right.read_file(allow_empty=True)
+        contents = [left, right]
+
+        # Don't cache around the messages of files that couldn't be read.
+        if key and not (self.left.selected.get('msg') or
+                        self.right.selected.get('msg')):
+            cache.set(key, contents, FILE_VIEWER_INDEX_TIMEOUT)
+        return contents
 
     def select(self, key):
         """
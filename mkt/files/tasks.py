@@ -21,7 +21,7 @@ def extract_file(file_id, **kw):
     msg.delete()
     # This flag is so that we can signal when the extraction is completed.
     flag = Message(viewer._extraction_cache_key())
-    task_log.debug('[1@%s] Unzipping %s for file viewer.' % (
+    task_log.debug('[1@%s] Indexing %s for file viewer.' % (
         extract_file.rate_limit, viewer))
 
     try:
@@ -0,0 +1,22 @@
+import os
+import shutil
+import tempfile
+import zipfile
+
+
+def rezip(path, add=None, remove=()):
+    """
+    Rewrite the zip file at `path`, adding (or replacing) the entries of the
+    `add` dict of names to contents and dropping the entries in `remove`.
+    """
+    add = add or {}
+    fd, tmp = tempfile.mkstemp()
+    os.close(fd)
+    with zipfile.ZipFile(path) as src:
+        with zipfile.ZipFile(tmp, 'w', zipfile.ZIP_DEFLATED) as dest:
+            for info in src.infolist():
+                if info.filename not in add and info.filename not in remove:
+                    dest.writestr(info, src.read(info))
+            for name, contents in add.items():
+                dest.writestr(name, contents)
+    shutil.move(tmp, path)
@@ -1,18 +1,23 @@
 # -*- coding: utf-8 -*-
+import cPickle
+import hashlib
 import os
 import re
+import shutil
+import tempfile
 import zipfile
 
 from django import forms
 from django.conf import settings
 from django.core.cache import cache
-from django.core.files.storage import default_storage as storage
 from django.core.urlresolvers import reverse
 
 from mock import Mock, patch
-from nose.tools import eq_
+from nose.tools import eq_, ok_
 
-from mkt.files.helpers import FileViewer, DiffHelper
+from mkt.files.helpers import (cache_delete_chunked, cache_get_chunked,
+                               cache_set_chunked, FileViewer, DiffHelper)
+from mkt.files.tests import rezip
 from mkt.files.utils import SafeUnzip
 from mkt.site.tests import MktPaths, TestCase
 
@@ -36,15 +41,43 @@ def make_file(pk, file_path, **kwargs):
     return obj
 
 
+# The default maximum size of a memcached item.
+MEMCACHED_ITEM_SIZE = 1024 * 1024
+
+
+def memcached_set_many(data, timeout=None):
+    """Like memcached, refuse to cache items that are too large."""
+    for key, value in data.items():
+        if len(cPickle.dumps(value, cPickle.HIGHEST_PROTOCOL)) < (
+                MEMCACHED_ITEM_SIZE):
+            cache.set(key, value, timeout)
+
+
+def large_index(count=30000):
+    """An index too large to fit in a memcached item, even compressed."""
+    return [{'short': os.urandom(32).encode('hex'), 'directory': False,
+             'crc': i, 'size': i} for i in xrange(count)]
+
+
+def copy_file(src):
+    """Copy a fixture somewhere the test can modify it."""
+    fd, dest = tempfile.mkstemp(suffix=os.path.splitext(src)[1])
+    os.close(fd)
+    shutil.copyfile(src, dest)
+    return dest
+
+
 # TODO: It'd be nice if these used packaged app examples but these addons still
 # flex the code so it wasn't converted.
 class TestFileHelper(TestCase):
 
     def setUp(self):
-        self.viewer = FileViewer(make_file(1, get_file('dictionary-test.xpi')))
+        self.src = copy_file(get_file('dictionary-test.xpi'))
+        self.viewer = FileViewer(make_file(1, self.src))
 
     def tearDown(self):
         self.viewer.cleanup()
+        os.remove(self.src)
 
     def test_files_not_extracted(self):
         eq_(self.viewer.is_extracted(), False)
@@ -84,6 +117,31 @@ class TestFileHelper(TestCase):
         eq_(files['__MACOSX']['directory'], True)
         eq_(files['__MACOSX']['binary'], False)
 
+    def test_get_files_hash(self):
+        self.viewer.extract()
+        files = self.viewer.get_files()
+        with zipfile.ZipFile(self.src) as zip_:
+            data = zip_.read('install.js')
+        eq_(files['install.js']['hash'], hashlib.sha256(data).hexdigest())
+        eq_(files['__MACOSX']['hash'], '')
+
+    def test_get_files_cached(self):
+        self.viewer.extract()
+        os.remove(self.src)
+        open(self.src, 'w').close()
+        # The listing doesn't need the zip anymore.
+        eq_(len(FileViewer(make_file(1, self.src)).get_files()), 15)
+
+    def test_get_fingerprints(self):
+        eq_(self.viewer.get_fingerprints(), {})
+        self.viewer.extract()
+        fingerprints = self.viewer.get_fingerprints()
+        with zipfile.ZipFile(self.src) as zip_:
+            data = zip_.read('install.js')
+        eq_(fingerprints['install.js'], hashlib.sha256(data).hexdigest())
+        eq_(fingerprints['__MACOSX'], None)
+        eq_(sorted(fingerprints), sorted(self.viewer.get_files()))
+
     def test_url_file(self):
         self.viewer.extract()
         files = self.viewer.get_files()
@@ -96,13 +154,23 @@ class TestFileHelper(TestCase):
         files = self.viewer.get_files()
         eq_(files['dictionaries/license.txt']['depth'], 1)
 
+    def test_read_file(self):
+        self.viewer.extract()
+        self.viewer.select('install.js')
+        with zipfile.ZipFile(self.src) as zip_:
+            eq_(self.viewer.read_file(), zip_.read('install.js'))
+
+    def test_read_file_binary_detection(self):
+        rezip(self.src, add={'file.txt': 'MZ'})
+        self.viewer.extract()
+        self.viewer.select('file.txt')
+        assert self.viewer.is_binary()
+
     def test_bom(self):
-        dest = os.path.join(settings.TMP_PATH, 'test_bom')
-        open(dest, 'w').write('foo'.encode('utf-16'))
+        rezip(self.src, add={'foo': 'foo'.encode('utf-16')})
+        self.viewer.extract()
         self.viewer.select('foo')
-        self.viewer.selected = {'full': dest, 'size': 1}
         eq_(self.viewer.read_file(), u'foo')
-        os.remove(dest)
 
     def test_syntax(self):
         for filename, syntax in [('foo.rdf', 'xml'),
@@ -117,15 +185,9 @@ class TestFileHelper(TestCase):
             eq_(self.viewer.get_syntax(filename), syntax)
 
     def test_file_order(self):
+        # Directories only implied by the files in them are listed too.
+        rezip(self.src, add={'manifest.webapp': '', 'chrome/foo': ''})
         self.viewer.extract()
-        dest = self.viewer.dest
-        storage.open(os.path.join(dest, 'manifest.webapp'), 'w').close()
-        subdir = os.path.join(dest, 'chrome')
-        storage.open(os.path.join(subdir, 'foo'), 'w').close()
-        if not storage.exists(subdir):
-            # might be on S3, which doesn't have directories
-            storage.open(subdir, 'w').close()
-        cache.clear()
         files = self.viewer.get_files().keys()
         rt = files.index(u'chrome')
         eq_(files[rt:rt + 3], [u'chrome', u'chrome/foo', u'dictionaries'])
@@ -156,29 +218,67 @@ class TestFileHelper(TestCase):
     def test_default(self):
         eq_(self.viewer.get_default(None), 'manifest.webapp')
 
+    @patch.object(cache, 'set_many', memcached_set_many)
+    def test_large_index(self):
+        index = large_index()
+        with patch.object(FileViewer, '_get_index', lambda *args: index):
+            self.viewer.extract()
+        eq_(self.viewer.is_extracted(), True)
+        eq_(self.viewer.get_index(), index)
+        eq_(len(self.viewer.get_fingerprints()), len(index))
+
+    @patch.object(cache, 'set', lambda *args: None)
+    @patch.object(cache, 'set_many', lambda *args: None)
+    def test_index_not_cached(self):
+        with self.assertRaises(IOError):
+            self.viewer.extract()
+        eq_(self.viewer.is_extracted(), False)
+
     def test_delete_mid_read(self):
         self.viewer.extract()
         self.viewer.select('install.js')
-        os.remove(os.path.join(self.viewer.dest, 'install.js'))
+        rezip(self.src, remove=['install.js'])
         res = self.viewer.read_file()
         eq_(res, '')
         assert self.viewer.selected['msg'].startswith('That file no')
 
-    @patch('mkt.files.helpers.get_md5')
-    def test_delete_mid_tree(self, get_md5):
-        get_md5.side_effect = IOError('ow')
-        self.viewer.extract()
-        eq_({}, self.viewer.get_files())
+
+class TestChunkedCache(TestCase):
+
+    @patch.object(cache, 'set_many', memcached_set_many)
+    def test_large_value(self):
+        value = large_index()
+        ok_(len(cPickle.dumps(value, cPickle.HIGHEST_PROTOCOL)) >
+            MEMCACHED_ITEM_SIZE)
+        cache_set_chunked('large', value, 60)
+        ok_(cache.get('large') > 1)
+        eq_(cache_get_chunked('large'), value)
+
+    def test_missing_chunk(self):
+        cache_set_chunked('large', large_index(), 60)
+        cache.delete('large:1')
+        eq_(cache_get_chunked('large'), None)
+
+    def test_delete(self):
+        cache_set_chunked('large', large_index(), 60)
+        count = cache.get('large')
+        cache_delete_chunked('large', 'missing')
+        eq_(cache.get('large'), None)
+        eq_(cache.get_many(['large:%s' % i for i in range(count)]), {})
 
 
 class TestDiffHelper(TestCase, MktPaths):
 
     def setUp(self):
         src = self.packaged_app_path('signed.zip')
-        self.helper = DiffHelper(make_file(1, src), make_file(2, src))
+        self.left_src, self.right_src = copy_file(src), copy_file(src)
+        self.helper = DiffHelper(make_file(1, self.left_src),
+                                 make_file(2, self.right_src))
 
     def tearDown(self):
         self.helper.cleanup()
+        os.remove(self.left_src)
+        os.remove(self.right_src)
 
     def test_files_not_extracted(self):
         eq_(self.helper.is_extracted(), False)
@@ -197,8 +297,8 @@ class TestDiffHelper(TestCase, MktPaths):
         assert self.helper.is_diffable()
 
     def test_diffable_one_missing(self):
+        rezip(self.right_src, remove=['index.html'])
         self.helper.extract()
-        os.remove(os.path.join(self.helper.right.dest, 'index.html'))
         self.helper.select('index.html')
         assert self.helper.is_diffable()
 
@@ -213,8 +313,8 @@ class TestDiffHelper(TestCase, MktPaths):
         assert not self.helper.is_diffable()
 
     def test_diffable_deleted_files(self):
+        rezip(self.left_src, remove=['index.html'])
         self.helper.extract()
-        os.remove(os.path.join(self.helper.left.dest, 'index.html'))
         eq_('index.html' in self.helper.get_deleted_files(), True)
 
     def test_diffable_one_binary_same(self):
@@ -224,18 +324,16 @@ class TestDiffHelper(TestCase, MktPaths):
         assert self.helper.is_binary()
 
     def test_diffable_one_binary_diff(self):
+        self.change(self.left_src, 'asd')
         self.helper.extract()
-        self.change(self.helper.left.dest, 'asd')
-        cache.clear()
         self.helper.select('main.js')
         self.helper.left.selected['binary'] = True
         assert self.helper.is_binary()
 
     def test_diffable_two_binary_diff(self):
+        self.change(self.left_src, 'asd')
+        self.change(self.right_src, 'asd123')
         self.helper.extract()
-        self.change(self.helper.left.dest, 'asd')
-        self.change(self.helper.right.dest, 'asd123')
-        cache.clear()
         self.helper.select('main.js')
         self.helper.left.selected['binary'] = True
         self.helper.right.selected['binary'] = True
@@ -248,20 +346,81 @@ class TestDiffHelper(TestCase, MktPaths):
         assert not self.helper.is_diffable()
         assert self.helper.left.selected['msg'].startswith('This file')
 
+    def test_get_changes(self):
+        self.change(self.left_src, 'asd')
+        rezip(self.left_src, add={'new.js': 'new'}, remove=['index.html'])
+        self.helper.extract()
+        eq_(self.helper.get_changes(),
+            (set(['main.js']), set(['new.js']), set(['index.html'])))
+        files = self.helper.get_files()
+        eq_([key for key, file in files.items() if file['diff']],
+            ['main.js', 'new.js'])
+        eq_(self.helper.get_deleted_files().keys(), ['index.html'])
+
+    def test_get_changes_same(self):
+        self.helper.extract()
+        eq_(self.helper.get_changes(), (set(), set(), set()))
+        eq_(self.helper.get_deleted_files(), {})
+
+    def test_read_file_cached(self):
+        self.change(self.left_src, 'asd')
+        self.helper.extract()
+        self.helper.select('main.js')
+        left, right = self.helper.read_file()
+        eq_(left, right + 'asd')
+
+        with patch.object(FileViewer, 'read_entry') as read_entry:
+            eq_(self.helper.read_file(), [left, right])
+        assert not read_entry.called
+
+    def test_read_file_cached_per_file(self):
+        self.helper.extract()
+        self.helper.select('main.js')
+        self.helper.read_file()
+
+        # The same contents in other files aren't read from their cache.
+        helper = DiffHelper(make_file(3, self.left_src),
+                            make_file(4, self.right_src))
+        helper.extract()
+        helper.select('main.js')
+        with patch.object(FileViewer, 'read_entry') as read_entry:
+            read_entry.return_value = 'foo'
+            eq_(helper.read_file(), ['foo', 'foo'])
+        assert read_entry.called
+        helper.cleanup()
+
+    def test_get_changes_same_crc(self):
+        self.helper.extract()
+        # Files with the same CRC32 and size but different contents.
+        for viewer, sha256 in ((self.helper.left, 'a'),
+                               (self.helper.right, 'b')):
+            index = [dict(entry, sha256=sha256)
+                     if entry['short'] == 'main.js' else entry
+                     for entry in viewer.get_index()]
+            viewer.cleanup()
+            with patch.object(FileViewer, '_get_index', lambda *a: index):
+                viewer.extract()
+        eq_(self.helper.get_changes(), (set(['main.js']), set(), set()))
+
+    def test_read_file_unchanged(self):
+        self.helper.extract()
+        self.helper.select('main.js')
+        with patch.object(FileViewer, 'read_entry') as read_entry:
+            read_entry.return_value = 'foo'
+            eq_(self.helper.read_file(), ['foo', 'foo'])
+        eq_(read_entry.call_count, 1)
+
     def test_diffable_parent(self):
+        self.change(self.left_src, 'asd', filename='META-INF/ids.json')
         self.helper.extract()
-        self.change(self.helper.left.dest, 'asd',
-                    filename='META-INF/ids.json')
-        cache.clear()
         files = self.helper.get_files()
         eq_(files['META-INF/ids.json']['diff'], True)
         eq_(files['META-INF']['diff'], True)
 
-    def change(self, file, text, filename='main.js'):
-        path = os.path.join(file, filename)
-        data = open(path, 'r').read()
-        data += text
-        open(path, 'w').write(data)
+    def change(self, src, text, filename='main.js'):
+        with zipfile.ZipFile(src) as zip_:
+            data = zip_.read(filename)
+        rezip(src, add={filename: data + text})
 
 
 class TestSafeUnzipFile(TestCase, MktPaths):
@@ -2,6 +2,7 @@ import json
 import os
 import shutil
 import urlparse
+import zipfile
 
 from django.conf import settings
 from django.core.cache import cache
@@ -10,7 +11,6 @@ from django.utils.http import http_date
 
 from cache_nuggets.lib import Message
 from mock import patch
-from nose import SkipTest
 from nose.tools import eq_
 from pyquery import PyQuery as pq
 
@@ -18,6 +18,7 @@ import mkt
 import mkt.site.tests
 from mkt.files.helpers import DiffHelper, FileViewer
 from mkt.files.models import File
+from mkt.files.tests import rezip
 from mkt.site.fixtures import fixture
 from mkt.users.models import UserProfile
 from mkt.webapps.models import Webapp
@@ -116,7 +117,7 @@ class FilesBase(object):
         self.file_viewer.extract()
         self.file_viewer.select('manifest.webapp')
         obj = getattr(self.file_viewer, 'left', self.file_viewer)
-        etag = obj.selected.get('md5')
+        etag = obj.selected.get('hash')
         res = self.client.get(self.file_url('manifest.webapp'),
                               HTTP_IF_NONE_MATCH=etag)
         eq_(res.status_code, 304)
@@ -234,8 +235,8 @@ class TestFileViewer(FilesBase, mkt.site.tests.WebappTestCase):
                 (url, status_code, status))
 
     def add_file(self, name, contents):
-        dest = os.path.join(self.file_viewer.dest, name)
-        open(dest, 'w').write(contents)
+        rezip(self.file_viewer.src, add={name: contents})
+        self.file_viewer.extract()
 
     def test_files_xss(self):
         self.file_viewer.extract()
@@ -262,9 +263,6 @@ class TestFileViewer(FilesBase, mkt.site.tests.WebappTestCase):
     def test_content_xss(self):
         self.file_viewer.extract()
         for name in ['file.txt', 'file.html', 'file.htm']:
-            # If you are adding files, you need to clear out the memcache
-            # file listing.
-            cache.clear()
             self.add_file(name, '<script>alert("foo")</script>')
             res = self.client.get(self.file_url(name))
             doc = pq(res.content)
@@ -276,7 +274,7 @@ class TestFileViewer(FilesBase, mkt.site.tests.WebappTestCase):
         self.add_file('file.php', '<script>alert("foo")</script>')
         res = self.client.get(self.file_url('file.php'))
         eq_(res.status_code, 200)
-        assert self.file_viewer.get_files()['file.php']['md5'] in res.content
+        assert self.file_viewer.get_files()['file.php']['hash'] in res.content
 
     def test_tree_no_file(self):
         self.file_viewer.extract()
@@ -320,15 +318,12 @@ class TestFileViewer(FilesBase, mkt.site.tests.WebappTestCase):
         eq_(res.status_code, 403)
 
     def test_bounce(self):
-        # Don't run this test if the server has x-sendfile turned off.
-        if not settings.XSENDFILE:
-            raise SkipTest()
-
         self.file_viewer.extract()
         res = self.client.get(self.files_redirect(binary), follow=True)
         eq_(res.status_code, 200)
-        eq_(res[settings.XSENDFILE_HEADER],
-            self.file_viewer.get_files().get(binary)['full'])
+        eq_(res['Content-Type'], 'image/png')
+        with zipfile.ZipFile(self.file.file_path) as zip_:
+            eq_(res.content, zip_.read(binary))
 
     @patch.object(settings, 'FILE_VIEWER_SIZE_LIMIT', 5)
     def test_file_size(self):
@@ -368,8 +363,12 @@ class TestDiffViewer(FilesBase, mkt.site.tests.WebappTestCase):
                                                        self.files[1].pk])
 
     def add_file(self, file_obj, name, contents):
-        dest = os.path.join(file_obj.dest, name)
-        open(dest, 'w').write(contents)
+        rezip(file_obj.src, add={name: contents})
+        file_obj.extract()
+
+    def remove_file(self, file_obj, name):
+        rezip(file_obj.src, remove=[name])
+        file_obj.extract()
 
     def file_url(self, file=None):
         args = [self.files[0].pk, self.files[1].pk]
@@ -412,7 +411,7 @@ class TestDiffViewer(FilesBase, mkt.site.tests.WebappTestCase):
 
     def test_view_one_missing(self):
         self.file_viewer.extract()
-        os.remove(os.path.join(self.file_viewer.right.dest, 'script.js'))
+        self.remove_file(self.file_viewer.right, 'script.js')
         res = self.client.get(self.file_url(not_binary))
         doc = pq(res.content)
         eq_(len(doc('pre')), 3)
@@ -420,22 +419,20 @@ class TestDiffViewer(FilesBase, mkt.site.tests.WebappTestCase):
 
     def test_view_left_binary(self):
         self.file_viewer.extract()
-        filename = os.path.join(self.file_viewer.left.dest, 'script.js')
-        open(filename, 'w').write('MZ')
+        self.add_file(self.file_viewer.left, 'script.js', 'MZ')
         res = self.client.get(self.file_url(not_binary))
         assert 'This file is not viewable online' in res.content
 
     def test_view_right_binary(self):
         self.file_viewer.extract()
-        filename = os.path.join(self.file_viewer.right.dest, 'script.js')
-        open(filename, 'w').write('MZ')
+        self.add_file(self.file_viewer.right, 'script.js', 'MZ')
         assert not self.file_viewer.is_diffable()
         res = self.client.get(self.file_url(not_binary))
         assert 'This file is not viewable online' in res.content
 
     def test_different_tree(self):
         self.file_viewer.extract()
-        os.remove(os.path.join(self.file_viewer.left.dest, not_binary))
+        self.remove_file(self.file_viewer.left, not_binary)
         res = self.client.get(self.file_url(not_binary))
         doc = pq(res.content)
         eq_(doc('h4:last').text(), 'Deleted files:')
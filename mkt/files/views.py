@@ -1,3 +1,4 @@
+import zipfile
 from urlparse import urljoin
 
 from django import http, shortcuts
@@ -20,7 +21,6 @@ from mkt.files.decorators import (compare_webapp_file_view, etag,
                                   webapp_file_view_token)
 from mkt.files.tasks import extract_file
 from mkt.site.decorators import json_view
-from mkt.site.utils import HttpResponseSendFile
 
 log = commonware.log.getLogger('z.addons')
 
@@ -190,5 +190,11 @@ def serve(request, viewer, key):
         log.error(u'Couldn\'t find %s in %s (%d entries) for file %s' %
                   (key, files.keys()[:10], len(files.keys()), viewer.file.id))
         raise http.Http404()
-    return HttpResponseSendFile(request, obj['full'],
-                                content_type=obj['mimetype'])
+    if obj['directory']:
+        raise http.Http404()
+    try:
+        content = viewer.read_entry(obj)
+    except (IOError, zipfile.BadZipfile):
+        log.error(u'Couldn\'t read %s from file %s' % (key, viewer.file.id))
+        raise http.Http404()
+    return http.HttpResponse(content, content_type=obj['mimetype'])
@@ -11,6 +11,8 @@ class AppLookupSerializer(ESAppSerializer):
     url = serializers.SerializerMethodField('get_app_summary_url')
     status = serializers.SerializerMethodField('get_app_status')
 
+    source_fields = dict(ESAppSerializer.source_fields, app_slug=(), url=())
+
     class Meta(ESAppSerializer.Meta):
         fields = ['app_slug', 'id', 'name', 'status', 'url']
 
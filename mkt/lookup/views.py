@@ -454,6 +454,7 @@ class AppLookupSearchView(SearchView):
     serializer_class = AppLookupSerializer
     paginate_by = lkp.SEARCH_LIMIT
     max_paginate_by = lkp.MAX_RESULTS
+    cursor_pagination = True
 
     def get_paginate_by(self, *args, **kwargs):
         if self.request.GET.get(self.paginate_by_param) == 'max':
@@ -469,6 +470,7 @@ class WebsiteLookupSearchView(WebsiteSearchView):
     serializer_class = WebsiteLookupSerializer
     paginate_by = lkp.SEARCH_LIMIT
     max_paginate_by = lkp.MAX_RESULTS
+    cursor_pagination = True
 
     def get_paginate_by(self, *args, **kwargs):
         if self.request.GET.get(self.paginate_by_param) == 'max':
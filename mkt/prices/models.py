@@ -1,7 +1,10 @@
+import threading
+import time
 import uuid
 
 from django.conf import settings
 from django.core.cache import cache
+from django.core.signals import request_finished
 from django.db import models
 from django.dispatch import receiver
 from django.forms.models import model_to_dict
@@ -10,6 +13,7 @@ from django.utils import translation
 import commonware.log
 from babel import numbers
 from cache_nuggets.lib import memoize_key
+from celery.signals import task_postrun
 from jinja2.filters import do_dictsort
 from tower import ugettext_lazy as _
 
@@ -18,17 +22,26 @@ from lib.constants import ALL_CURRENCIES
 from mkt.constants import apps
 from mkt.constants.payments import (CARRIER_CHOICES, PAYMENT_METHOD_ALL,
                                     PAYMENT_METHOD_CHOICES, PROVIDER_CHOICES,
-                                    PROVIDER_LOOKUP_INVERTED)
+                                    PROVIDER_LOOKUP_INVERTED,
+                                    REFUNDS_COUNTER_CACHE_KEY)
 from mkt.constants.regions import RESTOFWORLD, REGIONS_CHOICES_ID_DICT as RID
 from mkt.purchase.models import Contribution
 from mkt.regions.utils import remove_accents
 from mkt.site.decorators import write
 from mkt.site.models import ManagerBase, ModelBase
+from mkt.site.utils import cache_ns_key
 from mkt.translations.utils import get_locale_from_lang
 from mkt.users.models import UserProfile
 
 log = commonware.log.getLogger('z.market')
 
+PRICE_MATRIX_NAMESPACE = 'prices:matrix'
+
+# The PriceMatrix of this process. The calling thread checks it against the
+# version in the cache once per request or task.
+_price_matrix = {}
+_price_matrix_local = threading.local()
+
 
 def default_providers():
     """
@@ -54,6 +67,22 @@ def price_locale(price, currency):
     return pricestr
 
 
+def find_price_data(get_price_currency, carrier=None, regions=None,
+                    provider=None):
+    """
+    Returns a tuple of Decimal(price), currency for the first of `regions`
+    that `get_price_currency(carrier=, region=, provider=)` returns a
+    PriceCurrency for, or (None, None).
+    """
+    for region in regions:
+        price_currency = get_price_currency(carrier=carrier, region=region,
+                                            provider=provider)
+        if price_currency:
+            return price_currency.price, price_currency.currency
+
+    return None, None
+
+
 def price_key(data):
     return ('carrier={carrier}|tier={tier}|region={region}|provider={provider}'
             .format(**data))
@@ -61,10 +90,6 @@ def price_key(data):
 
 class PriceManager(ManagerBase):
 
-    def get_queryset(self):
-        qs = super(PriceManager, self).get_queryset()
-        return qs.transform(Price.transformer)
-
     def active(self):
         return self.filter(active=True).order_by('price')
 
@@ -94,15 +119,6 @@ class Price(ModelBase):
         # Display the price in unamiguous USD, eg: 0.99 USD
         return '{0} USD'.format(self.price)
 
-    @staticmethod
-    def transformer(prices):
-        # There are a constrained number of price currencies, let's just
-        # get them all.
-        Price._currencies = dict(
-            (price_key(model_to_dict(p)), p)
-            for p in PriceCurrency.objects.filter(tier__active=True)
-        )
-
     def get_price_currency(self, carrier=None, region=None, provider=None):
         """
         Returns the PriceCurrency object or none.
@@ -117,20 +133,8 @@ class Price(ModelBase):
         # however we might need to think about this for the long term.
         provider = (provider or
                     ALL_PROVIDERS[settings.DEFAULT_PAYMENT_PROVIDER].provider)
-        if not hasattr(Price, '_currencies'):
-            Price.transformer([])
-
-        lookup = price_key({
-            'tier': self.id, 'carrier': carrier,
-            'provider': provider, 'region': region
-        })
-
-        try:
-            price_currency = Price._currencies[lookup]
-        except KeyError:
-            return None
-
-        return price_currency
+        return get_price_matrix().get_price_currency(
+            self.id, carrier=carrier, region=region, provider=provider)
 
     def get_price_data(self, carrier=None, regions=None, provider=None):
         """
@@ -142,14 +146,8 @@ class Price(ModelBase):
             default to RESTOFWORLD.
         :param optional provider: an int for the provider. Defaults to bango.
         """
-        for region in regions:
-            price_currency = self.get_price_currency(carrier=carrier,
-                                                     region=region,
-                                                     provider=provider)
-            if price_currency:
-                return price_currency.price, price_currency.currency
-
-        return None, None
+        return find_price_data(self.get_price_currency, carrier=carrier,
+                               regions=regions, provider=provider)
 
     def get_price(self, carrier=None, regions=None, provider=None):
         """Return the price as a decimal for the current locale."""
@@ -171,8 +169,8 @@ class Price(ModelBase):
             If not provided it will use settings.PAYMENT_PROVIDERS,
         """
         providers = [provider] if provider else default_providers()
-        return [model_to_dict(o) for o in
-                self.pricecurrency_set.filter(provider__in=providers)]
+        return [dict(p) for p in get_price_matrix().prices(self.id)
+                if p['provider'] in providers]
 
     def regions_by_name(self, provider=None):
         """A list of price regions sorted by name.
@@ -268,6 +266,120 @@ class PriceCurrency(ModelBase):
         return u'%s, %s: %s' % (self.tier, self.currency, self.price)
 
 
+class PriceMatrix(object):
+    """
+    The currencies of every price tier, by tier, provider, region and carrier,
+    loaded in one go and shared by the processes through the cache.
+
+    A matrix is never modified: get_price_matrix() replaces it once a Price or
+    a PriceCurrency changes.
+    """
+    # The fields of each row, from model_to_dict().
+    fields = ('id', 'carrier', 'currency', 'price', 'provider', 'method',
+              'region', 'tier', 'dev', 'paid')
+
+    def __init__(self, version, rows, active_tiers):
+        self.version = version
+        # Tier id -> tuple of dicts like model_to_dict() returns, by id.
+        self.tiers = {}
+        # price_key() -> PriceCurrency, for the active tiers only.
+        self.currencies = {}
+        for row in rows:
+            data = dict(zip(self.fields, row))
+            self.tiers.setdefault(data['tier'], []).append(data)
+            if data['tier'] in active_tiers:
+                self.currencies[price_key(data)] = PriceCurrency(
+                    tier_id=data['tier'],
+                    **dict((k, v) for k, v in data.items() if k != 'tier'))
+        for tier, prices in self.tiers.items():
+            self.tiers[tier] = tuple(prices)
+
+    @classmethod
+    def load(cls):
+        """
+        Returns the rows of every PriceCurrency and the ids of the active
+        tiers, in the compact form kept in the cache.
+        """
+        rows = tuple(
+            tuple(model_to_dict(p)[field] for field in cls.fields)
+            for p in PriceCurrency.objects.no_cache().order_by('id'))
+        active_tiers = frozenset(Price.objects.no_cache().filter(active=True)
+                                 .values_list('id', flat=True))
+        return rows, active_tiers
+
+    def get_price_currency(self, tier, carrier=None, region=None,
+                           provider=None):
+        return self.currencies.get(price_key({
+            'tier': tier, 'carrier': carrier,
+            'provider': provider, 'region': region
+        }))
+
+    def prices(self, tier):
+        """The currencies of the tier, active or not, as dicts."""
+        return self.tiers.get(tier, ())
+
+
+def get_price_matrix():
+    """
+    Returns the current PriceMatrix.
+
+    The version stamp in the cache is checked once per request or task. The
+    matrix is loaded again, from the cache or else from the db, only when the
+    version changed.
+    """
+    matrix = _price_matrix.get('matrix')
+    if matrix is not None and getattr(_price_matrix_local, 'checked', False):
+        return matrix
+    version = cache_ns_key(PRICE_MATRIX_NAMESPACE)
+    _price_matrix_local.checked = True
+    if matrix is None or matrix.version != version:
+        data = cache.get(version)
+        if data is None:
+            data = PriceMatrix.load()
+            cache.set(version, data, None)
+        matrix = _price_matrix['matrix'] = PriceMatrix(version, *data)
+    return matrix
+
+
+def clear_price_matrix():
+    """
+    Forgets the PriceMatrix of this process, so the next call to
+    get_price_matrix() loads it again.
+    """
+    _price_matrix.clear()
+    _price_matrix_local.__dict__.clear()
+
+
+def invalidate_price_matrix():
+    """Bumps the version of the PriceMatrix, so every process reloads it."""
+    cache_ns_key(PRICE_MATRIX_NAMESPACE, increment=True)
+    clear_price_matrix()
+
+
+def _price_changed(sender, instance, **kw):
+    invalidate_price_matrix()
+    # The change is only committed at the end of the request: another process
+    # could load the old prices in between, so bump the version again then.
+    _price_matrix_local.changed = True
+
+
+def _price_matrix_done(**kwargs):
+    changed = getattr(_price_matrix_local, 'changed', False)
+    _price_matrix_local.__dict__.clear()
+    if changed:
+        invalidate_price_matrix()
+
+
+for _model in (Price, PriceCurrency):
+    for _signal in (models.signals.post_save, models.signals.post_delete):
+        _signal.connect(_price_changed, sender=_model,
+                        dispatch_uid='price_matrix_%s' % _model.__name__)
+request_finished.connect(_price_matrix_done,
+                         dispatch_uid='request_finished_price_matrix')
+task_postrun.connect(_price_matrix_done,
+                     dispatch_uid='task_postrun_price_matrix')
+
+
 @receiver(models.signals.post_save, sender=PriceCurrency,
           dispatch_uid='save_price_currency')
 @receiver(models.signals.post_delete, sender=PriceCurrency,
@@ -374,6 +486,12 @@ def create_addon_purchase(sender, instance, **kw):
                       % (p.pk, instance.addon.pk, instance.user.pk))
             p.update(type=instance.type)
 
+        # Make the receipt verifier drop its cached results.
+        try:
+            cache.incr(REFUNDS_COUNTER_CACHE_KEY)
+        except ValueError:
+            cache.set(REFUNDS_COUNTER_CACHE_KEY, int(time.time() * 1000), None)
+
     cache.delete(memoize_key('users:purchase-ids', instance.user.pk))
 
 
@@ -392,6 +510,23 @@ class AddonPremium(ModelBase):
         return bool(self.addon and self.price and self.addon.support_email)
 
 
+@receiver(models.signals.post_save, sender=AddonPremium,
+          dispatch_uid='save_addon_premium')
+@receiver(models.signals.post_delete, sender=AddonPremium,
+          dispatch_uid='delete_addon_premium')
+def update_addon_premium(sender, instance, **kw):
+    """
+    Ensure that when the price tier of an app changes, the app is re-indexed
+    into ES so that its prices are correct in search results.
+    """
+    if kw.get('raw'):
+        return
+
+    # Circular import sad face.
+    from mkt.webapps.tasks import index_webapps
+    index_webapps.delay([instance.addon_id])
+
+
 class RefundManager(ManagerBase):
 
     def by_addon(self, addon):
@@ -12,7 +12,8 @@ from mkt.constants import apps
 from mkt.constants.payments import PROVIDER_BANGO, PROVIDER_REFERENCE
 from mkt.constants.regions import (
     ALL_REGION_IDS, BRA, ESP, HUN, RESTOFWORLD, USA)
-from mkt.prices.models import AddonPremium, Price, PriceCurrency, Refund
+from mkt.prices.models import (AddonPremium, clear_price_matrix,
+                               get_price_matrix, Price, PriceCurrency, Refund)
 from mkt.purchase.models import Contribution
 from mkt.site.fixtures import fixture
 from mkt.users.models import UserProfile
@@ -39,8 +40,6 @@ class TestPrice(mkt.site.tests.TestCase):
 
     def setUp(self):
         self.tier_one = Price.objects.get(pk=1)
-        if hasattr(Price, '_currencies'):
-            del Price._currencies  # needed to pick up fixtures.
 
     def test_active(self):
         Price.objects.get(pk=2).update(active=False)
@@ -93,12 +92,36 @@ class TestPrice(mkt.site.tests.TestCase):
         eq_(Price.objects.get(pk=1).get_price_locale(regions=[RESTOFWORLD.id]),
             u'$0.99')
 
-    def test_transformer(self):
+    def test_price_matrix(self):
         price = Price.objects.get(pk=1)
+        # Warm up the price matrix.
         price.get_price_locale(regions=[RESTOFWORLD.id])
-        # Warm up Price._currencies.
         with self.assertNumQueries(0):
             eq_(price.get_price_locale(regions=[RESTOFWORLD.id]), u'$0.99')
+            eq_(len(price.prices()), 2)
+            eq_(Price.objects.get(pk=2).region_ids_by_name(),
+                [BRA.id, ESP.id, RESTOFWORLD.id])
+
+    def test_price_matrix_shared(self):
+        version = get_price_matrix().version
+        # Another process loads the matrix from the cache.
+        clear_price_matrix()
+        with self.assertNumQueries(0):
+            eq_(get_price_matrix().version, version)
+
+    def test_price_matrix_changes(self):
+        eq_(self.tier_one.get_price(regions=[RESTOFWORLD.id]),
+            Decimal('0.99'))
+        version = get_price_matrix().version
+        PriceCurrency.objects.get(pk=5).update(price=Decimal('0.89'))
+        ok_(get_price_matrix().version != version)
+        eq_(self.tier_one.get_price(regions=[RESTOFWORLD.id]),
+            Decimal('0.89'))
+
+    def test_inactive_tier(self):
+        self.tier_one.update(active=False)
+        eq_(self.tier_one.get_price(regions=[RESTOFWORLD.id]), None)
+        eq_(len(self.tier_one.prices()), 2)
 
     def test_get_tier_price(self):
         eq_(Price.objects.get(pk=2).get_price_locale(regions=[BRA.id]),
@@ -125,7 +125,7 @@ class Review(ModelBase):
             # to avoid slave lag.
             tasks.update_denorm(pair, using='default')
         # Review counts have changed, so run the task and trigger a reindex.
-        tasks.addon_review_aggregates.delay(self.addon_id, using='default')
+        tasks.queue_review_aggregates(self.addon_id)
 
     @staticmethod
     def transformer(reviews):
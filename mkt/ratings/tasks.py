@@ -1,12 +1,19 @@
+import itertools
 import logging
+import operator
 
-from django.db.models import Count, Avg, F
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Avg, Q
 
 import caching.base as caching
 from celery import task
 
 from lib.post_request_task.task import task as post_request_task
+from mkt.site.utils import chunked
 from mkt.webapps.models import Webapp
+from mkt.webapps.tasks import index_webapps
 
 from .models import Review
 
@@ -14,6 +21,70 @@ from .models import Review
 log = logging.getLogger('z.task')
 
 
+# Sets previous_count and is_latest for all the valid reviews of a batch of
+# (addon, user) pairs, ordering each pair's reviews by creation date.
+UPDATE_DENORM_SQL = """
+    UPDATE reviews INNER JOIN (
+        SELECT r.id,
+            COALESCE(SUM(o.created < r.created OR
+                         (o.created = r.created AND o.id < r.id)), 0)
+                AS previous_count,
+            COUNT(o.id) AS others
+        FROM reviews r
+        LEFT JOIN reviews o ON (
+            o.addon_id = r.addon_id AND o.user_id = r.user_id AND
+            o.id != r.id AND o.reply_to IS NULL AND o.deleted = 0)
+        WHERE r.reply_to IS NULL AND r.deleted = 0 AND ({pairs})
+        GROUP BY r.id
+    ) AS denorm ON reviews.id = denorm.id
+    SET reviews.previous_count = denorm.previous_count,
+        reviews.is_latest = (denorm.previous_count = denorm.others)
+"""
+
+# Sets total_reviews and average_rating from the latest valid review of every
+# user, for a batch of addons.
+UPDATE_AGGREGATES_SQL = """
+    UPDATE addons LEFT JOIN (
+        SELECT addon_id, COUNT(*) AS total_reviews,
+            AVG(rating) AS average_rating
+        FROM reviews
+        WHERE addon_id IN ({ids}) AND reply_to IS NULL AND is_latest = 1 AND
+            deleted = 0
+        GROUP BY addon_id
+    ) AS stats ON addons.id = stats.addon_id
+    SET addons.totalreviews = COALESCE(stats.total_reviews, 0),
+        addons.averagerating = COALESCE(stats.average_rating, 0)
+    WHERE addons.id IN ({ids})
+"""
+
+# Sets bayesian_rating for a batch of addons, ignoring addons with no average
+# rating.
+UPDATE_BAYESIAN_SQL = """
+    UPDATE addons
+    SET bayesianrating = CASE WHEN totalreviews > 0
+        THEN (%s + totalreviews * averagerating) / (%s + totalreviews)
+        ELSE 0 END
+    WHERE id IN ({ids}) AND averagerating IS NOT NULL
+"""
+
+BATCH_SIZE = 100
+
+
+def _aggregates_pending_key(addon_id):
+    return 'review-aggregates-pending:%s' % addon_id
+
+
+def queue_review_aggregates(addon_id):
+    """
+    Schedules addon_review_aggregates for the addon in
+    settings.REVIEW_AGGREGATES_DELAY seconds, unless it's already scheduled:
+    a storm of reviews for a popular app only recomputes its aggregates once.
+    """
+    delay = settings.REVIEW_AGGREGATES_DELAY
+    if cache.add(_aggregates_pending_key(addon_id), True, delay):
+        addon_review_aggregates.apply_async(args=[addon_id], countdown=delay)
+
+
 @task(rate_limit='50/m')
 def update_denorm(*pairs, **kw):
     """
@@ -23,35 +94,37 @@ def update_denorm(*pairs, **kw):
     log.info('[%s@%s] Updating review denorms.' %
              (len(pairs), update_denorm.rate_limit))
     using = kw.get('using')
-    for addon, user in pairs:
+    pairs = [(getattr(addon, 'pk', addon), getattr(user, 'pk', user))
+             for addon, user in pairs]
+    cursor = connection.cursor()
+    for chunk in chunked(pairs, BATCH_SIZE):
+        cursor.execute(
+            UPDATE_DENORM_SQL.format(pairs=' OR '.join(
+                ['(r.addon_id = %s AND r.user_id = %s)'] * len(chunk))),
+            list(itertools.chain.from_iterable(chunk)))
+        # The reviews weren't saved, so invalidate them ourselves.
         reviews = list(Review.objects.valid().no_cache().using(using)
-                       .filter(addon=addon, user=user).order_by('created'))
-        if not reviews:
-            continue
-
-        for idx, review in enumerate(reviews):
-            review.previous_count = idx
-            review.is_latest = False
-        reviews[-1].is_latest = True
-
-        for review in reviews:
-            review.save()
+                       .filter(reduce(operator.or_,
+                                      [Q(addon=addon, user=user)
+                                       for addon, user in chunk])))
+        if reviews:
+            Review.objects.invalidate(*reviews)
 
 
 @post_request_task
 def addon_review_aggregates(*addons, **kw):
     log.info('[%s@%s] Updating total reviews and average ratings.' %
              (len(addons), addon_review_aggregates.rate_limit))
-    using = kw.get('using')
-    addon_objs = list(Webapp.objects.filter(pk__in=addons))
-    stats = dict((x[0], x[1:]) for x in
-                 Review.objects.valid().no_cache().using(using)
-                 .filter(addon__in=addons, is_latest=True)
-                 .values_list('addon')
-                 .annotate(Avg('rating'), Count('addon')))
-    for addon in addon_objs:
-        rating, reviews = stats.get(addon.id, [0, 0])
-        addon.update(total_reviews=reviews, average_rating=rating)
+    # Reviews posted from now on will need another run.
+    cache.delete_many([_aggregates_pending_key(addon) for addon in addons])
+    cursor = connection.cursor()
+    for chunk in chunked(addons, BATCH_SIZE):
+        ids = ', '.join(['%s'] * len(chunk))
+        cursor.execute(UPDATE_AGGREGATES_SQL.format(ids=ids),
+                       list(chunk) * 2)
+    # The apps weren't saved, so invalidate and reindex them ourselves.
+    Webapp.objects.invalidate(*Webapp.objects.no_cache().filter(pk__in=addons))
+    index_webapps.delay(list(addons))
 
     # Delay bayesian calculations to avoid slave lag.
     addon_bayesian_rating.apply_async(args=addons, countdown=5)
@@ -71,15 +144,8 @@ def addon_bayesian_rating(*addons, **kw):
     if avg['rating'] is None:
         return
     mc = avg['reviews'] * avg['rating']
-    for addon in Webapp.objects.no_cache().filter(id__in=addons):
-        if addon.average_rating is None:
-            # Ignoring addons with no average rating.
-            continue
-
-        q = Webapp.objects.filter(id=addon.id)
-        if addon.total_reviews:
-            num = mc + F('total_reviews') * F('average_rating')
-            denom = avg['reviews'] + F('total_reviews')
-            q.update(bayesian_rating=num / denom)
-        else:
-            q.update(bayesian_rating=0)
+    cursor = connection.cursor()
+    for chunk in chunked(addons, BATCH_SIZE):
+        cursor.execute(
+            UPDATE_BAYESIAN_SQL.format(ids=', '.join(['%s'] * len(chunk))),
+            [mc, avg['reviews']] + list(chunk))
@@ -26,7 +26,7 @@ class TestSpamTest(mkt.site.tests.TestCase):
     def test_add(self):
         assert Spam().add(Review.objects.all()[0], 'numbers')
 
-    @patch('mkt.ratings.tasks.addon_review_aggregates.delay')
+    @patch('mkt.ratings.tasks.addon_review_aggregates.apply_async')
     def test_refresh_triggers_review_aggregates(self, addon_review_aggregates):
         addon_review_aggregates.reset_mock()
         review = Review.objects.latest('pk')
@@ -0,0 +1,100 @@
+from django.conf import settings
+
+from mock import patch
+from nose.tools import eq_
+
+import mkt.site.tests
+from mkt.ratings.models import Review
+from mkt.ratings.tasks import (addon_bayesian_rating, addon_review_aggregates,
+                               queue_review_aggregates, update_denorm)
+from mkt.site.fixtures import fixture
+from mkt.users.models import UserProfile
+from mkt.webapps.models import Webapp
+
+
+class TestRatingTasks(mkt.site.tests.TestCase):
+    fixtures = fixture('webapp_337141', 'user_999')
+
+    def setUp(self):
+        self.app = Webapp.objects.get(pk=337141)
+        self.user = UserProfile.objects.get(pk=31337)
+        self.other = UserProfile.objects.get(pk=999)
+
+    def review(self, user, rating, **kw):
+        return Review.objects.create(addon=self.app, user=user, rating=rating,
+                                     **kw)
+
+    def update_app(self, **kw):
+        Webapp.objects.filter(pk=self.app.pk).update(**kw)
+
+    def denorms(self, user):
+        return list(Review.objects.no_cache().filter(addon=self.app, user=user)
+                    .order_by('id')
+                    .values_list('previous_count', 'is_latest'))
+
+    def test_update_denorm(self):
+        for rating in (1, 2, 3):
+            self.review(self.user, rating)
+        self.review(self.other, 4)
+        Review.objects.update(previous_count=0, is_latest=False)
+
+        update_denorm((self.app.pk, self.user.pk), (self.app, self.other))
+        eq_(self.denorms(self.user), [(0, False), (1, False), (2, True)])
+        eq_(self.denorms(self.other), [(0, True)])
+
+    def test_update_denorm_ignores_deleted(self):
+        first = self.review(self.user, 1)
+        self.review(self.user, 2).update(deleted=True)
+        update_denorm((self.app.pk, self.user.pk))
+        first = Review.objects.no_cache().get(pk=first.pk)
+        eq_((first.previous_count, first.is_latest), (0, True))
+
+    def test_update_denorm_no_save(self):
+        self.review(self.user, 1)
+        with patch.object(Review, 'save') as save:
+            update_denorm((self.app.pk, self.user.pk))
+        assert not save.called
+
+    def test_addon_review_aggregates(self):
+        self.review(self.user, 1)
+        self.review(self.user, 2)
+        self.review(self.other, 5)
+        self.update_app(total_reviews=0, average_rating=0)
+        addon_review_aggregates(self.app.pk)
+        app = Webapp.objects.no_cache().get(pk=self.app.pk)
+        # Only the latest review of each user counts.
+        eq_(app.total_reviews, 2)
+        eq_(app.average_rating, 3.5)
+
+    def test_addon_review_aggregates_no_reviews(self):
+        self.update_app(total_reviews=3, average_rating=4)
+        addon_review_aggregates(self.app.pk)
+        app = Webapp.objects.no_cache().get(pk=self.app.pk)
+        eq_(app.total_reviews, 0)
+        eq_(app.average_rating, 0)
+
+    @patch('mkt.ratings.tasks.caching.cached')
+    def test_addon_bayesian_rating(self, cached):
+        cached.return_value = {'rating': 3.0, 'reviews': 10.0}
+        self.update_app(total_reviews=10, average_rating=5)
+        addon_bayesian_rating(self.app.pk)
+        eq_(Webapp.objects.no_cache().get(pk=self.app.pk).bayesian_rating,
+            4.0)
+
+        self.update_app(total_reviews=0)
+        addon_bayesian_rating(self.app.pk)
+        eq_(Webapp.objects.no_cache().get(pk=self.app.pk).bayesian_rating,
+            0)
+
+    @patch.object(settings, 'REVIEW_AGGREGATES_DELAY', 10)
+    @patch('mkt.ratings.tasks.addon_review_aggregates.apply_async')
+    def test_queue_review_aggregates(self, apply_async):
+        queue_review_aggregates(self.app.pk)
+        queue_review_aggregates(self.app.pk)
+        apply_async.assert_called_once_with(args=[self.app.pk], countdown=10)
+
+        # Once the aggregates are being computed, new reviews queue them
+        # again.
+        addon_review_aggregates(self.app.pk)
+        queue_review_aggregates(self.app.pk)
+        eq_(apply_async.call_count, 2)
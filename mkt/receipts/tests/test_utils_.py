@@ -1,10 +1,11 @@
 import calendar
 import time
 
+import mock
 from nose.tools import eq_
 
 from receipts.receipts import Receipt
-from mkt.receipts.utils import reissue_receipt, sign
+from mkt.receipts.utils import reissue_receipt, sign, sign_many
 from mkt.receipts.tests.test_verify import ReceiptTest
 
 
@@ -29,3 +30,23 @@ class TestReissue(ReceiptTest):
             eq_(new[same], old[same], (
                 '{0} for new: {1} should be the same as old: {2}'.format(
                     greater, new[same], old[same])))
+
+
+class TestSignMany(ReceiptTest):
+
+    def test_sign_many(self):
+        data = [self.sample_app_receipt(), self.sample_app_receipt()]
+        data[1]['user']['value'] = 'other-uuid'
+        receipts = sign_many(data)
+        eq_(len(receipts), 2)
+        eq_(Receipt(receipts[0]).receipt_decoded()['user']['value'],
+            'some-uuid')
+        eq_(Receipt(receipts[1]).receipt_decoded()['user']['value'],
+            'other-uuid')
+
+    @mock.patch('mkt.receipts.utils.receipt.sign_many')
+    def test_sign_many_server(self, sign_many_mock):
+        sign_many_mock.return_value = ['a', 'b']
+        with self.settings(SIGNING_SERVER_ACTIVE=True):
+            eq_(sign_many([{}, {}]), ['a', 'b'])
+        sign_many_mock.assert_called_with([{}, {}])
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import calendar
+import json
 import time
 import uuid
 from urllib import urlencode
@@ -339,6 +340,55 @@ class TestVerify(ReceiptTest):
         eq_(res['status'], 'invalid')
         eq_(res['reason'], 'NO_PURCHASE')
 
+    @mock.patch.object(utils.settings, 'WEBAPPS_RECEIPT_RESULT_CACHE_TIMEOUT',
+                       60)
+    def test_result_cached(self):
+        self.addCleanup(verify.result_cache.clear)
+        self.make_purchase()
+        receipt_data = self.sample_app_receipt()
+        eq_(self.verify_receipt_data(receipt_data)['status'], 'ok')
+        with self.assertNumQueries(0):
+            eq_(self.verify_receipt_data(receipt_data)['status'], 'ok')
+
+    @mock.patch.object(utils.settings, 'WEBAPPS_RECEIPT_RESULT_CACHE_TIMEOUT',
+                       60)
+    @mock.patch('services.verify.receipt_cef.log')
+    def test_result_cached_invalid(self, log):
+        self.addCleanup(verify.result_cache.clear)
+        receipt_data = self.sample_app_receipt()
+        eq_(self.verify_receipt_data(receipt_data)['reason'], 'NO_PURCHASE')
+        with self.assertNumQueries(0):
+            eq_(self.verify_receipt_data(receipt_data)['reason'],
+                'NO_PURCHASE')
+        # Cached failures are still logged.
+        eq_(log.call_count, 2)
+
+    @mock.patch.object(utils.settings, 'WEBAPPS_RECEIPT_RESULT_CACHE_TIMEOUT',
+                       60)
+    def test_result_cache_invalidated_on_refund(self):
+        self.addCleanup(verify.result_cache.clear)
+        self.make_purchase()
+        receipt_data = self.sample_app_receipt()
+        eq_(self.verify_receipt_data(receipt_data)['status'], 'ok')
+
+        Contribution.objects.create(addon=self.app, user=self.user,
+                                    type=mkt.CONTRIB_REFUND)
+        eq_(self.verify_receipt_data(receipt_data)['status'], 'refunded')
+
+    @mock.patch.object(utils.settings, 'WEBAPPS_RECEIPT_RESULT_CACHE_TIMEOUT',
+                       60)
+    @mock.patch.object(utils.settings, 'WEBAPPS_RECEIPT_EXPIRED_SEND', True)
+    @mock.patch('services.verify.sign')
+    def test_expired_result_not_cached(self, sign):
+        self.addCleanup(verify.result_cache.clear)
+        sign.return_value = ''
+        self.make_purchase()
+        receipt_data = self.sample_app_receipt()
+        receipt_data['exp'] = calendar.timegm(time.gmtime()) - 1000
+        self.verify_receipt_data(receipt_data)
+        self.verify_receipt_data(receipt_data)
+        eq_(sign.call_count, 2)
+
     def test_crack_receipt(self):
         # Check that we can decode our receipt and get a dictionary back.
         self.app.update(manifest_url='http://a.com')
@@ -348,7 +398,7 @@ class TestVerify(ReceiptTest):
         eq_(result['typ'], u'purchase-receipt')
 
     @mock.patch('services.verify.settings')
-    @mock.patch('services.verify.receipts.certs.ReceiptVerifier')
+    @mock.patch('services.verify.ReceiptVerifier')
     def test_crack_receipt_new_called(self, trunion_verify, settings):
         # Check that we can decode our receipt and get a dictionary back.
         self.app.update(manifest_url='http://a.com')
@@ -381,6 +431,138 @@ class TestVerify(ReceiptTest):
         assert ('Cache-Control', 'no-cache') in hdrs, 'No cache header needed'
 
 
+@mock.patch.object(utils.settings, 'WEBAPPS_RECEIPT_KEY',
+                   mkt.site.tests.MktPaths.sample_key())
+@mock.patch.object(settings, 'SITE_URL', 'http://foo.com/')
+@mock.patch.object(settings, 'WEBAPPS_RECEIPT_URL', '/verifyme/')
+class TestBatchVerify(ReceiptTest):
+
+    @mock.patch.object(verify, 'decode_receipt')
+    def verify_batch(self, receipts_data, decode_receipt):
+        def decode(receipt):
+            if receipt == 'garbage':
+                raise verify.VerificationError()
+            return dict(receipts_data[int(receipt)])
+
+        decode_receipt.side_effect = decode
+        verifier = verify.BatchVerify(
+            [str(i) for i in range(len(receipts_data))] + ['garbage'],
+            RequestFactory().get('/verifyme/').META)
+        verifier.cursor = connection.cursor()
+        return verifier.check_full()
+
+    def make_inapp_contribution(self, type=mkt.CONTRIB_PURCHASE):
+        return Contribution.objects.create(addon=self.app,
+                                           inapp_product=self.inapp,
+                                           type=type, user=self.user)
+
+    def test_statuses(self):
+        refunded = self.make_inapp_contribution(type=mkt.CONTRIB_REFUND)
+        purchased = self.make_inapp_contribution()
+        # This was created by the contribution, but we need to tweak the uuid
+        # to ensure its correct.
+        AddonPurchase.objects.get().update(uuid='some-uuid')
+        not_purchased = self.sample_app_receipt()
+        not_purchased['user']['value'] = 'ugh'
+        wrong_type = self.sample_app_receipt()
+        wrong_type['typ'] = 'anything'
+        receipts_data = [
+            self.sample_app_receipt(),
+            self.sample_inapp_receipt(purchased),
+            self.sample_inapp_receipt(refunded),
+            not_purchased,
+            wrong_type,
+        ]
+
+        # One query for the app purchases, one for the inapp ones.
+        with self.assertNumQueries(2):
+            res = self.verify_batch(receipts_data)
+        eq_([r['status'] for r in res],
+            ['ok', 'ok', 'refunded', 'invalid', 'invalid', 'invalid'])
+        eq_(res[3]['reason'], 'NO_PURCHASE')
+        eq_(res[4]['reason'], 'WRONG_TYPE')
+        eq_(res[5]['reason'], 'ERROR_DECODING')
+
+    def test_same_as_single(self):
+        contribution = self.make_inapp_contribution()
+        receipts_data = [self.sample_app_receipt(),
+                         self.sample_inapp_receipt(contribution)]
+        res = self.verify_batch(receipts_data)
+        for receipt_data, result in zip(receipts_data, res):
+            verifier = verify.Verify('', RequestFactory().get(
+                '/verifyme/').META)
+            verifier.cursor = connection.cursor()
+            with mock.patch.object(verify, 'decode_receipt') as decode:
+                decode.return_value = receipt_data
+                eq_(verifier.check_full(), result)
+
+    def test_no_db_without_valid_receipts(self):
+        with self.assertNumQueries(0):
+            res = self.verify_batch([])
+        eq_(res[0]['status'], 'invalid')
+
+
+class TestReceiptVerifier(mkt.site.tests.TestCase):
+
+    def setUp(self):
+        self.addCleanup(verify.cert_chain_cache.clear)
+        self.verifier = verify.ReceiptVerifier(valid_issuers=['f.com'])
+        self.now = int(time.time())
+        self.certificates = [
+            mock.Mock(signed_data='header.payload', signature='sig',
+                      payload={'exp': self.now + 10})]
+
+    @mock.patch('receipts.certs.ReceiptVerifier.verify_certificate_chain')
+    def test_chain_cached(self, verify_certificate_chain):
+        verify_certificate_chain.return_value = 'cert'
+        for i in range(2):
+            eq_(self.verifier.verify_certificate_chain(self.certificates,
+                                                       now=self.now),
+                'cert')
+        eq_(verify_certificate_chain.call_count, 1)
+
+    @mock.patch('receipts.certs.ReceiptVerifier.verify_certificate_chain')
+    def test_other_chain(self, verify_certificate_chain):
+        self.verifier.verify_certificate_chain(self.certificates,
+                                               now=self.now)
+        self.certificates[0].signature = 'other-sig'
+        self.verifier.verify_certificate_chain(self.certificates,
+                                               now=self.now)
+        eq_(verify_certificate_chain.call_count, 2)
+
+    @mock.patch('receipts.certs.ReceiptVerifier.verify_certificate_chain')
+    def test_expired_chain(self, verify_certificate_chain):
+        self.verifier.verify_certificate_chain(self.certificates,
+                                               now=self.now)
+        verify_certificate_chain.side_effect = ExpiredSignatureError
+        with self.assertRaises(ExpiredSignatureError):
+            self.verifier.verify_certificate_chain(self.certificates,
+                                                   now=self.now + 20)
+
+
+class TestExpiringLRUCache(mkt.site.tests.TestCase):
+
+    def test_lru(self):
+        lru = utils.ExpiringLRUCache(size=2, timeout=60)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        eq_(lru.get('a'), 1)
+        lru.set('c', 3)
+        eq_(lru.get('a'), 1)
+        eq_(lru.get('b'), None)
+        eq_(lru.get('c'), 3)
+
+    @mock.patch('services.utils.time.time')
+    def test_timeout(self, time_mock):
+        time_mock.return_value = 1000
+        lru = utils.ExpiringLRUCache(size=2, timeout=60)
+        lru.set('a', 1)
+        lru.set('b', 2, timeout=120)
+        time_mock.return_value = 1090
+        eq_(lru.get('a'), None)
+        eq_(lru.get('b'), 2)
+
+
 class TestBase(mkt.site.tests.TestCase):
 
     def create(self, data, request=None):
@@ -456,3 +638,37 @@ class TestServices(mkt.site.tests.TestCase):
         eq_(data['headers']['Access-Control-Allow-Headers'],
             'content-type, x-fxpay-version')
         eq_(data['headers']['Content-Length'], '0')
+
+    def batch_request(self, body):
+        data = {}
+        req = RequestFactory().post('/verify/batch/', body,
+                                    content_type='application/json')
+
+        def start_response(status, wsgi_headers):
+            data['status'] = status
+
+        data['body'] = verify.application(req.META, start_response)[0]
+        return data
+
+    @mock.patch.object(verify.BatchVerify, 'check_full')
+    def test_batch(self, check_full):
+        check_full.return_value = [{'status': 'ok'}, {'status': 'refunded'}]
+        with mock.patch.object(verify, 'BatchVerify',
+                               wraps=verify.BatchVerify) as batch_verify:
+            data = self.batch_request(json.dumps(['foo', 'bar']))
+        eq_(data['status'], '200 OK')
+        eq_(json.loads(data['body']), check_full.return_value)
+        receipt_list, environ = batch_verify.call_args[0]
+        eq_(receipt_list, ['foo', 'bar'])
+        # Receipts are verified against the single receipt verify URL.
+        eq_(environ['PATH_INFO'], '/verify/')
+
+    def test_batch_not_a_list(self):
+        eq_(self.batch_request('"foo"')['status'], '400 Bad Request')
+        eq_(self.batch_request('{"foo')['status'], '400 Bad Request')
+        eq_(self.batch_request('[1, 2]')['status'], '400 Bad Request')
+
+    @mock.patch.object(verify, 'BATCH_MAX_RECEIPTS', 1)
+    def test_batch_too_many(self):
+        data = self.batch_request(json.dumps(['foo', 'bar']))
+        eq_(data['status'], '400 Bad Request')
@@ -43,6 +43,21 @@ def sign(data):
         return jwt.encode(data, get_key(), u'RS512')
 
 
+def sign_many(data):
+    """
+    Returns a list of signed receipts, in the same order as the receipts
+    passed in. The signing server is sent the receipts as a batch over its
+    pooled connections.
+
+    :params data: a list of receipts to be signed.
+    """
+    if settings.SIGNING_SERVER_ACTIVE:
+        return receipt.sign_many(data)
+    else:
+        key = get_key()
+        return [jwt.encode(d, key, u'RS512') for d in data]
+
+
 def create_receipt(webapp, user, uuid, flavour=None, contrib=None):
     return sign(create_receipt_data(webapp, user, uuid, flavour=flavour,
                                     contrib=contrib))
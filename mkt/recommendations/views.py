@@ -13,6 +13,7 @@ from mkt.api.authentication import (RestOAuthAuthentication,
 from mkt.api.base import CORSMixin, MarketplaceView
 from mkt.search.filters import (DeviceTypeFilter, ProfileFilter,
                                 PublicAppsFilter, RegionFilter)
+from mkt.search.utils import source_fields
 from mkt.search.views import SearchView
 from mkt.webapps.indexers import WebappIndexer
 from mkt.webapps.serializers import SimpleESAppSerializer
@@ -34,7 +35,7 @@ class RecommendationView(CORSMixin, MarketplaceView, ListAPIView):
         return SearchView.as_view()(self.request)
 
     def get_queryset(self):
-        return WebappIndexer.search()
+        return source_fields(WebappIndexer.search(), self.serializer_class)
 
     def list(self, request, *args, **kwargs):
         if (not settings.RECOMMENDATIONS_ENABLED or
@@ -8,7 +8,9 @@ import commonware.log
 
 import mkt
 import mkt.constants.comm as comm
+from mkt.abuse.models import AbuseReport
 from mkt.comm.utils import create_comm_note
+from mkt.ratings.models import Review, ReviewFlag
 from mkt.site.models import ManagerBase, ModelBase, skip_cache
 from mkt.site.utils import cache_ns_key
 from mkt.tags.models import Tag
@@ -21,6 +23,7 @@ from mkt.websites.models import Website
 
 user_log = commonware.log.getLogger('z.users')
 QUEUE_TARAKO = 'tarako'
+QUEUE_STATS_CACHE_NAMESPACE = 'reviewer-queue-stats'
 
 
 class CannedResponse(ModelBase):
@@ -526,3 +529,18 @@ for model in (RereviewQueue, EscalationQueue):
     models.signals.post_delete.connect(
         update_search_index, sender=model,
         dispatch_uid='%s-delete-update-index' % model._meta.model_name)
+
+
+def invalidate_queue_stats(**kwargs):
+    """Throw away the cached reviewer queue counts, see QueueStats."""
+    cache_ns_key(QUEUE_STATS_CACHE_NAMESPACE, increment=True)
+
+
+for model in (AbuseReport, AdditionalReview, EscalationQueue, RereviewQueue,
+              Review, ReviewFlag):
+    models.signals.post_save.connect(
+        invalidate_queue_stats, sender=model,
+        dispatch_uid='%s-save-queue-stats' % model._meta.model_name)
+    models.signals.post_delete.connect(
+        invalidate_queue_stats, sender=model,
+        dispatch_uid='%s-delete-queue-stats' % model._meta.model_name)
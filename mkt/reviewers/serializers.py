@@ -25,6 +25,10 @@ class ReviewersESAppSerializer(ESAppSerializer):
     latest_version = serializers.SerializerMethodField('get_latest_version')
     is_escalated = serializers.BooleanField()
 
+    source_fields = dict(ESAppSerializer.source_fields,
+                         is_escalated=('is_escalated',),
+                         latest_version=('latest_version',))
+
     class Meta(ESAppSerializer.Meta):
         fields = SEARCH_FIELDS + ['latest_version', 'is_escalated']
 
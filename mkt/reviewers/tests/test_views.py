@@ -40,7 +40,7 @@ from mkt.files.models import File
 from mkt.ratings.models import Review, ReviewFlag
 from mkt.reviewers.models import (CannedResponse, EscalationQueue,
                                   RereviewQueue, ReviewerScore, QUEUE_TARAKO)
-from mkt.reviewers.utils import ReviewersQueuesHelper
+from mkt.reviewers.utils import QueueStats, ReviewersQueuesHelper
 from mkt.reviewers.views import (_progress, app_review, queue_apps,
                                  route_reviewer)
 from mkt.site.fixtures import fixture
@@ -286,6 +286,30 @@ class TestReviewersHome(AppReviewerTest, AccessMixin):
         self.assertAlmostEqual(percentages['updates']['old'], 33.333333333333)
         self.assertAlmostEqual(percentages['updates']['med'], 33.333333333333)
 
+    def test_queue_stats(self):
+        queues_helper = ReviewersQueuesHelper()
+        with self.assertNumQueries(1):
+            stats = QueueStats().compute()
+        eq_(stats['counts']['pending'],
+            queues_helper.get_pending_queue().count())
+        eq_(stats['counts']['rereview'],
+            queues_helper.get_rereview_queue().count())
+        eq_(stats['counts']['updates'],
+            queues_helper.get_updates_queue().count())
+        eq_(stats['counts']['escalated'], 1)
+        eq_(stats['counts']['moderated'], 0)
+        eq_(stats['progress']['rereview'],
+            {'new': 1, 'med': 0, 'old': 0, 'week': 1})
+
+    @override_settings(REVIEWER_QUEUE_STATS_CACHE_TIMEOUT=10)
+    def test_queue_stats_cached(self):
+        eq_(QueueStats().get()['counts']['rereview'], 1)
+        with self.assertNumQueries(0):
+            eq_(QueueStats().get()['counts']['rereview'], 1)
+
+        RereviewQueue.objects.create(addon=self.apps[0])
+        eq_(QueueStats().get()['counts']['rereview'], 2)
+
     def test_stats_waiting(self):
         self.apps[0].latest_version.update(nomination=self.days_ago(1))
         self.apps[1].latest_version.update(nomination=self.days_ago(5))
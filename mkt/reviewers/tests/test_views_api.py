@@ -1,10 +1,12 @@
 # -*- coding: utf-8 -*-
 import json
 from datetime import datetime, timedelta
+from urlparse import urlparse
 
 from django.conf import settings
 from django.core.cache import cache
 from django.core.urlresolvers import reverse
+from django.http import QueryDict
 from django.test.client import RequestFactory
 
 import mock
@@ -22,7 +24,7 @@ from mkt.reviewers.models import (AdditionalReview, CannedResponse,
                                   RereviewQueue, ReviewerScore)
 from mkt.reviewers.utils import AppsReviewing
 from mkt.site.fixtures import fixture
-from mkt.site.tests import ESTestCase
+from mkt.site.tests import app_factory, ESTestCase
 from mkt.tags.models import Tag
 from mkt.users.models import UserProfile
 from mkt.webapps.models import Webapp
@@ -106,6 +108,36 @@ class TestApiReviewerSearch(RestOAuth, ESTestCase):
         res = self.anon.get(self.url)
         eq_(res.status_code, 403)
 
+    def get_next_cursor(self, res):
+        return QueryDict(urlparse(res.json['meta']['next']).query)['cursor']
+
+    def test_cursor(self):
+        app_factory(status=mkt.STATUS_PENDING)
+        self.refresh('webapp')
+        res = self.client.get(self.url, {'cursor': '', 'limit': 1})
+        eq_(res.status_code, 200)
+        eq_(len(res.json['objects']), 1)
+        eq_(res.json['meta']['total_count'], 2)
+        eq_(res.json['meta']['previous'], None)
+
+        res = self.client.get(self.url, {'cursor': self.get_next_cursor(res),
+                                         'limit': 1})
+        eq_(res.status_code, 200)
+        eq_(len(res.json['objects']), 1)
+        eq_(res.json['meta']['next'], None)
+
+    def test_cursor_other_params(self):
+        app_factory(status=mkt.STATUS_PENDING)
+        self.refresh('webapp')
+        res = self.client.get(self.url, {'cursor': '', 'limit': 1})
+        res = self.client.get(self.url, {'cursor': self.get_next_cursor(res),
+                                         'limit': 1, 'status': 'rejected'})
+        eq_(res.status_code, 404)
+
+    def test_cursor_invalid(self):
+        res = self.client.get(self.url, {'cursor': 'nope'})
+        eq_(res.status_code, 404)
+
     def test_non_reviewer_access(self):
         GroupUser.objects.filter(group__rules='Apps:Review',
                                  user=self.profile).delete()
@@ -5,6 +5,7 @@ from datetime import datetime
 
 from django.conf import settings
 from django.core.cache import cache
+from django.db import connections
 from django.db.models import Q
 
 import commonware.log
@@ -18,10 +19,14 @@ from mkt.comm.utils import create_comm_note
 from mkt.constants import comm
 from mkt.files.models import File
 from mkt.ratings.models import Review
-from mkt.reviewers.models import EscalationQueue, RereviewQueue, ReviewerScore
+from mkt.reviewers.models import (AdditionalReview, EscalationQueue,
+                                  invalidate_queue_stats,
+                                  QUEUE_STATS_CACHE_NAMESPACE, QUEUE_TARAKO,
+                                  RereviewQueue, ReviewerScore)
 from mkt.site.helpers import product_as_dict
 from mkt.site.models import manual_order
-from mkt.site.utils import cached_property, JSONEncoder
+from mkt.site.utils import (cache_ns_key, cached_property, days_ago,
+                            JSONEncoder)
 from mkt.translations.query import order_by_translation
 from mkt.versions.models import Version
 from mkt.webapps.models import Webapp
@@ -510,7 +515,10 @@ class ReviewHelper(object):
         action = self.handler.data.get('action', '')
         if not action:
             raise NotImplementedError
-        return self.actions[action]['method']()
+        result = self.actions[action]['method']()
+        # Review actions move apps around the queues.
+        invalidate_queue_stats()
+        return result
 
 
 def clean_sort_param(request, date_sort='created'):
@@ -792,3 +800,134 @@ class ReviewersQueuesHelper(object):
         order_by = ('-' if order == 'desc' else '') + sort_type
 
         return qs.sort(order_by)
+
+
+class QueueStats(object):
+    """
+    Counts the items in all the reviewer queues, and for the main app queues
+    how many have been waiting for how long, with a single SQL query (plus a
+    single ES aggregation when the queues are served from ES).
+
+    The results are cached for settings.REVIEWER_QUEUE_STATS_CACHE_TIMEOUT
+    seconds, and thrown away on review actions and queue changes, see
+    invalidate_queue_stats().
+    """
+    # The queues reviewers want progress stats for, and the date field their
+    # items' age is computed from.
+    progress_fields = {
+        'pending': 'nomination',
+        'rereview': 'created',
+        'escalated': 'created',
+        'updates': 'nomination',
+    }
+    # The queues counted from ES when using ES.
+    es_queues = ('pending', 'rereview', 'updates', 'escalated')
+
+    def __init__(self, use_es=False):
+        self.use_es = use_es
+
+    def get_buckets(self):
+        """Return the age buckets as (SQL condition, params) pairs."""
+        return OrderedDict([
+            ('new', ('> %s', [days_ago(5)])),
+            ('med', ('BETWEEN %s AND %s', [days_ago(10), days_ago(5)])),
+            ('old', ('< %s', [days_ago(10)])),
+            ('week', ('>= %s', [days_ago(7)])),
+        ])
+
+    def get_querysets(self):
+        queues_helper = ReviewersQueuesHelper()
+        return OrderedDict([
+            ('pending', queues_helper.get_pending_queue()),
+            ('rereview', queues_helper.get_rereview_queue()),
+            ('updates', queues_helper.get_updates_queue()),
+            ('escalated', queues_helper.get_escalated_queue()),
+            ('moderated', queues_helper.get_moderated_queue()),
+            ('abuse', queues_helper.get_abuse_queue()),
+            ('abusewebsites', queues_helper.get_abuse_queue_websites()),
+            ('region_cn', Webapp.objects.pending_in_region(mkt.regions.CHN)),
+            ('additional_tarako', AdditionalReview.objects.unreviewed(
+                queue=QUEUE_TARAKO, and_approved=True)),
+        ])
+
+    def get_cache_key(self):
+        return 'reviewers:queue-stats:%s:%s' % (
+            cache_ns_key(QUEUE_STATS_CACHE_NAMESPACE), int(self.use_es))
+
+    def get(self):
+        """
+        Return a dict with the `counts` of every queue and the `progress`
+        dict of age bucket counts of the main app queues.
+        """
+        timeout = settings.REVIEWER_QUEUE_STATS_CACHE_TIMEOUT
+        if not timeout:
+            return self.compute()
+        key = self.get_cache_key()
+        stats = cache.get(key)
+        if stats is None:
+            stats = self.compute()
+            cache.set(key, stats, timeout)
+        return stats
+
+    def compute(self):
+        counts, progress = self.count_db()
+        if self.use_es:
+            counts.update(self.count_es())
+        return {'counts': counts, 'progress': progress}
+
+    def count_db(self):
+        """
+        Count every queue in one query: each queue queryset becomes a derived
+        table, counted with COUNT(*) and SUM(CASE ...) for the age buckets,
+        and the results are glued together with UNION ALL.
+        """
+        querysets = self.get_querysets()
+        buckets = self.get_buckets()
+        db = querysets['pending'].db
+        quote_name = connections[db].ops.quote_name
+
+        selects, params = [], []
+        for name, qs in querysets.items():
+            field = self.progress_fields.get(name)
+            columns, select_params = ['%s', 'COUNT(*)'], [name]
+            for condition, condition_params in buckets.values():
+                if field:
+                    column = quote_name(qs.model._meta.get_field(field).column)
+                    columns.append('SUM(CASE WHEN q.%s %s THEN 1 ELSE 0 END)'
+                                   % (column, condition))
+                    select_params.extend(condition_params)
+                else:
+                    columns.append('0')
+            sql, qs_params = (qs.order_by().values_list(field or 'pk')
+                              .query.sql_with_params())
+            selects.append('SELECT %s FROM (%s) AS q' % (
+                ', '.join(columns), sql))
+            params.extend(select_params)
+            params.extend(qs_params)
+
+        cursor = connections[db].cursor()
+        cursor.execute(' UNION ALL '.join(selects), params)
+        rows = dict((row[0], row[1:]) for row in cursor.fetchall())
+
+        counts, progress = {}, {}
+        for name in querysets:
+            row = rows[name]
+            counts[name] = int(row[0])
+            if name in self.progress_fields:
+                progress[name] = dict(
+                    (bucket, int(value or 0))
+                    for bucket, value in zip(buckets, row[1:]))
+        return counts, progress
+
+    def count_es(self):
+        """Count the queues served from ES with one filters aggregation."""
+        queues_helper = ReviewersQueuesHelper(use_es=True)
+        filters = dict(
+            (name, getattr(queues_helper, 'get_%s_queue' % name)()
+             .filter.to_dict())
+            for name in self.es_queues)
+        sq = WebappIndexer.search().extra(size=0, aggs={
+            'queues': {'filters': {'filters': filters}}})
+        buckets = sq.execute().aggregations['queues']['buckets']
+        return dict((name, buckets[name]['doc_count'])
+                    for name in self.es_queues)
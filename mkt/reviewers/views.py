@@ -55,8 +55,7 @@ from mkt.reviewers.forms import (ApiReviewersSearchForm, ApproveRegionForm,
                                  ModerateLogDetailForm, ModerateLogForm,
                                  MOTDForm, TestedOnFormSet)
 from mkt.reviewers.models import (AdditionalReview, CannedResponse,
-                                  EditorSubscription, QUEUE_TARAKO,
-                                  ReviewerScore)
+                                  EditorSubscription, ReviewerScore)
 from mkt.reviewers.serializers import (AdditionalReviewSerializer,
                                        CannedResponseSerializer,
                                        ReviewerAdditionalReviewSerializer,
@@ -64,15 +63,14 @@ from mkt.reviewers.serializers import (AdditionalReviewSerializer,
                                        ReviewersESAppSerializer,
                                        ReviewingSerializer)
 from mkt.reviewers.utils import (AppsReviewing, log_reviewer_action,
-                                 ReviewApp, ReviewersQueuesHelper)
+                                 QueueStats, ReviewApp, ReviewersQueuesHelper)
 from mkt.search.filters import (ReviewerSearchFormFilter, SearchQueryFilter,
                                 SortingFilter)
 from mkt.search.views import SearchView
 from mkt.site.decorators import json_view, login_required, permission_required
 from mkt.site.helpers import absolutify, product_as_dict
-from mkt.site.utils import (days_ago, escape_all, HttpResponseSendFile,
-                            JSONEncoder, paginate, redirect_for_login,
-                            smart_decode)
+from mkt.site.utils import (escape_all, HttpResponseSendFile, JSONEncoder,
+                            paginate, redirect_for_login, smart_decode)
 from mkt.submit.forms import AppFeaturesForm
 from mkt.tags.models import Tag
 from mkt.users.models import UserProfile
@@ -158,22 +156,7 @@ def home(request):
 
 def queue_counts(request):
     use_es = waffle.switch_is_active('reviewer-tools-elasticsearch')
-    queues_helper = ReviewersQueuesHelper(use_es=use_es)
-
-    counts = {
-        'pending': queues_helper.get_pending_queue().count(),
-        'rereview': queues_helper.get_rereview_queue().count(),
-        'updates': queues_helper.get_updates_queue().count(),
-        'escalated': queues_helper.get_escalated_queue().count(),
-        'moderated': queues_helper.get_moderated_queue().count(),
-        'abuse': queues_helper.get_abuse_queue().count(),
-        'abusewebsites': queues_helper.get_abuse_queue_websites().count(),
-        'region_cn': Webapp.objects.pending_in_region(mkt.regions.CHN).count(),
-        'additional_tarako': (
-            AdditionalReview.objects
-                            .unreviewed(queue=QUEUE_TARAKO, and_approved=True)
-                            .count()),
-    }
+    counts = QueueStats(use_es=use_es).get()['counts']
 
     rv = {}
     if isinstance(type, basestring):
@@ -191,38 +174,11 @@ def _progress():
     the percentage.
     """
 
-    queues_helper = ReviewersQueuesHelper()
-
-    base_filters = {
-        'pending': (queues_helper.get_pending_queue(),
-                    'nomination'),
-        'rereview': (queues_helper.get_rereview_queue(),
-                     'created'),
-        'escalated': (queues_helper.get_escalated_queue(),
-                      'created'),
-        'updates': (queues_helper.get_updates_queue(),
-                    'nomination')
-    }
-
-    operators_and_values = {
-        'new': ('gt', days_ago(5)),
-        'med': ('range', (days_ago(10), days_ago(5))),
-        'old': ('lt', days_ago(10)),
-        'week': ('gte', days_ago(7))
-    }
-
-    types = base_filters.keys()
-    progress = {}
-
-    for t in types:
-        tmp = {}
-        base_query, field = base_filters[t]
-        for k in operators_and_values.keys():
-            operator, value = operators_and_values[k]
-            filter_ = {}
-            filter_['%s__%s' % (field, operator)] = value
-            tmp[k] = base_query.filter(**filter_).count()
-        progress[t] = tmp
+    use_es = waffle.switch_is_active('reviewer-tools-elasticsearch')
+    # The age buckets always come from the db, but going through the same
+    # QueueStats as queue_counts() shares its cached results.
+    progress = QueueStats(use_es=use_es).get()['progress']
+    types = progress.keys()
 
     def pct(p, t):
         # Return the percent of (p)rogress out of (t)otal.
@@ -1060,6 +1016,7 @@ class ReviewersSearchView(SearchView):
                        SortingFilter]
     form_class = ApiReviewersSearchForm
     serializer_class = ReviewersESAppSerializer
+    cursor_pagination = True
 
 
 class ApproveRegion(SlugOrIdMixin, CreateAPIView):
@@ -423,15 +423,18 @@ class BaseIndexer(object):
         def get_dict(obj, prop):
             if obj.is_dummy_content_for_qa():
                 return {}
-            qs = getattr(obj, prop).filter(
-                region__in=MATURE_REGION_IDS + [ALL_REGIONS_ID])
-            return dict(qs.values_list('region', 'value'))
+            # Iterate over all() rather than filtering in the database, that
+            # way we re-use the rows if they have been prefetched.
+            regions = set(MATURE_REGION_IDS + [ALL_REGIONS_ID])
+            return dict((o.region, o.value) for o in getattr(obj, prop).all()
+                        if o.region in regions)
 
-        extend = {
-            'boost': get_boost(obj),
-        }
         trending = get_dict(obj, 'trending')
         popularity = get_dict(obj, 'popularity')
+        extend = {
+            'boost': get_boost(
+                obj, popularity=popularity.get(ALL_REGIONS_ID, 0)),
+        }
 
         # Global popularity.
         extend['trending'] = trending.get(ALL_REGIONS_ID, 0)
@@ -45,6 +45,12 @@ class BaseESSerializer(serializers.ModelSerializer):
     # date/datetime from the Elasticsearch date strings.
     datetime_fields = ()
 
+    # ES source keys fake_object() reads whatever the fields are, and a dict
+    # of field name -> ES source keys read by that field. Serializers with a
+    # field missing from source_fields need whole documents.
+    base_source_fields = ()
+    source_fields = None
+
     def __init__(self, *args, **kwargs):
         super(BaseESSerializer, self).__init__(*args, **kwargs)
 
@@ -68,6 +74,26 @@ class BaseESSerializer(serializers.ModelSerializer):
                 fields[key].initialize(parent=self, field_name=key)
         return fields
 
+    @classmethod
+    def get_source_fields(cls):
+        """
+        Returns the sorted list of ES source keys the serializer reads, so
+        that searches only fetch those, or None if it needs whole documents.
+        """
+        if '_source_fields_cache' not in cls.__dict__:
+            cls._source_fields_cache = cls()._get_source_fields()
+        return cls._source_fields_cache
+
+    def _get_source_fields(self):
+        if self.source_fields is None:
+            return None
+        keys = set(self.base_source_fields)
+        for field_name in self.fields:
+            if field_name not in self.source_fields:
+                return None
+            keys.update(self.source_fields[field_name])
+        return sorted(keys)
+
     @property
     def data(self):
         """
@@ -0,0 +1,222 @@
+"""
+An in-process prefix index over the `name_suggest` completion field of the
+apps, answering Rocketbar requests without a round-trip to ES.
+
+WebappIndexer records the `name_suggest` value of every app it writes or
+removes in a change log kept in the cache. Every process holds its own
+PrefixIndex and applies the change log to it at most every
+settings.ROCKETBAR_PREFIX_INDEX_REFRESH seconds. The PrefixIndex is built from
+ES in a background thread the first time it is used, or when the change log
+can't be applied: requests keep using the previous index meanwhile, or the ES
+completion suggester if there is none yet.
+"""
+import bisect
+import heapq
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+import commonware.log
+from elasticsearch import helpers
+
+
+log = commonware.log.getLogger('z.search')
+
+CHANGES_KEY = 'rocketbar:changes'
+CHANGES_TIMEOUT = 60 * 60 * 24
+# Rebuild the index from ES rather than applying more changes than that.
+MAX_CHANGES = 500
+# Clear the memoized suggestions past that many entries.
+MEMO_SIZE = 10000
+# ES ignores what comes after that many characters of each input.
+MAX_INPUT_LENGTH = 50
+
+# Same as the `simple` analyzer ES uses for completion fields by default: the
+# text is lowercased and split on anything that isn't a letter.
+LETTERS_RE = re.compile(r'[^\W\d_]+', re.UNICODE)
+
+
+def _changes_key(number):
+    return '%s:%s' % (CHANGES_KEY, number)
+
+
+def normalize(text):
+    return u' '.join(LETTERS_RE.findall(unicode(text).lower()))
+
+
+def record_changes(changes):
+    """
+    Adds `changes`, a dict of app id -> `name_suggest` value (None for apps
+    without suggestions or removed from the index), to the change log.
+    """
+    try:
+        number = cache.incr(CHANGES_KEY)
+    except ValueError:
+        cache.add(CHANGES_KEY, 0, None)
+        number = cache.incr(CHANGES_KEY)
+    cache.set(_changes_key(number), changes, CHANGES_TIMEOUT)
+
+
+class PrefixIndex(object):
+    """
+    Suggests apps whose name starts with the given text, ordered like the ES
+    completion suggester: by weight, then by output, each app only once.
+    """
+
+    def __init__(self):
+        # App id -> (sort key, option returned to the view, normalized
+        # inputs).
+        self.apps = {}
+        # Sorted (normalized input, app id) pairs.
+        self.keys = []
+        # (normalized text, size) -> suggested options.
+        self.memo = {}
+
+    def __len__(self):
+        return len(self.apps)
+
+    def copy(self):
+        index = self.__class__()
+        index.apps = dict(self.apps)
+        index.keys = list(self.keys)
+        return index
+
+    def update(self, app_id, name_suggest):
+        """Adds, replaces or removes (if `name_suggest` is None) an app."""
+        self.memo = {}
+        if app_id in self.apps:
+            for key in self.apps.pop(app_id)[2]:
+                del self.keys[bisect.bisect_left(self.keys, (key, app_id))]
+        if not name_suggest:
+            return
+        inputs = name_suggest['input']
+        if isinstance(inputs, basestring):
+            inputs = [inputs]
+        keys = set(filter(None, [normalize(i[:MAX_INPUT_LENGTH])
+                                 for i in inputs]))
+        output = name_suggest.get('output', unicode(app_id))
+        weight = name_suggest.get('weight', 0)
+        option = {'text': output, 'score': float(weight),
+                  'payload': name_suggest.get('payload', {})}
+        self.apps[app_id] = ((-weight, output), option, keys)
+        for key in keys:
+            bisect.insort(self.keys, (key, app_id))
+
+    def suggest(self, text, size):
+        prefix = normalize(text)
+        if not prefix or size <= 0:
+            return []
+        memo_key = (prefix, size)
+        if memo_key not in self.memo:
+            if len(self.memo) >= MEMO_SIZE:
+                self.memo = {}
+            self.memo[memo_key] = self._suggest(prefix, size)
+        return [dict(option) for option in self.memo[memo_key]]
+
+    def _suggest(self, prefix, size):
+        app_ids = set()
+        keys = self.keys
+        i = bisect.bisect_left(keys, (prefix,))
+        while i < len(keys) and keys[i][0].startswith(prefix):
+            app_ids.add(keys[i][1])
+            i += 1
+        return [self.apps[app_id][1] for app_id in
+                heapq.nsmallest(size, app_ids,
+                                key=lambda app_id: self.apps[app_id][0])]
+
+
+class RocketbarIndex(object):
+    """The PrefixIndex of this process, kept up to date with the cache."""
+
+    def __init__(self):
+        self.index = None
+        self.seen = 0
+        self.checked = 0
+        self.rebuilding = False
+        self.lock = threading.Lock()
+
+    def suggest(self, text, size):
+        """
+        Returns the suggested options, or None if the index isn't built yet.
+        """
+        self.refresh()
+        index = self.index
+        if index is None:
+            return None
+        return index.suggest(text, size)
+
+    def refresh(self):
+        now = time.time()
+        if now - self.checked < settings.ROCKETBAR_PREFIX_INDEX_REFRESH:
+            return
+        with self.lock:
+            if self.rebuilding:
+                return
+            self.checked = now
+            # The change log starts over if the counter gets evicted.
+            current = cache.get(CHANGES_KEY) or 0
+            if self.index is not None and current == self.seen:
+                return
+            if (self.index is not None and
+                    0 < current - self.seen <= MAX_CHANGES and
+                    self.apply_changes(current)):
+                self.seen = current
+                return
+            self.rebuilding = True
+        self.start_rebuild(current)
+
+    def start_rebuild(self, current):
+        thread = threading.Thread(target=self.build, args=(current,),
+                                  name='rocketbar-prefix-index')
+        thread.daemon = True
+        thread.start()
+
+    def build(self, current):
+        """
+        Rebuilds the index, the change log being applied up to `current`.
+        Errors are logged, the previous index is kept and the next refresh
+        tries again.
+        """
+        try:
+            self.rebuild()
+            self.seen = current
+        except Exception:
+            log.exception('Error building the Rocketbar prefix index.')
+        finally:
+            self.rebuilding = False
+
+    def apply_changes(self, current):
+        numbers = range(self.seen + 1, current + 1)
+        changes = cache.get_many([_changes_key(n) for n in numbers])
+        if len(changes) != len(numbers):
+            # Some changes expired or were evicted.
+            return False
+        # Requests in other threads keep using the current index meanwhile.
+        index = self.index.copy()
+        for number in numbers:
+            for app_id, name_suggest in changes[_changes_key(number)].items():
+                index.update(app_id, name_suggest)
+        self.index = index
+        return True
+
+    def rebuild(self):
+        from mkt.webapps.indexers import WebappIndexer
+
+        start = time.time()
+        index = PrefixIndex()
+        for hit in helpers.scan(
+                WebappIndexer.get_es(), index=WebappIndexer.get_index(),
+                doc_type=WebappIndexer.get_mapping_type_name(),
+                query={'_source': ['name_suggest']}):
+            name_suggest = (hit.get('_source') or {}).get('name_suggest')
+            if name_suggest:
+                index.update(int(hit['_id']), name_suggest)
+        self.index = index
+        log.info('Built the Rocketbar prefix index of %s apps in %.2fs.' %
+                 (len(index), time.time() - start))
+
+
+rocketbar_index = RocketbarIndex()
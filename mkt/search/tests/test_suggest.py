@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+from mock import patch
+from nose.tools import eq_
+
+from mkt.search.suggest import (normalize, PrefixIndex, record_changes,
+                                RocketbarIndex)
+from mkt.site.tests import TestCase
+
+
+def name_suggest(app_id, names, weight):
+    return {'input': names, 'output': unicode(app_id), 'weight': weight,
+            'payload': {'id': app_id}}
+
+
+class TestPrefixIndex(TestCase):
+
+    def setUp(self):
+        self.index = PrefixIndex()
+        self.index.update(1, name_suggest(1, [u'Angry Birds',
+                                              u'Oiseaux en colère'], 10))
+        self.index.update(2, name_suggest(2, [u'Angry Bots 2'], 20))
+        self.index.update(3, name_suggest(3, [u'Angular'], 20))
+
+    def suggest(self, text, size=5):
+        return [option['payload']['id'] for option in
+                self.index.suggest(text, size)]
+
+    def test_normalize(self):
+        eq_(normalize(u'  Angry-Birds 2: Épique!'), u'angry birds épique')
+
+    def test_suggest(self):
+        eq_(self.suggest(u'ang'), [2, 3, 1])
+        eq_(self.suggest(u'ANGRY b'), [2, 1])
+        eq_(self.suggest(u'angry birds'), [1])
+        eq_(self.suggest(u'oiseaux en c'), [1])
+        eq_(self.suggest(u'birds'), [])
+        eq_(self.suggest(u'123'), [])
+
+    def test_size(self):
+        eq_(self.suggest(u'ang', size=2), [2, 3])
+        eq_(self.suggest(u'ang', size=0), [])
+
+    def test_option(self):
+        eq_(self.index.suggest(u'angu', 5),
+            [{'text': u'3', 'score': 20.0, 'payload': {'id': 3}}])
+
+    def test_update(self):
+        self.index.suggest(u'ang', 5)
+        self.index.update(3, name_suggest(3, [u'Angular'], 5))
+        eq_(self.suggest(u'ang'), [2, 1, 3])
+        self.index.update(2, None)
+        eq_(self.suggest(u'ang'), [1, 3])
+        eq_(len(self.index.keys), 3)
+
+    def test_copy(self):
+        index = self.index.copy()
+        index.update(2, None)
+        eq_(self.suggest(u'ang'), [2, 3, 1])
+
+
+class TestRocketbarIndex(TestCase):
+
+    def setUp(self):
+        self.index = RocketbarIndex()
+        patcher = patch.object(RocketbarIndex, 'rebuild', autospec=True,
+                               side_effect=self.fake_rebuild)
+        self.rebuild = patcher.start()
+        self.addCleanup(patcher.stop)
+        # Build the index right away instead of in a background thread.
+        patcher = patch.object(RocketbarIndex, 'start_rebuild', autospec=True,
+                               side_effect=RocketbarIndex.build)
+        self.start_rebuild = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fake_rebuild(self, rocketbar_index):
+        rocketbar_index.index = PrefixIndex()
+        rocketbar_index.index.update(1, name_suggest(1, [u'Angry Birds'], 1))
+
+    def suggest(self, text):
+        return [option['payload']['id'] for option in
+                self.index.suggest(text, 5)]
+
+    def test_changes(self):
+        eq_(self.suggest(u'angry'), [1])
+        eq_(self.rebuild.call_count, 1)
+
+        record_changes({2: name_suggest(2, [u'Angry Bots'], 2)})
+        record_changes({1: None})
+        eq_(self.suggest(u'angry'), [2])
+        eq_(self.rebuild.call_count, 1)
+
+    @patch('mkt.search.suggest.MAX_CHANGES', 1)
+    def test_too_many_changes(self):
+        record_changes({})
+        self.suggest(u'angry')
+        record_changes({2: name_suggest(2, [u'Angry Bots'], 2)})
+        record_changes({})
+        eq_(self.suggest(u'angry'), [1])
+        eq_(self.rebuild.call_count, 2)
+
+    def test_changes_evicted(self):
+        self.suggest(u'angry')
+        with patch('mkt.search.suggest.CHANGES_TIMEOUT', -1):
+            record_changes({2: name_suggest(2, [u'Angry Bots'], 2)})
+        eq_(self.suggest(u'angry'), [1])
+        eq_(self.rebuild.call_count, 2)
+
+    def test_not_built(self):
+        self.start_rebuild.side_effect = None
+        eq_(self.index.suggest(u'angry', 5), None)
+        eq_(self.start_rebuild.call_count, 1)
+        # Only one rebuild at a time.
+        eq_(self.index.suggest(u'angry', 5), None)
+        eq_(self.start_rebuild.call_count, 1)
+
+    def test_rebuild_error(self):
+        self.rebuild.side_effect = ValueError
+        eq_(self.index.suggest(u'angry', 5), None)
+        eq_(self.index.rebuilding, False)
+
+        self.rebuild.side_effect = self.fake_rebuild
+        eq_(self.suggest(u'angry'), [1])
+
+    @patch('mkt.search.suggest.MAX_CHANGES', 1)
+    def test_rebuild_error_keeps_index(self):
+        self.suggest(u'angry')
+        self.rebuild.side_effect = ValueError
+        record_changes({})
+        record_changes({2: name_suggest(2, [u'Angry Bots'], 2)})
+        eq_(self.suggest(u'angry'), [1])
+        eq_(self.rebuild.call_count, 2)
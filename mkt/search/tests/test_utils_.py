@@ -2,11 +2,16 @@ from math import log10
 
 from mock import Mock
 from nose.tools import eq_
+from rest_framework.serializers import Serializer
 
 from mkt.constants.base import STATUS_REJECTED
 from mkt.site.tests import TestCase
 from mkt.site.utils import app_factory
-from mkt.search.utils import get_boost, get_popularity, get_trending
+from mkt.search.utils import (get_boost, get_popularity, get_trending,
+                              source_fields)
+from mkt.webapps.indexers import WebappIndexer
+from mkt.webapps.serializers import (ESAppFeedCollectionSerializer,
+                                     ESAppFeedSerializer)
 from mkt.websites.utils import website_factory
 
 
@@ -71,3 +76,16 @@ class TestSearchUtils(TestCase):
         website = website_factory()
         website.popularity.create(region=0, value=1000.0)
         eq_(get_boost(website), log10(1 + 1000) * 4)
+
+    def test_source_fields(self):
+        search = source_fields(WebappIndexer.search(), ESAppFeedSerializer,
+                               ESAppFeedCollectionSerializer)
+        eq_(search.to_dict()['_source'],
+            {'include': ESAppFeedSerializer.get_source_fields()})
+
+    def test_source_fields_whole_documents(self):
+        search = WebappIndexer.search()
+        eq_(source_fields(search).to_dict(), search.to_dict())
+        eq_(source_fields(search, ESAppFeedSerializer,
+                          Serializer).to_dict(),
+            search.to_dict())
@@ -3,9 +3,11 @@ import json
 from urlparse import urlparse
 
 from django.conf import settings
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
 from django.http import QueryDict
 from django.test.client import RequestFactory
+from django.test.utils import override_settings
 
 from mock import patch
 from nose.tools import eq_, ok_
@@ -23,6 +25,8 @@ from mkt.developers.models import (AddonPaymentAccount, PaymentAccount,
 from mkt.operators.models import OperatorPermission
 from mkt.regions.middleware import RegionMiddleware
 from mkt.search.filters import SortingFilter
+from mkt.search.suggest import CHANGES_KEY, rocketbar_index
+from mkt.search.utils import Search
 from mkt.search.views import SearchView
 from mkt.site.fixtures import fixture
 from mkt.site.helpers import absolutify
@@ -154,6 +158,13 @@ class TestSearchView(RestOAuth, ESTestCase):
         self.anon.get(self.url)
         assert _mock.called
 
+    def test_cursor_not_supported(self):
+        # Public search doesn't open scroll contexts, the cursor is ignored.
+        res = self.anon.get(self.url, {'cursor': 'nope'})
+        eq_(res.status_code, 200)
+        eq_(len(res.json['objects']), 1)
+        eq_(res.json['meta']['offset'], 0)
+
     def test_search_published_apps(self):
         eq_(self.webapp.status, mkt.STATUS_PUBLIC)
         res = self.anon.get(self.url)
@@ -645,13 +656,15 @@ class TestSearchView(RestOAuth, ESTestCase):
         # Reindex once we have everything.
         self.reindex(Webapp)
 
-        # There should (sadly) be 2 queries: one for the AddonPremium model and
-        # price, and one for the AddonPaymentAccount.
-        with self.assertNumQueries(2):
+        # The price and the payment account come from ES.
+        with self.assertNumQueries(0):
             res = self.anon.get(self.url, data={'premium_types': 'premium'})
         eq_(res.status_code, 200)
         obj = res.json['objects'][0]
         eq_(obj['slug'], self.webapp.app_slug)
+        eq_(obj['price'], '1.00')
+        eq_(obj['payment_account'],
+            reverse('payment-account-detail', kwargs={'pk': self.account.pk}))
 
     def test_premium_types_empty(self):
         with self.assertNumQueries(0):
@@ -960,6 +973,57 @@ class TestSearchViewFeatures(RestOAuth, ESTestCase):
         eq_(obj['slug'], self.webapp.app_slug)
 
 
+@override_settings(SEARCH_CACHE_TIMEOUT=60)
+class TestSearchCache(RestOAuth, ESTestCase):
+    fixtures = fixture('user_2519', 'webapp_337141')
+
+    def setUp(self):
+        super(TestSearchCache, self).setUp()
+        self.url = reverse('search-api')
+        self.webapp = Webapp.objects.get(pk=337141)
+        self.refresh('webapp')
+
+    def tearDown(self):
+        unindex_webapps(list(Webapp.with_deleted.values_list('id', flat=True)))
+        super(TestSearchCache, self).tearDown()
+
+    def search(self, client=None, **params):
+        res = (client or self.anon).get(self.url, data=params)
+        eq_(res.status_code, 200)
+        return res.json['objects']
+
+    @patch('mkt.search.views.statsd')
+    def test_cached(self, statsd):
+        eq_(len(self.search(q='something')), 1)
+        statsd.incr.assert_called_with('search.cache.miss')
+
+        with patch.object(Search, 'execute') as execute:
+            eq_(len(self.search(q='SomeThing')), 1)
+        ok_(not execute.called)
+        statsd.incr.assert_called_with('search.cache.hit')
+
+    @patch('mkt.search.views.statsd')
+    def test_cache_key(self, statsd):
+        self.search(q='something')
+        for params in ({'region': 'br'}, {'lang': 'fr'}, {'dev': 'firefoxos'},
+                       {'sort': 'rating'}, {'offset': 1}):
+            statsd.reset_mock()
+            self.search(q='something', **params)
+            statsd.incr.assert_called_with('search.cache.miss')
+
+    @patch('mkt.search.views.statsd')
+    def test_authenticated_not_cached(self, statsd):
+        self.search(client=self.client, q='something')
+        self.search(client=self.client, q='something')
+        ok_(not statsd.incr.called)
+
+    def test_invalidated_by_indexing(self):
+        eq_(len(self.search(q='something')), 1)
+        self.webapp.update(status=mkt.STATUS_UNLISTED)
+        self.refresh('webapp')
+        eq_(self.search(q='something'), [])
+
+
 class TestFeaturedSearchView(RestOAuth, ESTestCase):
     fixtures = fixture('user_2519', 'webapp_337141')
 
@@ -1209,6 +1273,8 @@ class TestRocketbarView(ESTestCase):
         self.app2.popularity.create(region=0, value=1000.0)
         self.app2.save()
         self.refresh('webapp')
+        # Build the prefix index now rather than in a background thread.
+        rocketbar_index.build(cache.get(CHANGES_KEY) or 0)
 
     def tearDown(self):
         # Cleanup to remove these from the index.
@@ -1239,6 +1305,16 @@ class TestRocketbarView(ESTestCase):
                         'slug': self.app2.app_slug})
         ok_(self.app2.get_icon_url(64).endswith('?modified=fakehash'))
 
+    @patch.object(rocketbar_index, 'index', None)
+    @patch.object(rocketbar_index, 'rebuilding', False)
+    @patch.object(rocketbar_index, 'start_rebuild')
+    def test_suggestions_prefix_index_not_built(self, start_rebuild):
+        response = self.client.get(self.url, data={'q': 'Something Second',
+                                                   'lang': 'en-US'})
+        parsed = json.loads(response.content)
+        eq_(len(parsed), 1)
+        eq_(parsed[0]['slug'], self.app2.app_slug)
+
     def test_suggestion_default_locale(self):
         self.app2.name.locale = 'es'
         self.app2.name.save()
@@ -1310,6 +1386,11 @@ class TestRocketbarView(ESTestCase):
             eq_(parsed[0]['icons'][str(size)], self.app2.get_icon_url(size))
 
 
+@override_settings(ROCKETBAR_PREFIX_INDEX=False)
+class TestRocketbarViewES(TestRocketbarView):
+    """Same as TestRocketbarView, with the ES completion suggester."""
+
+
 @patch('mkt.versions.models.Version.is_privileged', False)
 class TestMultiSearchView(RestOAuth, ESTestCase):
     fixtures = fixture('user_2519', 'webapp_337141')
@@ -2,10 +2,17 @@ from math import log10
 
 from django.core.exceptions import ObjectDoesNotExist
 
+from elasticsearch.exceptions import ElasticsearchException
+from elasticsearch_dsl.connections import connections
+from elasticsearch_dsl.result import Response
 from elasticsearch_dsl.search import Search as dslSearch
 from statsd import statsd
 
 from mkt.constants.base import VALID_STATUSES
+from mkt.site.utils import cache_ns_key
+
+
+SEARCH_CACHE_NAMESPACE = 'search'
 
 
 class Search(dslSearch):
@@ -17,6 +24,83 @@ class Search(dslSearch):
             return results
 
 
+class MultiSearch(object):
+    """
+    Runs several `Search` objects in a single msearch request.
+
+    Slicing applies to all the searches, so that a `MultiSearch` can be handed
+    to the paginator in place of a `Search`. `execute()` returns the response
+    of the selected search (the first one by default). The responses are
+    shared between the slices and `select()` copies, so the msearch request is
+    only made once: use `select(i)` to get at the other responses afterwards.
+    """
+    def __init__(self, searches, responses=None, selected=0):
+        self.searches = searches
+        self.responses = responses if responses is not None else []
+        self.selected = selected
+
+    def __getitem__(self, n):
+        return self.__class__([s[n] for s in self.searches], self.responses,
+                              self.selected)
+
+    def select(self, selected):
+        return self.__class__(self.searches, self.responses, selected)
+
+    def execute(self):
+        if not self.responses:
+            self.responses.extend(self._msearch())
+        return self.responses[self.selected]
+
+    def _msearch(self):
+        body = []
+        for search in self.searches:
+            header = {}
+            if search._index:
+                header['index'] = ','.join(search._index)
+            if search._doc_type:
+                header['type'] = ','.join(search._doc_type)
+            body.extend([header, search.to_dict()])
+
+        es = connections.get_connection(self.searches[0]._using)
+        with statsd.timer('search.execute'):
+            results = es.msearch(body=body)['responses']
+
+        responses = []
+        for search, result in zip(self.searches, results):
+            if 'error' in result:
+                raise ElasticsearchException(result['error'])
+            statsd.timing('search.took', result['took'])
+            responses.append(Response(result,
+                                      callbacks=search._doc_type_map))
+        return responses
+
+
+def invalidate_search_cache():
+    """
+    Bump the search cache namespace so cached search results are dropped.
+    """
+    cache_ns_key(SEARCH_CACHE_NAMESPACE, increment=True)
+
+
+def source_fields(search, *serializer_classes):
+    """
+    Restricts the `_source` of the documents returned by `search` to the keys
+    read by `serializer_classes`, unless one of them needs whole documents or
+    doesn't say what it reads.
+    """
+    if not serializer_classes:
+        return search
+    fields = set()
+    for serializer_class in serializer_classes:
+        get_source_fields = getattr(serializer_class, 'get_source_fields',
+                                    None)
+        keys = get_source_fields() if get_source_fields else None
+        if keys is None:
+            return search
+        fields.update(keys)
+    return search.extra(_source={'include': sorted(fields)})
+
+
 def _property_value_by_region(obj, region=None, property=None):
     if obj.is_dummy_content_for_qa():
         # Apps and Websites set up by QA for testing should never be considered
@@ -58,15 +142,20 @@ def get_trending(obj, region=None):
     return _property_value_by_region(obj, region=region, property='trending')
 
 
-def get_boost(obj):
+def get_boost(obj, popularity=None):
     """
     Returns the boost used in Elasticsearch for this app.
 
     The boost is based on a few factors, the most important is number of
     installs. We use log10 so the boost doesn't completely overshadow any
     other boosting we do at query time.
+
+    If `popularity` is passed, it's used as the global popularity value
+    instead of fetching it from the database.
     """
-    boost = max(log10(1 + get_popularity(obj)), 1.0)
+    if popularity is None:
+        popularity = get_popularity(obj)
+    boost = max(log10(1 + popularity), 1.0)
 
     # We give a little extra boost to approved apps.
     if obj.status in VALID_STATUSES:
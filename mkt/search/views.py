@@ -1,10 +1,16 @@
 from __future__ import absolute_import
 
+import hashlib
 import json
 
+from django.conf import settings
+from django.core.cache import cache
 from django.db.transaction import non_atomic_requests
 from django.http import HttpResponse
+from django.utils import translation
+from django.utils.http import urlencode
 
+from django_statsd.clients import statsd
 from rest_framework.generics import ListAPIView
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
@@ -23,7 +29,10 @@ from mkt.search.filters import (DeviceTypeFilter, OpenMobileACLFilter,
                                 SearchQueryFilter, SortingFilter,
                                 ValidAppsFilter)
 from mkt.search.serializers import DynamicSearchSerializer
-from mkt.search.utils import Search
+from mkt.search.suggest import rocketbar_index
+from mkt.search.utils import (Search, SEARCH_CACHE_NAMESPACE,
+                              source_fields)
+from mkt.site.utils import cache_ns_key
 from mkt.translations.helpers import truncate
 from mkt.webapps.indexers import WebappIndexer
 from mkt.webapps.serializers import (ESAppSerializer, RocketbarESAppSerializer,
@@ -49,8 +58,53 @@ class SearchView(CORSMixin, MarketplaceView, ListAPIView):
     form_class = ApiSearchForm
     paginator_class = ESPaginator
 
+    # Cache the results of anonymous searches, see get_cache_key().
+    cache_results = True
+
     def get_queryset(self):
-        return WebappIndexer.search()
+        # Only fetch what the serializer needs from the app documents.
+        return source_fields(WebappIndexer.search(),
+                             self.get_serializer_class())
+
+    def get_cache_key(self, request):
+        """
+        Key the results of a search on everything that changes them: the path
+        and API version, the region, the language and the query string (query,
+        device, profile, sorting and pagination parameters). Returns None if
+        the results can't be cached.
+        """
+        if (not self.cache_results or not settings.SEARCH_CACHE_TIMEOUT or
+                request.method != 'GET' or request.user.is_authenticated()):
+            return None
+        params = dict(request.QUERY_PARAMS.lists())
+        if 'q' in params:
+            # SearchQueryFilter lowercases the query anyway.
+            params['q'] = [q.lower() for q in params['q']]
+        region = getattr(request, 'REGION', None)
+        key = u':'.join([
+            request.path,
+            unicode(getattr(request, 'API_VERSION', '')),
+            region.slug if region else u'',
+            translation.get_language(),
+            urlencode(sorted(params.items()), doseq=True)])
+        return 'search:%s:%s' % (cache_ns_key(SEARCH_CACHE_NAMESPACE),
+                                 hashlib.md5(key.encode('utf-8')).hexdigest())
+
+    def list(self, request, *args, **kwargs):
+        cache_key = self.get_cache_key(request)
+        if cache_key is None:
+            return super(SearchView, self).list(request, *args, **kwargs)
+
+        data = cache.get(cache_key)
+        if data is not None:
+            statsd.incr('search.cache.hit')
+            return Response(data)
+
+        statsd.incr('search.cache.miss')
+        response = super(SearchView, self).list(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(cache_key, response.data, settings.SEARCH_CACHE_TIMEOUT)
+        return response
 
     @classmethod
     def as_view(cls, **kwargs):
@@ -68,6 +122,8 @@ class MultiSearchView(SearchView):
     `app`s only or `site`s only.
     """
     serializer_class = DynamicSearchSerializer
+    # Indexing websites doesn't invalidate the search cache.
+    cache_results = False
 
     def _get_doc_types(self):
         # Check if we are filtering by a doc_type (e.g., apps, sites).
@@ -187,6 +243,7 @@ class NoRegionSearchView(SearchView):
     filter_backends = [SearchQueryFilter, PublicSearchFormFilter,
                        PublicAppsFilter, DeviceTypeFilter,
                        ProfileFilter, SortingFilter]
+    cursor_pagination = True
 
 
 class RocketbarView(SearchView):
@@ -197,26 +254,40 @@ class RocketbarView(SearchView):
 
     def get(self, request, *args, **kwargs):
         limit = request.GET.get('limit', 5)
+        q = request.GET.get('q', '').strip()
+        data = None
+        if settings.ROCKETBAR_PREFIX_INDEX:
+            try:
+                limit = int(limit)
+            except ValueError:
+                limit = 5
+            with statsd.timer('search.rocketbar.prefix_index'):
+                data = rocketbar_index.suggest(q, limit)
+        if data is None:
+            # The prefix index is disabled or still being built.
+            data = self.get_es_suggestions(q, limit)
+        serializer = self.get_serializer(data)
+        # This returns a JSON list. Usually this is a bad idea for security
+        # reasons, but we don't include any user-specific data, it's fully
+        # anonymous, so we're fine.
+        return HttpResponse(json.dumps(serializer.data),
+                            content_type='application/x-rocketbar+json')
+
+    def get_es_suggestions(self, q, limit):
         es_query = {
             'apps': {
                 'completion': {'field': 'name_suggest', 'size': limit},
-                'text': request.GET.get('q', '').strip()
+                'text': q
             }
         }
 
-        results = WebappIndexer.get_es().suggest(
-            body=es_query, index=WebappIndexer.get_index())
+        with statsd.timer('search.rocketbar.es'):
+            results = WebappIndexer.get_es().suggest(
+                body=es_query, index=WebappIndexer.get_index())
 
         if 'apps' in results:
-            data = results['apps'][0]['options']
-        else:
-            data = []
-        serializer = self.get_serializer(data)
-        # This returns a JSON list. Usually this is a bad idea for security
-        # reasons, but we don't include any user-specific data, it's fully
-        # anonymous, so we're fine.
-        return HttpResponse(json.dumps(serializer.data),
-                            content_type='application/x-rocketbar+json')
+            return results['apps'][0]['options']
+        return []
 
 
 class RocketbarViewV2(RocketbarView):
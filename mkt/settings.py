@@ -340,6 +340,10 @@ FEATURED_APP_BG_PATH = UPLOADS_PATH + '/featured_app_background'
 FEED_COLLECTION_BG_PATH = UPLOADS_PATH + '/feed_collection_background'
 FEED_SHELF_BG_PATH = UPLOADS_PATH + '/feed_shelf_background'
 
+# How long (in seconds) feed responses are cached. Curation changes invalidate
+# the cache right away, this only bounds how stale the apps' data can get.
+FEED_CACHE_TIMEOUT = 60 * 5
+
 # Like ADDONS_PATH but protected by the app. Used for storing files that should
 # not be publicly accessible (like disabled add-ons).
 GUARDED_ADDONS_PATH = NETAPP_STORAGE + '/guarded-addons'
@@ -514,6 +518,11 @@ LANGUAGES = lazy(langs, dict)(AMO_LANGUAGES)
 # than this will include the `API-Status: Deprecated` header.
 API_CURRENT_VERSION = 1
 
+# How long (in seconds) the OAuth credentials and tokens used to authenticate
+# API requests, and the groups of their users, are cached. Changes to them
+# invalidate the cache.
+API_OAUTH_CACHE_TIMEOUT = 60 * 5
+
 # When True, the API will return a full traceback when an exception occurs.
 API_SHOW_TRACEBACKS = False
 
@@ -693,6 +702,9 @@ ES_INDEXES = {
 ES_URLS = ['http://%s' % h for h in ES_HOSTS]
 ES_USE_PLUGINS = False
 ES_TIMEOUT = 30
+# How long ES keeps the scroll context of a search paginated with a cursor
+# open between two pages.
+ES_SCROLL_TIMEOUT = '1m'
 
 # When True include full tracebacks in JSON. This is useful for QA on preview.
 EXPOSE_VALIDATOR_TRACEBACKS = True
@@ -1021,11 +1033,31 @@ REST_FRAMEWORK = {
     'PAGINATE_BY_PARAM': 'limit'
 }
 
+# How long (in seconds) the reviewer queue counts are cached. Review actions
+# and queue changes invalidate them. Set to 0 to disable.
+REVIEWER_QUEUE_STATS_CACHE_TIMEOUT = 10
+
+# How long (in seconds) to wait before recomputing an app's review aggregates
+# after a review is posted or deleted. Reviews posted in the meantime are
+# coalesced into that same run.
+REVIEW_AGGREGATES_DELAY = 10
+
+# Answer Rocketbar requests from an in-process prefix index of the apps'
+# `name_suggest` field instead of the ES completion suggester. Every process
+# checks for changes to the apps at most every
+# ROCKETBAR_PREFIX_INDEX_REFRESH seconds.
+ROCKETBAR_PREFIX_INDEX = True
+ROCKETBAR_PREFIX_INDEX_REFRESH = 10
+
 RTL_LANGUAGES = ('ar', 'fa', 'fa-IR', 'he')
 
 # Flip this on in your local settings to disable ES tests.
 RUN_ES_TESTS = True
 
+# How long (in seconds) anonymous app search results are cached. Indexing
+# apps invalidates them. Set to 0 to disable.
+SEARCH_CACHE_TIMEOUT = 60
+
 # If this is False, tasks and other jobs that send non-critical emails should
 # use a fake email backend.
 SEND_REAL_EMAIL = False
@@ -1073,6 +1105,15 @@ SIGNING_SERVER_ACTIVE = bool(SIGNING_SERVER)
 # And how long we'll give the server to respond.
 SIGNING_SERVER_TIMEOUT = 10
 
+# How many keep-alive connections to the signing server each process holds,
+# this also bounds how many receipts sign_many will sign at once.
+SIGNING_SERVER_POOL_SIZE = 10
+
+# How many times to retry a failed request to the signing server and the
+# backoff factor between retries (0.2 means 0.2s, 0.4s, 0.8s...).
+SIGNING_SERVER_RETRIES = 2
+SIGNING_SERVER_RETRY_BACKOFF = 0.2
+
 # The domains that we will accept certificate issuers for receipts.
 SIGNING_VALID_ISSUERS = []
 
@@ -1172,6 +1213,10 @@ WEBAPP_MANIFEST_NAME = 'Marketplace'
 # Send a new receipt back when it expires.
 WEBAPPS_RECEIPT_EXPIRED_SEND = False
 
+# How long (in seconds) the receipt verifier caches its results in memory.
+# Recording a refund or chargeback invalidates them. Set to 0 to disable.
+WEBAPPS_RECEIPT_RESULT_CACHE_TIMEOUT = 60
+
 # The expiry that we will add into the receipt.
 # Set to 6 months for the next little while.
 WEBAPPS_RECEIPT_EXPIRY_SECONDS = 60 * 60 * 24 * 182
@@ -66,7 +66,33 @@ class RequestCookiesMiddleware(object):
         return response
 
 
+# lang_from_accept_header() results, by header, for the language settings
+# they were computed with. The same few thousand headers come up over and
+# over, the results are just dropped if there are ever more than that.
+ACCEPT_LANGUAGE_CACHE_SIZE = 5000
+_accept_language_cache = {'settings': None, 'langs': {}}
+
+
 def lang_from_accept_header(header):
+    current = (settings.LANGUAGE_URL_MAP, settings.SHORTER_LANGUAGES,
+               settings.LANGUAGE_CODE)
+    cached = _accept_language_cache
+    if (cached['settings'] is None or
+            any(x is not y for x, y in zip(cached['settings'], current))):
+        cached['settings'], cached['langs'] = current, {}
+
+    langs = cached['langs']
+    try:
+        return langs[header]
+    except KeyError:
+        pass
+    if len(langs) >= ACCEPT_LANGUAGE_CACHE_SIZE:
+        langs.clear()
+    langs[header] = lang = _lang_from_accept_header(header)
+    return lang
+
+
+def _lang_from_accept_header(header):
     # Map all our lang codes and any prefixes to the locale code.
     langs = dict((k.lower(), v) for k, v in settings.LANGUAGE_URL_MAP.items())
 
@@ -124,8 +150,12 @@ class LocaleMiddleware(object):
         if lang != stored_lang or ov_lang != stored_ov_lang:
             request.LANG_COOKIE = ','.join([lang, ov_lang])
         if request.user.is_authenticated() and request.user.lang != lang:
+            from mkt.users.tasks import update_user_lang
+
+            # Don't write to the database in the middle of the request, nor
+            # more than the lang column.
             request.user.lang = lang
-            request.user.save()
+            update_user_lang.delay(request.user.pk, lang)
         request.LANG = lang
         tower.activate(lang)
 
@@ -40,12 +40,13 @@ from mkt.access.models import Group, GroupUser
 from mkt.constants import regions
 from mkt.constants.payments import PROVIDER_REFERENCE
 from mkt.files.helpers import copyfileobj
-from mkt.prices.models import AddonPremium, Price, PriceCurrency
+from mkt.prices.models import (AddonPremium, clear_price_matrix, Price,
+                               PriceCurrency)
 from mkt.search.indexers import BaseIndexer
 from mkt.site.fixtures import fixture
 from mkt.site.utils import app_factory
 from mkt.translations.hold import clean_translations
-from mkt.translations.models import Translation
+from mkt.translations.models import clear_loaded_translations, Translation
 from mkt.users.models import UserProfile
 from mkt.webapps.models import Webapp
 
@@ -433,6 +434,8 @@ class TestCase(MockEsMixin, MockBrowserIdMixin, ClassFixtureTestCase):
         # Clean the slate.
         cache.clear()
         post_request_task._discard_tasks()
+        clear_loaded_translations()
+        clear_price_matrix()
 
         trans_real.deactivate()
         trans_real._translations = {}  # Django fails to clear this cache.
@@ -664,8 +667,6 @@ class TestCase(MockEsMixin, MockBrowserIdMixin, ClassFixtureTestCase):
             PriceCurrency.objects.create(region=region, currency='USD',
                                          price=price, tier=price_obj,
                                          provider=PROVIDER_REFERENCE)
-        # Call Price transformer in order to repopulate _currencies cache.
-        Price.transformer([])
         return price_obj
 
     def make_premium(self, addon, price='1.00'):
@@ -673,8 +674,6 @@ class TestCase(MockEsMixin, MockBrowserIdMixin, ClassFixtureTestCase):
         addon.update(premium_type=mkt.ADDON_PREMIUM)
         addon._premium = AddonPremium.objects.create(addon=addon,
                                                      price=price_obj)
-        if hasattr(Price, '_currencies'):
-            del Price._currencies
         return addon._premium
 
     def create_sample(self, name=None, db=False, **kw):
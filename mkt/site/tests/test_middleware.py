@@ -174,6 +174,21 @@ class TestLocaleMiddlewarePersistence(mkt.site.tests.TestCase):
         self.client.get('/robots.txt', HTTP_ACCEPT_LANGUAGE='de')
         eq_(UserProfile.objects.get(pk=999).lang, 'de')
 
+    @patch('mkt.users.tasks.update_user_lang.delay')
+    def test_save_lang_deferred(self, update_user_lang):
+        self.login('regular@mozilla.com')
+        with patch.object(UserProfile, 'save') as save:
+            self.client.get('/robots.txt', HTTP_ACCEPT_LANGUAGE='de')
+        assert not save.called
+        update_user_lang.assert_called_once_with(999, 'de')
+
+    @patch('mkt.users.tasks.update_user_lang.delay')
+    def test_save_lang_unchanged(self, update_user_lang):
+        UserProfile.objects.get(pk=999).update(lang='de')
+        self.login('regular@mozilla.com')
+        self.client.get('/robots.txt', HTTP_ACCEPT_LANGUAGE='de')
+        assert not update_user_lang.called
+
 
 class TestVaryMiddleware(mkt.site.tests.TestCase):
     fixtures = fixture('user_999')
@@ -337,6 +352,19 @@ def accept_check(x, y):
     return eq_(lang_from_accept_header(x), y)
 
 
+def test_accept_language_memoized():
+    with patch('mkt.site.middleware._lang_from_accept_header') as parse:
+        parse.return_value = 'fr'
+        eq_(lang_from_accept_header('xx-memoized'), 'fr')
+        eq_(lang_from_accept_header('xx-memoized'), 'fr')
+        eq_(parse.call_count, 1)
+
+        # Results are dropped when the language settings change.
+        with patch.object(settings, 'LANGUAGE_URL_MAP', {'fr': 'fr'}):
+            eq_(lang_from_accept_header('xx-memoized'), 'fr')
+        eq_(parse.call_count, 2)
+
+
 def test_parse_accept_language():
     expected = 'ga-IE', 'zh-TW', 'zh-CN', 'en-US', 'fr'
     for lang in expected:
@@ -12,9 +12,11 @@ import mock
 from nose.tools import assert_raises, eq_, raises
 
 from mkt.site.tests import TestCase
-from mkt.site.utils import (cache_ns_key, escape_all, ImageCheck,
-                            LocalFileStorage, resize_image, rm_local_tmp_dir,
-                            slug_validator, slugify, walkfiles)
+from mkt.site.utils import (app_factory, cache_ns_key, chunked_ids,
+                            escape_all, ImageCheck, LocalFileStorage,
+                            resize_image, rm_local_tmp_dir, slug_validator,
+                            slugify, walkfiles)
+from mkt.webapps.models import Webapp
 
 
 def get_image_path(name):
@@ -41,6 +43,29 @@ class TestAnimatedImages(TestCase):
         assert img.is_image()
 
 
+class TestChunkedIds(TestCase):
+
+    def setUp(self):
+        self.ids = sorted(app_factory().pk for i in range(5))
+
+    def test_chunked_ids(self):
+        eq_(list(chunked_ids(Webapp.objects.all(), 2)),
+            [self.ids[0:2], self.ids[2:4], self.ids[4:]])
+
+    def test_chunked_ids_after(self):
+        eq_(list(chunked_ids(Webapp.objects.all(), 2, after=self.ids[1])),
+            [self.ids[2:4], self.ids[4:]])
+
+    def test_chunked_ids_filtered(self):
+        qs = Webapp.objects.exclude(pk=self.ids[1]).order_by('-id')
+        eq_(list(chunked_ids(qs, 3)),
+            [[self.ids[0]] + self.ids[2:4], self.ids[4:]])
+
+    def test_chunked_ids_is_lazy(self):
+        with self.assertNumQueries(1):
+            eq_(next(chunked_ids(Webapp.objects.all(), 2)), self.ids[0:2])
+
+
 def test_walkfiles():
     basedir = tempfile.mkdtemp()
     subdir = tempfile.mkdtemp(dir=basedir)
@@ -134,6 +134,25 @@ def chunked(seq, n):
         yield rv
 
 
+def chunked_ids(qs, n, after=0):
+    """
+    Yield successive lists of at most n ids from the queryset qs, in
+    ascending order.
+
+    Unlike chunked(qs.values_list('id', flat=True), n), the ids are never all
+    loaded in memory: each chunk is fetched with its own query starting after
+    the last id of the previous one (WHERE id > last ORDER BY id LIMIT n).
+    Pass `after` to start after a given id, e.g. to resume an interrupted job.
+    """
+    qs = qs.order_by('id').values_list('id', flat=True)
+    while True:
+        ids = list(qs.filter(id__gt=after)[:n])
+        if not ids:
+            break
+        yield ids
+        after = ids[-1]
+
+
 def _urlencode(items):
     """A Unicode-safe URLencoder."""
     try:
@@ -684,9 +703,18 @@ def get_icon_url(base_url_format, obj, size,
         return '{path}/{name}'.format(path=static_url('ICONS_DEFAULT_URL'),
                                       name=default_format.format(size=size))
     else:
-        # [1] is the whole ID, [2] is the directory.
-        split_id = re.match(r'((\d*?)\d{1,3})$', str(obj.pk))
-        # If we don't have the icon_hash set to a dummy string ("never"),
-        # when the icon is eventually changed, icon_hash will be updated.
-        suffix = obj.icon_hash or 'never'
-        return base_url_format % (split_id.group(2) or 0, obj.pk, size, suffix)
+        return get_stored_icon_url(base_url_format, obj.pk, size,
+                                   obj.icon_hash)
+
+
+def get_stored_icon_url(base_url_format, pk, size, icon_hash):
+    """
+    Returns the URL of the icon of the given `size` for the object with the
+    given `pk`, which has an icon. See get_icon_url().
+    """
+    # [1] is the whole ID, [2] is the directory.
+    split_id = re.match(r'((\d*?)\d{1,3})$', str(pk))
+    # If we don't have the icon_hash set to a dummy string ("never"),
+    # when the icon is eventually changed, icon_hash will be updated.
+    suffix = icon_hash or 'never'
+    return base_url_format % (split_id.group(2) or 0, pk, size, suffix)
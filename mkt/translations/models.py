@@ -1,12 +1,14 @@
 import collections
-from itertools import groupby
+import threading
 
+from django.core.signals import request_finished
 from django.db import connections, models, router
 from django.db.models.deletion import Collector
 from django.utils import encoding
 
 import bleach
 import commonware.log
+from celery.signals import task_postrun
 
 from mkt.site.models import ManagerBase, ModelBase
 
@@ -15,6 +17,10 @@ from . import utils
 
 log = commonware.log.getLogger('z.translations')
 
+# Translations loaded by load_translations() in the current request or task.
+_loaded = threading.local()
+MAX_LOADED_TRANSLATIONS = 10000
+
 
 class TranslationManager(ManagerBase):
 
@@ -24,6 +30,7 @@ class TranslationManager(ManagerBase):
         qs = Translation.objects.filter(id__in=filter(None, ids),
                                         locale=locale)
         qs.update(localized_string=None, localized_string_clean=None)
+        forget_translations(ids)
 
 
 class Translation(ModelBase):
@@ -266,39 +273,110 @@ def delete_translation(obj, fieldname):
         Translation.objects.filter(id=trans_id).delete()
 
 
-def _sorted_groupby(seq, key):
-    return groupby(sorted(seq, key=key), key=key)
+def convert_translation(translation, new_class):
+    """
+    Return a copy of `translation` converted to `new_class`, making
+    PurifiedTranslations and LinkifiedTranslations work.
+    """
+    converted_translation = new_class()
+    converted_translation.__dict__ = dict(translation.__dict__)
+    return converted_translation
 
 
-def attach_trans_dict(model, objs):
-    """Put all translations into a translations dict."""
-    # Get the ids of all the translations we need to fetch.
-    fields = model._meta.translated_fields
-    ids = [getattr(obj, f.attname) for f in fields
-           for obj in objs if getattr(obj, f.attname, None) is not None]
+def _get_loaded_translations():
+    """Returns the calling thread's loaded translations, keyed by id."""
+    return _loaded.__dict__.setdefault('translations', {})
+
 
-    # Get translations in a dict, ids will be the keys. It's important to
-    # consume the result of groupby, which is an iterator.
-    qs = Translation.objects.filter(id__in=ids, localized_string__isnull=False)
-    all_translations = dict((k, list(v)) for k, v in
-                            _sorted_groupby(qs, lambda trans: trans.id))
+def clear_loaded_translations(**kwargs):
+    """Forgets all the translations loaded by the calling thread."""
+    _get_loaded_translations().clear()
+
+
+def forget_translations(ids):
+    """Forgets the loaded translations for `ids`, e.g. once they change."""
+    loaded = _get_loaded_translations()
+    for t_id in ids:
+        loaded.pop(t_id, None)
+
+
+def load_translations(ids):
+    """
+    Return a dict of translation id -> list of Translations for `ids`.
+
+    Translations are kept for the rest of the request or task, so only the ids
+    that weren't loaded already are fetched, all in a single query.
+    """
+    loaded = _get_loaded_translations()
+    ids = [t_id for t_id in ids if t_id is not None]
+    missing = set(ids).difference(loaded)
+    if missing:
+        if len(loaded) + len(missing) > MAX_LOADED_TRANSLATIONS:
+            # Don't let long running processes outside of requests and tasks
+            # (e.g. cron jobs) hold on to every translation they ever used.
+            loaded.clear()
+            missing = set(ids)
+        for t_id in missing:
+            loaded[t_id] = []
+        qs = Translation.objects.filter(id__in=missing,
+                                        localized_string__isnull=False)
+        for trans in qs:
+            loaded[trans.id].append(trans)
+    return dict((t_id, loaded[t_id]) for t_id in ids)
+
+
+def _attach_trans_dicts(objs_and_fields):
+    # Get the ids of all the translations we need to fetch.
+    all_translations = load_translations([
+        getattr(obj, f.attname) for obj, fields in objs_and_fields
+        for f in fields if getattr(obj, f.attname, None) is not None])
 
     def get_locale_and_string(translation, new_class):
-        """Convert the translation to new_class (making PurifiedTranslations
-           and LinkifiedTranslations work) and return locale / string tuple."""
-        converted_translation = new_class()
-        converted_translation.__dict__ = translation.__dict__
+        """Convert the translation to new_class and return locale / string
+           tuple."""
+        converted_translation = convert_translation(translation, new_class)
         return (converted_translation.locale.lower(),
                 unicode(converted_translation))
 
     # Build and attach translations for each field on each object.
-    for obj in objs:
+    for obj, fields in objs_and_fields:
         obj.translations = collections.defaultdict(list)
         for field in fields:
             t_id = getattr(obj, field.attname, None)
             field_translations = all_translations.get(t_id, None)
-            if not t_id or field_translations is None:
+            if not t_id or not field_translations:
                 continue
 
             obj.translations[t_id] = [get_locale_and_string(t, field.rel.to)
                                       for t in field_translations]
+
+
+def attach_trans_dict(model, objs):
+    """Put all translations into a translations dict."""
+    fields = model._meta.translated_fields
+    _attach_trans_dicts([(obj, fields) for obj in objs])
+
+
+def attach_trans_dicts(objs):
+    """
+    Like attach_trans_dict(), but for objects of any translated models (e.g.
+    apps, their versions and geodata), using a single query for all of them.
+    """
+    _attach_trans_dicts([(obj, obj._meta.translated_fields) for obj in objs])
+
+
+def _forget_translation(sender, instance, **kwargs):
+    forget_translations([instance.id])
+
+
+# Forget loaded translations when they change, and at the end of every request
+# and task.
+for _model in (Translation, PurifiedTranslation, LinkifiedTranslation,
+               NoLinksTranslation, NoLinksNoMarkupTranslation):
+    for _signal in (models.signals.post_save, models.signals.post_delete):
+        _signal.connect(_forget_translation, sender=_model,
+                        dispatch_uid='forget_translation_%s' % _model.__name__)
+request_finished.connect(clear_loaded_translations,
+                         dispatch_uid='request_finished_translations')
+task_postrun.connect(clear_loaded_translations,
+                     dispatch_uid='task_postrun_translations')
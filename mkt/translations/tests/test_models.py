@@ -6,6 +6,7 @@ from contextlib import nested
 import django
 from django.apps import apps
 from django.conf import settings
+from django.core.signals import request_finished
 from django.db import connections, reset_queries
 from django.test import TransactionTestCase
 from django.test.utils import override_settings
@@ -20,8 +21,10 @@ from nose import SkipTest
 from nose.tools import eq_, ok_
 
 from mkt.translations import widgets
-from mkt.translations.models import (attach_trans_dict, LinkifiedTranslation,
-                                     NoLinksTranslation,
+from mkt.translations.models import (attach_trans_dict, attach_trans_dicts,
+                                     clear_loaded_translations,
+                                     delete_translation, LinkifiedTranslation,
+                                     load_translations, NoLinksTranslation,
                                      NoLinksNoMarkupTranslation,
                                      PurifiedTranslation, Translation,
                                      TranslationSequence)
@@ -954,3 +957,69 @@ class TestAttachTransDict(TestCase):
             set([('en-us', 'English 2 Linkified'),
                  ('es', 'Spanish 2 Linkified'),
                  ('fr', 'French 2 Linkified')]))
+
+
+class TestLoadTranslations(TestCase):
+    """
+    Tests for load_translations and attach_trans_dicts.
+    """
+
+    def setUp(self):
+        super(TestLoadTranslations, self).setUp()
+        self.FancyModel = (apps.get_app_config('testapp')
+                               .get_model('FancyModel'))
+        self.TranslatedModel = (apps.get_app_config('testapp')
+                                    .get_model('TranslatedModel'))
+
+    def test_heterogeneous_objects(self):
+        fancy = self.FancyModel.objects.create(purified='Purified',
+                                               linkified='Linkified')
+        translated = self.TranslatedModel.objects.create()
+        translated.name = {'en-us': 'English Name', 'fr': 'French Name'}
+        translated.save()
+
+        with self.assertNumQueries(1):
+            attach_trans_dicts([fancy, translated])
+
+        eq_(fancy.translations[fancy.purified_id],
+            [('en-us', unicode(fancy.purified))])
+        eq_(set(translated.translations[translated.name_id]),
+            set([('en-us', 'English Name'), ('fr', 'French Name')]))
+        eq_(translated.translations[translated.description_id], [])
+
+    def test_identity_map(self):
+        obj = self.FancyModel.objects.create(purified='Purified')
+        with self.assertNumQueries(1):
+            attach_trans_dict(self.FancyModel, [obj])
+        with self.assertNumQueries(0):
+            attach_trans_dict(self.FancyModel, [obj])
+            eq_(load_translations([obj.purified_id]).keys(),
+                [obj.purified_id])
+
+        clear_loaded_translations()
+        with self.assertNumQueries(1):
+            attach_trans_dict(self.FancyModel, [obj])
+
+    def test_forget_on_save(self):
+        obj = self.FancyModel.objects.create(purified='Purified')
+        attach_trans_dict(self.FancyModel, [obj])
+
+        obj.purified = 'Changed'
+        obj.save()
+        attach_trans_dict(self.FancyModel, [obj])
+        eq_(obj.translations[obj.purified_id], [('en-us', 'Changed')])
+
+    def test_forget_on_delete(self):
+        obj = self.FancyModel.objects.create(purified='Purified')
+        t_id = obj.purified_id
+        eq_(len(load_translations([t_id])[t_id]), 1)
+
+        delete_translation(obj, 'purified')
+        eq_(load_translations([t_id])[t_id], [])
+
+    def test_cleared_after_request(self):
+        obj = self.FancyModel.objects.create(purified='Purified')
+        attach_trans_dict(self.FancyModel, [obj])
+        request_finished.send(sender=self.__class__)
+        with self.assertNumQueries(1):
+            attach_trans_dict(self.FancyModel, [obj])
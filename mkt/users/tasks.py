@@ -0,0 +1,22 @@
+import logging
+
+from lib.post_request_task.task import task as post_request_task
+from mkt.users.models import UserProfile
+
+
+log = logging.getLogger('z.task')
+
+
+@post_request_task
+def update_user_lang(user_id, lang, **kw):
+    """
+    Stores the language a user last used the site in, touching nothing but
+    the `lang` column.
+    """
+    try:
+        user = UserProfile.objects.no_cache().get(pk=user_id)
+    except UserProfile.DoesNotExist:
+        return
+    if user.lang != lang:
+        log.info(u'Updating lang of user %s to %s.' % (user_id, lang))
+        user.update(lang=lang)
@@ -0,0 +1,26 @@
+from mock import patch
+from nose.tools import eq_
+
+import mkt.site.tests
+from mkt.site.fixtures import fixture
+from mkt.users.models import UserProfile
+from mkt.users.tasks import update_user_lang
+
+
+class TestUpdateUserLang(mkt.site.tests.TestCase):
+    fixtures = fixture('user_999')
+
+    def test_update(self):
+        with patch.object(UserProfile, 'save') as save:
+            update_user_lang(999, 'de')
+        assert not save.called
+        eq_(UserProfile.objects.get(pk=999).lang, 'de')
+
+    def test_unchanged(self):
+        UserProfile.objects.get(pk=999).update(lang='de')
+        with patch.object(UserProfile, 'update') as update:
+            update_user_lang(999, 'de')
+        assert not update.called
+
+    def test_missing_user(self):
+        update_user_lang(12345, 'de')
@@ -18,7 +18,7 @@ from mkt.api.models import Nonce
 from mkt.developers.models import ActivityLog
 from mkt.files.models import File, FileUpload
 from mkt.site.decorators import write
-from mkt.site.utils import chunked, days_ago, walkfiles
+from mkt.site.utils import chunked, chunked_ids, days_ago, walkfiles
 
 from .indexers import WebappIndexer
 from .models import Installed, Installs, Trending, Webapp
@@ -126,22 +126,14 @@ def clean_old_signed(seconds=60 * 60):
             shutil.rmtree(full)
 
 
-def _get_installs(app_id):
+def _installs_aggregations():
     """
-    Calculate popularity of app for all regions and per region.
-
-    Returns value in the format of::
-
-        {'all': <global installs>,
-         <region_slug>: <regional installs>,
-         ...}
-
+    Return the Monolith aggregations used to calculate the popularity of an
+    app, globally and per region.
     """
     # How many days back do we include when calculating popularity.
     POPULARITY_PERIOD = 90
 
-    client = get_monolith_client()
-
     popular = {
         'filter': {
             'range': {
@@ -160,6 +152,52 @@ def _get_installs(app_id):
         }
     }
 
+    return {
+        'popular': popular,
+        'region': {
+            'terms': {
+                'field': 'region',
+                # Add size so we get all regions, not just the top 10.
+                'size': len(mkt.regions.ALL_REGIONS)
+            },
+            'aggregations': {
+                'popular': popular
+            }
+        }
+    }
+
+
+def _installs_from_aggregations(aggregations):
+    """
+    Return the popularity of an app from the results of the aggregations
+    built by _installs_aggregations().
+    """
+    results = {
+        'all': aggregations['popular']['total_installs']['value']
+    }
+
+    if 'region' in aggregations:
+        for regional_res in aggregations['region']['buckets']:
+            region_slug = regional_res['key']
+            popular = regional_res['popular']['total_installs']['value']
+            results[region_slug] = popular
+
+    return results
+
+
+def _get_installs(app_id):
+    """
+    Calculate popularity of app for all regions and per region.
+
+    Returns value in the format of::
+
+        {'all': <global installs>,
+         <region_slug>: <regional installs>,
+         ...}
+
+    """
+    client = get_monolith_client()
+
     query = {
         'query': {
             'filtered': {
@@ -167,17 +205,48 @@ def _get_installs(app_id):
                 'filter': {'term': {'app-id': app_id}}
             }
         },
+        'aggregations': _installs_aggregations(),
+        'size': 0
+    }
+
+    try:
+        res = client.raw(query)
+    except ValueError as e:
+        task_log.error('Error response from Monolith: {0}'.format(e))
+        return {}
+
+    if 'aggregations' not in res:
+        task_log.error('No installs for app {}'.format(app_id))
+        return {}
+
+    return _installs_from_aggregations(res['aggregations'])
+
+
+def _get_installs_for_apps(app_ids):
+    """
+    Calculate popularity of all the apps in `app_ids` with a single Monolith
+    query, using a terms aggregation on the app id.
+
+    Returns a dict with the app ids as keys and values in the format returned
+    by _get_installs(). Apps without installs are not in the dict.
+
+    """
+    client = get_monolith_client()
+
+    query = {
+        'query': {
+            'filtered': {
+                'query': {'match_all': {}},
+                'filter': {'terms': {'app-id': list(app_ids)}}
+            }
+        },
         'aggregations': {
-            'popular': popular,
-            'region': {
+            'app': {
                 'terms': {
-                    'field': 'region',
-                    # Add size so we get all regions, not just the top 10.
-                    'size': len(mkt.regions.ALL_REGIONS)
+                    'field': 'app-id',
+                    'size': len(app_ids)
                 },
-                'aggregations': {
-                    'popular': popular
-                }
+                'aggregations': _installs_aggregations()
             }
         },
         'size': 0
@@ -186,24 +255,41 @@ def _get_installs(app_id):
     try:
         res = client.raw(query)
     except ValueError as e:
-        task_log.error('Error response from Monolith: {0}'.format(e))
-        return {}
+        task_log.error('Error response from Monolith for apps {0}, querying '
+                       'them one by one: {1}'.format(app_ids, e))
+        return _get_for_each_app(_get_installs, app_ids)
 
     if 'aggregations' not in res:
-        task_log.error('No installs for app {}'.format(app_id))
+        task_log.error('No installs for apps {}'.format(app_ids))
         return {}
 
-    results = {
-        'all': res['aggregations']['popular']['total_installs']['value']
-    }
+    return dict((int(app_res['key']), _installs_from_aggregations(app_res))
+                for app_res in res['aggregations']['app']['buckets'])
 
-    if 'region' in res['aggregations']:
-        for regional_res in res['aggregations']['region']['buckets']:
-            region_slug = regional_res['key']
-            popular = regional_res['popular']['total_installs']['value']
-            results[region_slug] = popular
 
-    return results
+def _get_for_each_app(get_scores, app_ids):
+    """
+    Fall back to one query per app with `get_scores` when the query for the
+    whole chunk failed, so that an error only drops the scores of the apps it
+    affects. Returns a dict like _get_installs_for_apps() does.
+    """
+    scores = {}
+    for app_id in app_ids:
+        app_scores = get_scores(app_id)
+        if app_scores:
+            scores[app_id] = app_scores
+    return scores
+
+
+def _regional_values(scores):
+    """
+    Map the scores returned by _get_installs() or _get_trending() to region
+    ids, region 0 holding the global score.
+    """
+    values = {0: scores.get('all')}
+    for region in mkt.regions.REGIONS_DICT.values():
+        values[region.id] = scores.get(region.slug)
+    return values
 
 
 @cronjobs.register
@@ -220,60 +306,25 @@ def update_app_installs():
     """
     chunk_size = 100
 
-    ids = list(Webapp.objects.filter(status=mkt.STATUS_PUBLIC,
-                                     disabled_by_user=False)
-                     .values_list('id', flat=True))
-
-    for chunk in chunked(ids, chunk_size):
-
-        count = 0
-        times = []
-        reindex_ids = []
-
-        for app in Webapp.objects.filter(id__in=chunk).no_transforms():
-
-            reindex = False
-            count += 1
-            now = datetime.now()
-            t_start = time.time()
-
-            scores = _get_installs(app.id)
-
-            # Update global installs, then per-region installs below.
-            value = scores.get('all')
-            if value > 0:
-                reindex = True
-                installs, created = app.popularity.get_or_create(
-                    region=0, defaults={'value': value})
-                if not created:
-                    installs.update(value=value, modified=now)
-            else:
-                # The value is <= 0 so we can just ignore it.
-                app.popularity.filter(region=0).delete()
-
-            for region in mkt.regions.REGIONS_DICT.values():
-                value = scores.get(region.slug)
-                if value > 0:
-                    reindex = True
-                    installs, created = app.popularity.get_or_create(
-                        region=region.id, defaults={'value': value})
-                    if not created:
-                        installs.update(value=value, modified=now)
-                else:
-                    # The value is <= 0 so we can just ignore it.
-                    app.popularity.filter(region=region.id).delete()
-
-            if reindex:
-                reindex_ids.append(app.id)
-
-            times.append(time.time() - t_start)
-
-        # Now reindex the apps that actually have a popularity value.
+    qs = Webapp.objects.filter(status=mkt.STATUS_PUBLIC,
+                               disabled_by_user=False)
+
+    for chunk in chunked_ids(qs, chunk_size):
+        t_start = time.time()
+
+        # Fetch the scores of the whole chunk in one Monolith query, then
+        # write them all at once.
+        chunk_scores = _get_installs_for_apps(chunk)
+        reindex_ids = Installs.bulk_set_values(dict(
+            (app_id, _regional_values(chunk_scores.get(app_id, {})))
+            for app_id in chunk))
+
+        # Now reindex the apps whose popularity changed.
         if reindex_ids:
-            WebappIndexer.run_indexing(reindex_ids)
+            WebappIndexer.run_indexing(sorted(reindex_ids))
 
-        log.info('Installs calculated for %s apps. Avg time overall: '
-                 '%0.2fs' % (count, sum(times) / count))
+        log.info('Installs calculated for %s apps, %s changed. Time: %0.2fs'
+                 % (len(chunk), len(reindex_ids), time.time() - t_start))
 
     # Purge any records that were not updated.
     #
@@ -292,29 +343,18 @@ def update_app_installs():
         WebappIndexer.run_indexing(ids)
 
 
-def _get_trending(app_id):
-    """
-    Calculate trending for app for all regions and per region.
-
-    a = installs from 8 days ago to 1 day ago
-    b = installs from 29 days ago to 9 days ago, averaged per week
-    trending = (a - b) / b if a > 100 and b > 1 else 0
+# How many app installs are required in the prior week to be considered
+# "trending". Adjust this as total Marketplace app installs increases.
+#
+# Note: AMO uses 1000.0 for add-ons.
+PRIOR_WEEK_INSTALL_THRESHOLD = 100.0
 
-    Returns value in the format of::
-
-        {'all': <global trending score>,
-         <region_slug>: <regional trending score>,
-         ...}
 
+def _trending_aggregations():
+    """
+    Return the Monolith aggregations used to calculate the trending score of
+    an app, globally and per region.
     """
-    # How many app installs are required in the prior week to be considered
-    # "trending". Adjust this as total Marketplace app installs increases.
-    #
-    # Note: AMO uses 1000.0 for add-ons.
-    PRIOR_WEEK_INSTALL_THRESHOLD = 100.0
-
-    client = get_monolith_client()
-
     week1 = {
         'filter': {
             'range': {
@@ -350,41 +390,28 @@ def _get_trending(app_id):
         }
     }
 
-    query = {
-        'query': {
-            'filtered': {
-                'query': {'match_all': {}},
-                'filter': {'term': {'app-id': app_id}}
+    return {
+        'week1': week1,
+        'week3': week3,
+        'region': {
+            'terms': {
+                'field': 'region',
+                # Add size so we get all regions, not just the top 10.
+                'size': len(mkt.regions.ALL_REGIONS)
+            },
+            'aggregations': {
+                'week1': week1,
+                'week3': week3
             }
-        },
-        'aggregations': {
-            'week1': week1,
-            'week3': week3,
-            'region': {
-                'terms': {
-                    'field': 'region',
-                    # Add size so we get all regions, not just the top 10.
-                    'size': len(mkt.regions.ALL_REGIONS)
-                },
-                'aggregations': {
-                    'week1': week1,
-                    'week3': week3
-                }
-            }
-        },
-        'size': 0
+        }
     }
 
-    try:
-        res = client.raw(query)
-    except ValueError as e:
-        task_log.error('Error response from Monolith: {0}'.format(e))
-        return {}
-
-    if 'aggregations' not in res:
-        task_log.error('No installs for app {}'.format(app_id))
-        return {}
 
+def _trending_from_aggregations(aggregations):
+    """
+    Return the trending scores of an app from the results of the
+    aggregations built by _trending_aggregations().
+    """
     def _score(week1, week3):
         # If last week app installs are < 100, this app isn't trending.
         if week1 < PRIOR_WEEK_INSTALL_THRESHOLD:
@@ -398,8 +425,8 @@ def _get_trending(app_id):
         return score
 
     # Global trending score.
-    week1 = res['aggregations']['week1']['total_installs']['value']
-    week3 = res['aggregations']['week3']['total_installs']['value'] / 3.0
+    week1 = aggregations['week1']['total_installs']['value']
+    week3 = aggregations['week3']['total_installs']['value'] / 3.0
 
     if week1 < PRIOR_WEEK_INSTALL_THRESHOLD:
         # If global installs over the last week aren't over 100, we
@@ -412,8 +439,8 @@ def _get_trending(app_id):
         'all': _score(week1, week3)
     }
 
-    if 'region' in res['aggregations']:
-        for regional_res in res['aggregations']['region']['buckets']:
+    if 'region' in aggregations:
+        for regional_res in aggregations['region']['buckets']:
             region_slug = regional_res['key']
             week1 = regional_res['week1']['total_installs']['value']
             week3 = regional_res['week3']['total_installs']['value'] / 3.0
@@ -422,6 +449,92 @@ def _get_trending(app_id):
     return results
 
 
+def _get_trending(app_id):
+    """
+    Calculate trending for app for all regions and per region.
+
+    a = installs from 8 days ago to 1 day ago
+    b = installs from 29 days ago to 9 days ago, averaged per week
+    trending = (a - b) / b if a > 100 and b > 1 else 0
+
+    Returns value in the format of::
+
+        {'all': <global trending score>,
+         <region_slug>: <regional trending score>,
+         ...}
+
+    """
+    client = get_monolith_client()
+
+    query = {
+        'query': {
+            'filtered': {
+                'query': {'match_all': {}},
+                'filter': {'term': {'app-id': app_id}}
+            }
+        },
+        'aggregations': _trending_aggregations(),
+        'size': 0
+    }
+
+    try:
+        res = client.raw(query)
+    except ValueError as e:
+        task_log.error('Error response from Monolith: {0}'.format(e))
+        return {}
+
+    if 'aggregations' not in res:
+        task_log.error('No installs for app {}'.format(app_id))
+        return {}
+
+    return _trending_from_aggregations(res['aggregations'])
+
+
+def _get_trending_for_apps(app_ids):
+    """
+    Calculate trending for all the apps in `app_ids` with a single Monolith
+    query, using a terms aggregation on the app id.
+
+    Returns a dict with the app ids as keys and values in the format returned
+    by _get_trending(). Apps without installs are not in the dict.
+
+    """
+    client = get_monolith_client()
+
+    query = {
+        'query': {
+            'filtered': {
+                'query': {'match_all': {}},
+                'filter': {'terms': {'app-id': list(app_ids)}}
+            }
+        },
+        'aggregations': {
+            'app': {
+                'terms': {
+                    'field': 'app-id',
+                    'size': len(app_ids)
+                },
+                'aggregations': _trending_aggregations()
+            }
+        },
+        'size': 0
+    }
+
+    try:
+        res = client.raw(query)
+    except ValueError as e:
+        task_log.error('Error response from Monolith for apps {0}, querying '
+                       'them one by one: {1}'.format(app_ids, e))
+        return _get_for_each_app(_get_trending, app_ids)
+
+    if 'aggregations' not in res:
+        task_log.error('No installs for apps {}'.format(app_ids))
+        return {}
+
+    return dict((int(app_res['key']), _trending_from_aggregations(app_res))
+                for app_res in res['aggregations']['app']['buckets'])
+
+
 @cronjobs.register
 @write
 def update_app_trending():
@@ -436,62 +549,25 @@ def update_app_trending():
     """
     chunk_size = 100
 
-    ids = list(Webapp.objects.filter(status=mkt.STATUS_PUBLIC,
-                                     disabled_by_user=False)
-                     .values_list('id', flat=True))
-
-    for chunk in chunked(ids, chunk_size):
-
-        count = 0
-        times = []
-        reindex_ids = []
-
-        for app in Webapp.objects.filter(id__in=chunk).no_transforms():
-
-            reindex = False
-            count += 1
-            now = datetime.now()
-            t_start = time.time()
-
-            scores = _get_trending(app.id)
-
-            # Update global trending, then per-region trending below.
-            value = scores.get('all')
-            if value > 0:
-                reindex = True
-                trending, created = app.trending.get_or_create(
-                    region=0, defaults={'value': value})
-                if not created:
-                    trending.update(value=value, modified=now)
-            else:
-                # The value is <= 0 so the app is not trending. Let's remove it
-                # from the trending table.
-                app.trending.filter(region=0).delete()
-
-            for region in mkt.regions.REGIONS_DICT.values():
-                value = scores.get(region.slug)
-                if value > 0:
-                    reindex = True
-                    trending, created = app.trending.get_or_create(
-                        region=region.id, defaults={'value': value})
-                    if not created:
-                        trending.update(value=value, modified=now)
-                else:
-                    # The value is <= 0 so the app is not trending.
-                    # Let's remove it from the trending table.
-                    app.trending.filter(region=region.id).delete()
-
-            times.append(time.time() - t_start)
-
-            if reindex:
-                reindex_ids.append(app.id)
-
-        # Now reindex the apps that actually have a trending score.
+    qs = Webapp.objects.filter(status=mkt.STATUS_PUBLIC,
+                               disabled_by_user=False)
+
+    for chunk in chunked_ids(qs, chunk_size):
+        t_start = time.time()
+
+        # Fetch the scores of the whole chunk in one Monolith query, then
+        # write them all at once.
+        chunk_scores = _get_trending_for_apps(chunk)
+        reindex_ids = Trending.bulk_set_values(dict(
+            (app_id, _regional_values(chunk_scores.get(app_id, {})))
+            for app_id in chunk))
+
+        # Now reindex the apps whose trending score changed.
         if reindex_ids:
-            WebappIndexer.run_indexing(reindex_ids)
+            WebappIndexer.run_indexing(sorted(reindex_ids))
 
-        log.info('Trending calculated for %s apps. Avg time overall: '
-                 '%0.2fs' % (count, sum(times) / count))
+        log.info('Trending calculated for %s apps, %s changed. Time: %0.2fs'
+                 % (len(chunk), len(reindex_ids), time.time() - t_start))
 
     # Purge any records that were not updated.
     #
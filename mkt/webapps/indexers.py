@@ -1,7 +1,7 @@
 from operator import attrgetter
 
 from django.core.urlresolvers import reverse
-from django.db.models import Min
+from django.db.models.query import prefetch_related_objects
 
 import commonware.log
 from elasticsearch_dsl import F
@@ -10,11 +10,13 @@ from elasticsearch_dsl.filter import Bool
 import mkt
 from mkt.constants import APP_FEATURES
 from mkt.constants.applications import DEVICE_GAIA
+from mkt.constants.payments import PROVIDER_BANGO
 from mkt.prices.models import AddonPremium
 from mkt.search.indexers import BaseIndexer
-from mkt.search.utils import Search
+from mkt.search.suggest import record_changes
+from mkt.search.utils import invalidate_search_cache, Search
 from mkt.tags.models import attach_tags
-from mkt.translations.models import attach_trans_dict
+from mkt.translations.models import attach_trans_dicts
 
 
 log = commonware.log.getLogger('z.addons')
@@ -40,6 +42,31 @@ class WebappIndexer(BaseIndexer):
         'description_l10n_*',
     )
 
+    """Relations fetched for a whole chunk of apps at once before extracting
+    their documents. Only use lookups that extract_document() accesses
+    through all() or a plain attribute, otherwise the prefetched objects
+    are ignored."""
+    prefetch_lookups = (
+        '_current_version__features',
+        '_current_version__manifest_json',
+        '_geodata',
+        '_latest_version__manifest_json',
+        '_upsell_from__premium___geodata',
+        '_upsell_from__premium__addonexcludedregion',
+        'addonexcludedregion',
+        'addonpremium__price__pricecurrency_set',
+        'addonuser_set',
+        'app_payment_accounts__payment_account',
+        'content_ratings',
+        'escalationqueue_set',
+        'popularity',
+        'previews',
+        'rating_descriptors',
+        'rating_interactives',
+        'rereviewqueue_set',
+        'trending',
+    )
+
     """
     Bunch of ES stuff for Webapp include mappings, indexing, search.
     """
@@ -55,6 +82,28 @@ class WebappIndexer(BaseIndexer):
             doc_type=cls.get_mapping_type_name())
             .extra(_source={'exclude': cls.hidden_fields}))
 
+    # Cached search results are dropped and the Rocketbar prefix indexes
+    # updated whenever apps are written or removed.
+    @classmethod
+    def index(cls, document, id_=None, es=None, index=None):
+        super(WebappIndexer, cls).index(document, id_=id_, es=es, index=index)
+        invalidate_search_cache()
+        record_changes({document['id']: document.get('name_suggest')})
+
+    @classmethod
+    def bulk_index(cls, documents, id_field='id', es=None, index=None):
+        super(WebappIndexer, cls).bulk_index(documents, id_field=id_field,
+                                             es=es, index=index)
+        invalidate_search_cache()
+        record_changes(dict((d['id'], d.get('name_suggest'))
+                            for d in documents))
+
+    @classmethod
+    def unindex(cls, id_, es=None, index=None):
+        super(WebappIndexer, cls).unindex(id_, es=es, index=index)
+        invalidate_search_cache()
+        record_changes({int(id_): None})
+
     @classmethod
     def get_mapping_type_name(cls):
         """
@@ -170,11 +219,14 @@ class WebappIndexer(BaseIndexer):
                     'name_suggest': {'type': 'completion', 'payloads': True},
                     'owners': {'type': 'long'},
                     'package_path': cls.string_not_indexed(),
+                    'payment_account': {'type': 'long', 'index': 'no'},
                     'premium_type': {'type': 'byte'},
                     'previews': {
                         'type': 'object',
                         'dynamic': 'true',
                     },
+                    # The price tier and its prices, only used by the API.
+                    'price': {'type': 'object', 'enabled': False},
                     'price_tier': cls.string_not_indexed(),
                     'ratings': {
                         'type': 'object',
@@ -232,20 +284,76 @@ class WebappIndexer(BaseIndexer):
 
         return mapping
 
+    @classmethod
+    def extract_price(cls, price):
+        """
+        Returns the price tier and the prices in every currency, for the
+        API to show prices without querying the database.
+        """
+        # Like Price.get_price_currency(), only active tiers have currencies.
+        currencies = price.pricecurrency_set.all() if price.active else []
+        return {
+            'id': price.id,
+            'method': price.method,
+            'name': price.name,
+            'price': unicode(price.price),
+            'currencies': [{'carrier': c.carrier, 'currency': c.currency,
+                            'price': unicode(c.price),
+                            'provider': c.provider, 'region': c.region}
+                           for c in currencies],
+        }
+
+    @classmethod
+    def attach_indexing_data(cls, objs):
+        """
+        Fetch and attach everything extract_document() needs for `objs`.
+
+        The number of queries made does not depend on the number of apps, so
+        this should be called once per chunk when indexing several apps.
+        """
+        from mkt.versions.models import Version
+        from mkt.webapps.models import attach_devices, attach_prices
+
+        if not objs:
+            return
+
+        for transform in (attach_devices, attach_prices, attach_tags):
+            transform(objs)
+
+        prefetch_related_objects(objs, cls.prefetch_lookups)
+
+        # We only need a few fields from all the versions, don't bother
+        # building full Version instances with their files and translations.
+        versions = (Version.objects.no_cache()
+                    .filter(addon__in=[obj.id for obj in objs])
+                    .values_list('addon', 'id', 'version', 'reviewed'))
+        versions_dict = dict((obj.id, []) for obj in objs)
+        for addon_id, version_id, version, reviewed in versions:
+            versions_dict[addon_id].append((version_id, version, reviewed))
+
+        for obj in objs:
+            obj.indexing_versions = versions_dict[obj.id]
+
+        # Translations for the apps, their current version and geodata, all
+        # in one query.
+        attach_trans_dicts(
+            list(objs) +
+            filter(None, (obj.current_version for obj in objs)) +
+            [obj.geodata for obj in objs])
+
     @classmethod
     def extract_document(cls, pk=None, obj=None):
         """Extracts the ElasticSearch index document for this instance."""
-        from mkt.webapps.models import (AppFeatures, attach_devices,
-                                        attach_prices, attach_translations,
-                                        RatingDescriptors, RatingInteractives)
+        from mkt.webapps.models import (AppFeatures, RatingDescriptors,
+                                        RatingInteractives)
 
         if obj is None:
             obj = cls.get_model().objects.no_cache().get(pk=pk)
 
-        # Attach everything we need to index apps.
-        for transform in (attach_devices, attach_prices, attach_tags,
-                          attach_translations):
-            transform([obj])
+        # Attach everything we need to index apps, unless it was already done
+        # for the whole chunk by extract_documents().
+        if not hasattr(obj, 'indexing_versions'):
+            cls.attach_indexing_data([obj])
 
         latest_version = obj.latest_version
         version = obj.current_version
@@ -287,14 +395,12 @@ class WebappIndexer(BaseIndexer):
             if version else ['*'])
         d['is_priority'] = obj.priority_review
 
-        is_escalated = obj.escalationqueue_set.exists()
-        d['is_escalated'] = is_escalated
-        d['escalation_date'] = (obj.escalationqueue_set.get().created
-                                if is_escalated else None)
-        is_rereviewed = obj.rereviewqueue_set.exists()
-        d['is_rereviewed'] = is_rereviewed
-        d['rereview_date'] = (obj.rereviewqueue_set.get().created
-                              if is_rereviewed else None)
+        escalations = obj.escalationqueue_set.all()
+        d['is_escalated'] = bool(escalations)
+        d['escalation_date'] = escalations[0].created if escalations else None
+        rereviews = obj.rereviewqueue_set.all()
+        d['is_rereviewed'] = bool(rereviews)
+        d['rereview_date'] = rereviews[0].created if rereviews else None
 
         if latest_version:
             d['latest_version'] = {
@@ -317,25 +423,33 @@ class WebappIndexer(BaseIndexer):
         d['manifest_url'] = obj.get_manifest_url()
         d['package_path'] = obj.get_package_path()
         d['name_sort'] = unicode(obj.name).lower()
-        d['owners'] = [au.user.id for au in
-                       obj.addonuser_set.filter(role=mkt.AUTHOR_ROLE_OWNER)]
+        d['owners'] = [au.user_id for au in obj.addonuser_set.all()
+                       if au.role == mkt.AUTHOR_ROLE_OWNER]
+
+        # Only the Bango account is exposed in the API, see
+        # AppSerializer.get_payment_account().
+        accounts = [a.payment_account_id
+                    for a in obj.app_payment_accounts.all()
+                    if a.payment_account.provider == PROVIDER_BANGO]
+        d['payment_account'] = accounts[0] if accounts else None
 
         d['previews'] = [{'filetype': p.filetype, 'modified': p.modified,
                           'id': p.id, 'sizes': p.sizes}
                          for p in obj.previews.all()]
         try:
             p = obj.addonpremium.price
-            d['price_tier'] = p.name
         except AddonPremium.DoesNotExist:
-            d['price_tier'] = None
+            p = None
+        d['price_tier'] = p.name if p else None
+        d['price'] = cls.extract_price(p) if p else None
 
         d['ratings'] = {
             'average': obj.average_rating,
             'count': obj.total_reviews,
         }
         d['region_exclusions'] = obj.get_excluded_region_ids()
-        d['reviewed'] = obj.versions.filter(
-            deleted=False).aggregate(Min('reviewed')).get('reviewed__min')
+        reviewed = [r for _, _, r in obj.indexing_versions if r is not None]
+        d['reviewed'] = min(reviewed) if reviewed else None
 
         # The default locale of the app is considered "supported" by default.
         supported_locales = [obj.default_locale]
@@ -358,9 +472,10 @@ class WebappIndexer(BaseIndexer):
                 'region_exclusions': upsell_obj.get_excluded_region_ids()
             }
 
-        d['versions'] = [dict(version=v.version,
-                              resource_uri=reverse_version(v))
-                         for v in obj.versions.all()]
+        d['versions'] = [dict(version=v_number,
+                              resource_uri=reverse('version-detail',
+                                                   kwargs={'pk': v_id}))
+                         for v_id, v_number, _ in obj.indexing_versions]
 
         # Handle localized fields.
         # This adds both the field used for search and the one with
@@ -374,12 +489,10 @@ class WebappIndexer(BaseIndexer):
             d.update(cls.extract_field_translations(obj, field))
 
         if version:
-            attach_trans_dict(version._meta.model, [version])
             d.update(cls.extract_field_translations(
                 version, 'release_notes', db_field='releasenotes_id'))
         else:
             d['release_notes_translations'] = None
-        attach_trans_dict(geodata._meta.model, [geodata])
         d.update(cls.extract_field_translations(geodata, 'banner_message'))
 
         # Add boost, popularity, trending values.
@@ -425,8 +538,20 @@ class WebappIndexer(BaseIndexer):
         qs = Webapp.with_deleted.no_cache().filter(id__in=ids)
         ES = ES or cls.get_es()
 
+        docs = cls.extract_documents(list(qs))
+        cls.bulk_index(docs, es=ES, index=index or cls.get_index())
+
+    @classmethod
+    def extract_documents(cls, objs):
+        """
+        Extracts the documents for all `objs`, fetching the related data for
+        the whole chunk in a fixed number of queries instead of doing it app
+        by app. Apps that fail to be extracted are logged and skipped.
+        """
+        cls.attach_indexing_data(objs)
+
         docs = []
-        for obj in list(qs):
+        for obj in objs:
             try:
                 docs.append(cls.extract_document(obj.id, obj=obj))
             except Exception as e:
@@ -434,8 +559,7 @@ class WebappIndexer(BaseIndexer):
                           .format(obj.id, repr(e)),
                           # Trying to chase down a cache-machine problem.
                           exc_info="marketplace:" in str(e))
-
-        cls.bulk_index(docs, es=ES, index=index or cls.get_index())
+        return docs
 
     @classmethod
     def filter_by_apps(cls, app_ids, queryset=None):
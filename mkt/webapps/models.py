@@ -5,6 +5,7 @@ import itertools
 import json
 import operator
 import os
+import threading
 import time
 import urlparse
 import uuid
@@ -13,15 +14,17 @@ from django.conf import settings
 from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.files.storage import default_storage as storage
+from django.core.signals import request_finished
 from django.core.urlresolvers import reverse
-from django.db import models, transaction
+from django.db import connection, models, transaction
 from django.db.models import signals as dbsignals, Max, Q
 from django.dispatch import receiver
 from django.utils.translation import trans_real as translation
 
 import caching.base as caching
 import commonware.log
-from cache_nuggets.lib import memoize, memoize_key
+from cache_nuggets.lib import memoize_key
+from celery.signals import task_postrun
 from django_extensions.db.fields.json import JSONField
 from jingo.helpers import urlparams
 from jinja2.filters import do_dictsort
@@ -49,12 +52,12 @@ from mkt.site.mail import send_mail
 from mkt.site.models import (DynamicBoolFieldsMixin, ManagerBase, ModelBase,
                              OnChangeMixin)
 from mkt.site.storage_utils import copy_stored_file
-from mkt.site.utils import (cached_property, get_icon_url, slugify, smart_path,
-                            sorted_groupby)
+from mkt.site.utils import (cached_property, chunked, get_icon_url, slugify,
+                            smart_path, sorted_groupby)
 from mkt.tags.models import Tag
 from mkt.translations.fields import (PurifiedField, save_signal,
                                      TranslatedField, Translation)
-from mkt.translations.models import attach_trans_dict
+from mkt.translations.models import attach_trans_dict, load_translations
 from mkt.translations.utils import find_language, to_language
 from mkt.users.models import UserForeignKey, UserProfile
 from mkt.versions.models import Version
@@ -191,6 +194,17 @@ def attach_translations(addons):
     attach_trans_dict(Webapp, addons)
 
 
+def preload_translations(addons):
+    """
+    Load the translations of all the fields of the apps and their current
+    version in a single query, so that serializing them in all languages
+    doesn't need a query per field.
+    """
+    objs = list(addons) + filter(None, (a.current_version for a in addons))
+    load_translations([getattr(obj, f.attname) for obj in objs
+                       for f in obj._meta.translated_fields])
+
+
 class AddonUser(caching.CachingMixin, models.Model):
     addon = models.ForeignKey('Webapp')
     user = UserForeignKey()
@@ -213,6 +227,29 @@ class AddonUser(caching.CachingMixin, models.Model):
                           ('addon', 'listed'))
 
 
+def preview_file_extension(filetype):
+    # Assume that blank is an image.
+    if not filetype:
+        return 'png'
+    return filetype.split('/')[1]
+
+
+def preview_image_url(url_template, preview_id, modified, filetype):
+    """
+    Returns the url of an image of the preview with the given id, built from
+    `url_template`. `modified` is the datetime the preview was last modified,
+    or None.
+    """
+    if modified is not None:
+        modified = int(time.mktime(modified.timetuple()))
+    else:
+        modified = 0
+    args = [preview_id / 1000, preview_id, modified]
+    if '.png' not in url_template:
+        args.insert(2, preview_file_extension(filetype))
+    return url_template % tuple(args)
+
+
 class Preview(ModelBase):
     addon = models.ForeignKey('Webapp', related_name='previews')
     filetype = models.CharField(max_length=25)
@@ -228,17 +265,11 @@ class Preview(ModelBase):
         index_together = ('addon', 'position', 'created')
 
     def _image_url(self, url_template):
-        if self.modified is not None:
-            if isinstance(self.modified, unicode):
-                self.modified = datetime.datetime.strptime(self.modified,
-                                                           '%Y-%m-%dT%H:%M:%S')
-            modified = int(time.mktime(self.modified.timetuple()))
-        else:
-            modified = 0
-        args = [self.id / 1000, self.id, modified]
-        if '.png' not in url_template:
-            args.insert(2, self.file_extension)
-        return url_template % tuple(args)
+        if isinstance(self.modified, unicode):
+            self.modified = datetime.datetime.strptime(self.modified,
+                                                       '%Y-%m-%dT%H:%M:%S')
+        return preview_image_url(url_template, self.id, self.modified,
+                                 self.filetype)
 
     def _image_path(self, url_template):
         args = [self.id / 1000, self.id]
@@ -261,10 +292,7 @@ class Preview(ModelBase):
 
     @property
     def file_extension(self):
-        # Assume that blank is an image.
-        if not self.filetype:
-            return 'png'
-        return self.filetype.split('/')[1]
+        return preview_file_extension(self.filetype)
 
     @property
     def thumbnail_url(self):
@@ -411,6 +439,24 @@ class UUIDModelMixin(object):
                 raise ValueError('Could not auto-generate a unique UUID')
 
 
+def price_lookup_regions(region, excluded):
+    """
+    Returns the ids of the regions to look the price of an app up in: the
+    `region` id, then RESTOFWORLD, leaving out the `excluded` region ids.
+    """
+    regions = []
+
+    # Don't allow the region if its excluded.
+    if region not in excluded:
+        regions.append(region)
+
+    # Don't add in rest of the world if its excluded either.
+    if RESTOFWORLD.id != region and RESTOFWORLD.id not in excluded:
+        regions.append(RESTOFWORLD.id)
+
+    return regions
+
+
 class Webapp(UUIDModelMixin, OnChangeMixin, ModelBase):
 
     STATUS_CHOICES = mkt.STATUS_CHOICES.items()
@@ -1531,16 +1577,8 @@ class Webapp(UUIDModelMixin, OnChangeMixin, ModelBase):
         If the payment provider is not specified, set it to the default.
         """
         from mkt.developers.providers import ALL_PROVIDERS
-        regions = []
-        excluded = self.get_excluded_region_ids()
-
-        # Don't allow the region if its excluded.
-        if region not in excluded:
-            regions.append(region)
-
-        # Don't add in rest of the world if its excluded either.
-        if (RESTOFWORLD != region and RESTOFWORLD.id not in excluded):
-            regions.append(RESTOFWORLD.id)
+        regions = price_lookup_regions(region,
+                                       self.get_excluded_region_ids())
 
         if not provider:
             provider = (
@@ -1633,8 +1671,9 @@ class Webapp(UUIDModelMixin, OnChangeMixin, ModelBase):
 
         Note: free and in-app are not included in this.
         """
-        excluded = set(self.addonexcludedregion
-                           .values_list('region', flat=True))
+        # Use all() so that prefetched exclusions are re-used, e.g. when
+        # indexing apps in bulk.
+        excluded = set(aer.region for aer in self.addonexcludedregion.all())
 
         if self.is_premium():
             all_regions = set(mkt.regions.ALL_REGION_IDS)
@@ -2161,7 +2200,62 @@ dbsignals.post_delete.connect(cleanup_upsell, sender=Webapp,
                               dispatch_uid='addon_upsell')
 
 
-class Installs(ModelBase):
+class RegionalValueMixin(object):
+    """Shared by models storing a value per app and per region."""
+
+    @classmethod
+    def bulk_set_values(cls, values, batch_size=500):
+        """
+        Set the values of many apps using a few multi-row queries.
+
+        `values` is a dict mapping app ids to dicts of region id -> value. A
+        value that isn't > 0 removes the row for that app and region. Regions
+        that are not in the dicts are left alone.
+
+        Rows are always written, even when their value doesn't change, so
+        that their `modified` date shows they were refreshed.
+
+        Returns the set of app ids for which at least one value changed.
+        """
+        existing = dict(
+            ((addon, region), (pk, value)) for pk, addon, region, value in
+            cls.objects.no_cache().filter(addon__in=values.keys())
+               .values_list('id', 'addon', 'region', 'value'))
+
+        now = datetime.datetime.now()
+        changed = set()
+        upserts = []
+        deletes = []
+        for app_id, regions in values.items():
+            for region, value in regions.items():
+                current = existing.get((app_id, region))
+                if value > 0:
+                    upserts.append((app_id, region, value, now, now))
+                    if current is None or current[1] != value:
+                        changed.add(app_id)
+                elif current is not None:
+                    deletes.append(current[0])
+                    changed.add(app_id)
+
+        table = connection.ops.quote_name(cls._meta.db_table)
+        cursor = connection.cursor()
+        for chunk in chunked(upserts, batch_size):
+            cursor.execute(
+                'INSERT INTO {0} (addon_id, region, value, created, modified) '
+                'VALUES {1} ON DUPLICATE KEY UPDATE value=VALUES(value), '
+                'modified=VALUES(modified)'.format(
+                    table, ', '.join(['(%s, %s, %s, %s, %s)'] * len(chunk))),
+                list(itertools.chain.from_iterable(chunk)))
+        for chunk in chunked(deletes, batch_size):
+            cursor.execute(
+                'DELETE FROM {0} WHERE id IN ({1})'.format(
+                    table, ', '.join(['%s'] * len(chunk))),
+                chunk)
+
+        return changed
+
+
+class Installs(RegionalValueMixin, ModelBase):
     addon = models.ForeignKey(Webapp, related_name='popularity')
     value = models.FloatField(default=0.0)
     # When region=0, we count across all regions.
@@ -2172,7 +2266,7 @@ class Installs(ModelBase):
         unique_together = ('addon', 'region')
 
 
-class Trending(ModelBase):
+class Trending(RegionalValueMixin, ModelBase):
     addon = models.ForeignKey(Webapp, related_name='trending')
     value = models.FloatField(default=0.0)
     # When region=0, it's trending using install counts across all regions.
@@ -2348,37 +2442,145 @@ class AddonExcludedRegion(ModelBase):
         return mkt.regions.REGIONS_CHOICES_ID_DICT.get(self.region)
 
 
-@memoize(prefix='get_excluded_in')
-def get_excluded_in(region_id):
+# The per-region sets of excluded apps are kept up to date by the signal
+# handlers below, the timeout only bounds how long a change made behind their
+# back (raw SQL, fixtures) can go unnoticed.
+EXCLUDED_IN_TIMEOUT = 60 * 60 * 24
+
+# The (region id, app id) pairs whose exclusion changed in the calling
+# thread's transaction, applied to the sets once it is committed.
+_excluded_in_local = threading.local()
+
+
+def _excluded_in_key(region_id):
+    return memoize_key('get_excluded_in', region_id)
+
+
+def _geodata_exclusions_q(region_id):
     """
-    Return IDs of Webapp objects excluded from a particular region or excluded
-    due to Geodata flags.
+    Return a Q object matching the Geodata flags excluding apps from a
+    particular region, or None if there are no such flags for that region.
     """
-    aers = list(AddonExcludedRegion.objects.filter(region=region_id)
-                .values_list('addon', flat=True))
-
-    # For pre-IARC unrated games in Brazil/Germany.
     geodata_qs = Q()
     region = parse_region(region_id)
+    # For pre-IARC unrated games in Brazil/Germany.
     if region in (mkt.regions.BRA, mkt.regions.DEU):
         geodata_qs |= Q(**{'region_%s_iarc_exclude' % region.slug: True})
     # For USK_RATING_REFUSED apps in Germany.
     if region == mkt.regions.DEU:
         geodata_qs |= Q(**{'region_de_usk_exclude': True})
+    return geodata_qs or None
+
+
+def get_excluded_in(region_id):
+    """
+    Return IDs of Webapp objects excluded from a particular region or excluded
+    due to Geodata flags.
+
+    The set is built once per region and cached, then updated in place when
+    an AddonExcludedRegion or Geodata changes instead of being thrown away,
+    so checking whether an app is excluded is a set lookup.
+    """
+    key = _excluded_in_key(region_id)
+    excluded = cache.get(key)
+    if excluded is None:
+        aers = list(AddonExcludedRegion.objects.filter(region=region_id)
+                    .values_list('addon', flat=True))
+        geodata_exclusions = []
+        geodata_qs = _geodata_exclusions_q(region_id)
+        if geodata_qs:
+            geodata_exclusions = list(Geodata.objects.filter(geodata_qs)
+                                      .values_list('addon', flat=True))
+        excluded = set(aers + geodata_exclusions)
+        # Don't overwrite the set while someone is updating it, that update
+        # could be missing from what we just read.
+        lock = '%s:lock' % key
+        if cache.add(lock, 1, 30):
+            try:
+                cache.set(key, excluded, EXCLUDED_IN_TIMEOUT)
+            finally:
+                cache.delete(lock)
+    return excluded
+
+
+def is_excluded_in(region_id, addon_id):
+    """Return whether an app is currently excluded from a region in the db."""
+    if (AddonExcludedRegion.objects.no_cache()
+            .filter(addon=addon_id, region=region_id).exists()):
+        return True
+    geodata_qs = _geodata_exclusions_q(region_id)
+    return bool(geodata_qs and Geodata.objects.no_cache()
+                .filter(geodata_qs, addon=addon_id).exists())
+
+
+def update_excluded_in(region_id, addon_id):
+    """
+    Add or remove an app from the cached set of apps excluded from a region,
+    depending on whether it is excluded from that region in the db.
+    """
+    key = _excluded_in_key(region_id)
+    excluded = cache.get(key)
+    if excluded is None:
+        # Not built yet, the next get_excluded_in() call will do it.
+        return
+    is_excluded = is_excluded_in(region_id, addon_id)
+    if (addon_id in excluded) == is_excluded:
+        return
+
+    lock = '%s:lock' % key
+    if not cache.add(lock, 1, 30):
+        # Someone else is updating this set: rather than risk one of the
+        # updates overwriting the other, drop the set and let the next
+        # get_excluded_in() call rebuild it.
+        cache.delete(key)
+        return
+    try:
+        excluded = cache.get(key)
+        if excluded is not None:
+            if is_excluded:
+                excluded.add(addon_id)
+            else:
+                excluded.discard(addon_id)
+            cache.set(key, excluded, EXCLUDED_IN_TIMEOUT)
+    finally:
+        cache.delete(lock)
+
+
+def _queue_excluded_in_update(region_id, addon_id):
+    """
+    Update the cached set of apps excluded from a region once the change to
+    the app's exclusion is committed: until then other processes would see an
+    exclusion that could still be rolled back.
+    """
+    changes = _excluded_in_local.__dict__.setdefault('changes', set())
+    changes.add((region_id, addon_id))
+    if not transaction.get_connection().in_atomic_block:
+        _update_excluded_in_done()
 
-    geodata_exclusions = []
-    if geodata_qs:
-        geodata_exclusions = list(Geodata.objects.filter(geodata_qs)
-                                  .values_list('addon', flat=True))
-    return set(aers + geodata_exclusions)
+
+def _update_excluded_in_done(**kwargs):
+    changes = _excluded_in_local.__dict__.pop('changes', set())
+    for region_id, addon_id in changes:
+        # If the transaction was rolled back this reads the old exclusion,
+        # leaving the set alone.
+        update_excluded_in(region_id, addon_id)
+
+
+request_finished.connect(_update_excluded_in_done,
+                         dispatch_uid='request_finished_excluded_in')
+task_postrun.connect(_update_excluded_in_done,
+                     dispatch_uid='task_postrun_excluded_in')
 
 
 @receiver(models.signals.post_save, sender=AddonExcludedRegion,
-          dispatch_uid='clean_memoized_exclusions')
-def clean_memoized_exclusions(sender, **kw):
-    if not kw.get('raw'):
-        cache.delete_many([memoize_key('get_excluded_in', k)
-                           for k in mkt.regions.ALL_REGION_IDS])
+          dispatch_uid='update_aer_exclusions')
+@receiver(models.signals.post_delete, sender=AddonExcludedRegion,
+          dispatch_uid='update_aer_exclusions_delete')
+def update_aer_exclusions(sender, instance, **kw):
+    if kw.get('raw'):
+        cache.delete(_excluded_in_key(instance.region))
+    else:
+        _queue_excluded_in_update(instance.region, instance.addon_id)
 
 
 class IARCInfo(ModelBase):
@@ -2763,3 +2965,15 @@ for region in (mkt.regions.BRA, mkt.regions.DEU):
 # Save geodata translations when a Geodata instance is saved.
 models.signals.pre_save.connect(save_signal, sender=Geodata,
                                 dispatch_uid='geodata_translations')
+
+
+@receiver(models.signals.post_save, sender=Geodata,
+          dispatch_uid='update_geodata_exclusions')
+@receiver(models.signals.post_delete, sender=Geodata,
+          dispatch_uid='update_geodata_exclusions_delete')
+def update_geodata_exclusions(sender, instance, **kw):
+    for region in (mkt.regions.BRA, mkt.regions.DEU):
+        if kw.get('raw'):
+            cache.delete(_excluded_in_key(region.id))
+        else:
+            _queue_excluded_in_update(region.id, instance.addon_id)
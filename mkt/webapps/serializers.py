@@ -1,15 +1,20 @@
+import datetime
 import json
+import operator
 from decimal import Decimal
+from functools import partial
 
 from django.conf import settings
 from django.core.urlresolvers import reverse
+from django.utils import translation
 
 import commonware.log
-from rest_framework import response, serializers
+from rest_framework import relations, response, serializers
 from tower import ungettext as ngettext
 
 import mkt
 from drf_compound_fields.fields import ListField
+from lib.utils import static_url
 from mkt.api.fields import (ESTranslationSerializerField, LargeTextField,
                             ReverseChoiceField, SemiSerializerMethodField,
                             TranslationSerializerField)
@@ -17,15 +22,18 @@ from mkt.constants.applications import DEVICE_TYPES
 from mkt.constants.categories import CATEGORY_CHOICES
 from mkt.constants.features import FeatureProfile
 from mkt.constants.payments import PROVIDER_BANGO
-from mkt.prices.models import AddonPremium, Price
+from mkt.prices.models import (AddonPremium, find_price_data, Price,
+                               PriceCurrency, price_key, price_locale)
 from mkt.search.serializers import BaseESSerializer, es_to_datetime
 from mkt.site.helpers import absolutify
+from mkt.site.utils import get_stored_icon_url
 from mkt.submit.forms import mark_for_rereview
 from mkt.submit.serializers import PreviewSerializer, SimplePreviewSerializer
 from mkt.tags.models import attach_tags
 from mkt.translations.utils import no_translation
 from mkt.versions.models import Version
 from mkt.webapps.models import (AddonUpsell, AppFeatures, Geodata, Preview,
+                                preview_image_url, price_lookup_regions,
                                 Webapp)
 from mkt.webapps.utils import dehydrate_content_rating
 
@@ -362,6 +370,29 @@ class AppSerializer(serializers.ModelSerializer):
         return instance
 
 
+def es_price_currency_getter(price, currencies):
+    """
+    Returns a function doing the same lookup as Price.get_price_currency() for
+    `price`, but using the `currencies` stored in ES instead of the db.
+    """
+    currencies = dict(
+        (price_key(dict(c, tier=price.id)),
+         PriceCurrency(tier=price, carrier=c['carrier'],
+                       currency=c['currency'], price=Decimal(c['price']),
+                       provider=c['provider'], region=c['region']))
+        for c in currencies)
+
+    def get_price_currency(carrier=None, region=None, provider=None):
+        from mkt.developers.providers import ALL_PROVIDERS
+        provider = (provider or
+                    ALL_PROVIDERS[settings.DEFAULT_PAYMENT_PROVIDER].provider)
+        return currencies.get(price_key({
+            'tier': price.id, 'carrier': carrier,
+            'provider': provider, 'region': region}))
+
+    return get_price_currency
+
+
 class ESAppSerializer(BaseESSerializer, AppSerializer):
     # Fields specific to search.
     absolute_url = serializers.SerializerMethodField('get_absolute_url')
@@ -384,6 +415,68 @@ class ESAppSerializer(BaseESSerializer, AppSerializer):
     # The fields we want converted to Python date/datetimes.
     datetime_fields = ('created', 'last_updated', 'modified', 'reviewed')
 
+    # The ES source keys to fetch, see BaseESSerializer. Subclasses adding
+    # fields have to add them to source_fields.
+    base_source_fields = (
+        'app_slug', 'app_type', 'author', 'category', 'current_version',
+        'default_locale', 'device', 'has_public_stats', 'icon_hash', 'id',
+        'is_disabled', 'modified', 'payment_account', 'premium_type',
+        'price', 'region_exclusions', 'status', 'supported_locales', 'tags')
+    source_fields = {
+        'absolute_url': (),
+        'app_type': (),
+        'author': (),
+        'banner_message': ('banner_message_translations',),
+        'banner_regions': (),
+        'categories': (),
+        'content_ratings': ('content_descriptors', 'content_ratings',
+                            'interactive_elements'),
+        'created': ('created',),
+        'current_version': (),
+        'default_locale': (),
+        'description': ('description_translations',),
+        'device_types': (),
+        'file_size': ('file_size',),
+        'group': ('group_translations',),
+        'homepage': ('homepage_translations',),
+        'icons': (),
+        'id': (),
+        'is_disabled': (),
+        'is_offline': ('is_offline',),
+        'is_packaged': (),
+        'last_updated': ('last_updated',),
+        'manifest_url': ('manifest_url',),
+        'modified': (),
+        'name': ('name_translations',),
+        'package_path': ('package_path',),
+        'payment_account': (),
+        'payment_required': (),
+        'premium_type': (),
+        'previews': ('previews',),
+        'price': (),
+        'price_locale': (),
+        'privacy_policy': (),
+        'public_stats': (),
+        'ratings': ('ratings',),
+        'regions': (),
+        'release_notes': ('release_notes_translations',),
+        'resource_uri': (),
+        'reviewed': ('reviewed',),
+        'slug': (),
+        'status': (),
+        'support_email': ('support_email_translations',),
+        'support_url': ('support_url_translations',),
+        'supported_locales': (),
+        'tags': (),
+        'upsell': ('upsell',),
+        'user': (),
+        'versions': ('versions',),
+    }
+
+    # Serialize hits with CompiledESAppSerializer when it supports this
+    # serializer instead of building fake objects for every hit.
+    fast_path = True
+
     class Meta(AppSerializer.Meta):
         fields = AppSerializer.Meta.fields + ['absolute_url', 'group',
                                               'reviewed']
@@ -393,18 +486,45 @@ class ESAppSerializer(BaseESSerializer, AppSerializer):
 
         # Remove fields that we don't have in ES at the moment.
         self.fields.pop('upsold', None)
-
-    def _attach_payments_info(self, obj):
-        try:
-            # When fetching Webapp from the database, optimizations are made
-            # with attach_prices() etc. But we can't do that with ES, so we
-            # have to manually select_related() the price when fetching the
-            # AddonPremium object to do fewer queries. The `premium` property
-            # will use `_premium` if it exists.
-            obj._premium = (
-                AddonPremium.objects.select_related('price').get(addon=obj))
-        except AddonPremium.DoesNotExist:
+        self._compiled = None
+
+    def to_native(self, data):
+        if self.fast_path:
+            if self._compiled is None:
+                self._compiled = (CompiledESAppSerializer.compile(self) or
+                                  False)
+            if self._compiled:
+                source = (data._source if hasattr(data, '_source') else
+                          data.get('_source', data))
+                try:
+                    return self._compiled.to_native(source)
+                except CompiledESAppSerializer.SlowPath:
+                    pass
+        return super(ESAppSerializer, self).to_native(data)
+
+    def _attach_payments_info(self, obj, data):
+        if 'price' not in data:
+            # Backwards compatibility with old indexes that don't store the
+            # price: fetch the AddonPremium object with select_related() on
+            # the price to do fewer queries. The `premium` property will use
+            # `_premium` if it exists.
+            try:
+                obj._premium = (AddonPremium.objects.select_related('price')
+                                .get(addon=obj))
+            except AddonPremium.DoesNotExist:
+                obj._premium = None
+            return
+
+        if not data['price']:
             obj._premium = None
+            return
+
+        price = Price(id=data['price']['id'], name=data['price']['name'],
+                      price=Decimal(data['price']['price']),
+                      method=data['price']['method'])
+        price.get_price_currency = es_price_currency_getter(
+            price, data['price']['currencies'])
+        obj._premium = AddonPremium(addon=obj, price=price)
 
     def fake_object(self, data):
         """Create a fake instance of Webapp and related models from ES data."""
@@ -431,7 +551,7 @@ class ESAppSerializer(BaseESSerializer, AppSerializer):
         obj.all_previews = [
             Preview(id=p['id'], modified=self.to_datetime(p['modified']),
                     filetype=p['filetype'], sizes=p.get('sizes', {}))
-            for p in data['previews']]
+            for p in data.get('previews', [])]
         obj.categories = data['category']
         obj.tags_list = data['tags']
         obj._device_types = [DEVICE_TYPES[d] for d in data['device']]
@@ -470,7 +590,7 @@ class ESAppSerializer(BaseESSerializer, AppSerializer):
 
         # Set up payments stuff to avoid extra queries.
         if obj.is_premium():
-            self._attach_payments_info(obj)
+            self._attach_payments_info(obj, data)
 
         # Some methods below will need the raw data from ES, put it on obj.
         obj.es_data = data
@@ -478,35 +598,47 @@ class ESAppSerializer(BaseESSerializer, AppSerializer):
         return obj
 
     def get_content_ratings(self, obj):
+        return self._es_content_ratings(obj.es_data)
+
+    def _es_content_ratings(self, data):
         body = (mkt.regions.REGION_TO_RATINGS_BODY().get(
             self.context['request'].REGION.slug, 'generic'))
         prefix = 'has_%s' % body
 
         # Backwards incompat with old index.
-        for i, desc in enumerate(obj.es_data.get('content_descriptors', [])):
+        for i, desc in enumerate(data.get('content_descriptors', [])):
             if desc.isupper():
-                obj.es_data['content_descriptors'][i] = 'has_' + desc.lower()
-        for i, inter in enumerate(obj.es_data.get('interactive_elements', [])):
+                data['content_descriptors'][i] = 'has_' + desc.lower()
+        for i, inter in enumerate(data.get('interactive_elements', [])):
             if inter.isupper():
-                obj.es_data['interactive_elements'][i] = 'has_' + inter.lower()
+                data['interactive_elements'][i] = 'has_' + inter.lower()
 
         return {
             'body': body,
             'rating': dehydrate_content_rating(
-                (obj.es_data.get('content_ratings') or {})
+                (data.get('content_ratings') or {})
                 .get(body)) or None,
             'descriptors': [key for key in
-                            obj.es_data.get('content_descriptors', [])
+                            data.get('content_descriptors', [])
                             if prefix in key],
             'descriptors_text': [mkt.iarc_mappings.REVERSE_DESCS[key] for key
-                                 in obj.es_data.get('content_descriptors')
+                                 in data.get('content_descriptors')
                                  if prefix in key],
-            'interactives': obj.es_data.get('interactive_elements', []),
+            'interactives': data.get('interactive_elements', []),
             'interactives_text': [mkt.iarc_mappings.REVERSE_INTERACTIVES[key]
                                   for key in
-                                  obj.es_data.get('interactive_elements')]
+                                  data.get('interactive_elements')]
         }
 
+    def get_payment_account(self, obj):
+        if 'payment_account' not in obj.es_data:
+            # Backwards compatibility with old indexes.
+            return super(ESAppSerializer, self).get_payment_account(obj)
+        if obj.is_premium() and obj.es_data['payment_account']:
+            return reverse('payment-account-detail',
+                           args=[obj.es_data['payment_account']])
+        return None
+
     def get_versions(self, obj):
         return dict((v['version'], v['resource_uri'])
                     for v in obj.es_data['versions'])
@@ -515,7 +647,10 @@ class ESAppSerializer(BaseESSerializer, AppSerializer):
         return obj.es_data.get('ratings', {})
 
     def get_upsell(self, obj):
-        upsell = obj.es_data.get('upsell', False)
+        return self._es_upsell(obj.es_data)
+
+    def _es_upsell(self, data):
+        upsell = data.get('upsell', False)
         if upsell:
             region_id = self.context['request'].REGION.id
             exclusions = upsell.get('region_exclusions')
@@ -595,6 +730,8 @@ class SimpleESAppSerializer(ESAppSerializer):
 class SuggestionsESAppSerializer(ESAppSerializer):
     icon = serializers.SerializerMethodField('get_icon')
 
+    source_fields = dict(ESAppSerializer.source_fields, icon=())
+
     class Meta(ESAppSerializer.Meta):
         fields = ['name', 'description', 'absolute_url', 'icon']
 
@@ -602,6 +739,425 @@ class SuggestionsESAppSerializer(ESAppSerializer):
         return app.get_icon_url(64)
 
 
+class CompiledESAppSerializer(object):
+    """
+    Serializes ES app hits straight from the ES data, returning the same
+    thing as the ESAppSerializer it was compiled from without creating fake
+    Webapp, Version, Geodata, Preview and AddonPremium instances for every
+    hit.
+
+    compile() returns None for serializers using fields or overrides it
+    doesn't know about, and to_native() raises SlowPath for hits that need
+    the database, in which case the regular serializer has to be used.
+    """
+
+    class SlowPath(Exception):
+        pass
+
+    # Fake pk used to reverse hyperlinked fields only once per serializer.
+    url_pk = 987654321987654321
+
+    # Field name -> (field class, field source, getter name) for the fields
+    # whose value is read from ES data and converted with field.to_native().
+    plain_fields = {
+        'app_type': (serializers.ChoiceField, None, '_app_type'),
+        'author': (serializers.CharField, 'developer_name', '_author'),
+        'banner_regions': (serializers.Field, 'geodata.banner_regions_slugs',
+                           '_banner_regions'),
+        'categories': (ListField, None, '_categories'),
+        'created': (serializers.DateField, None, '_created'),
+        'current_version': (serializers.CharField, 'current_version.version',
+                            '_current_version'),
+        'default_locale': (serializers.CharField, None, '_default_locale'),
+        'id': (serializers.IntegerField, 'pk', '_id'),
+        'is_disabled': (serializers.BooleanField, '_is_disabled',
+                        '_is_disabled'),
+        'is_offline': (serializers.BooleanField, None, '_is_offline'),
+        'is_packaged': (serializers.BooleanField, None, '_is_packaged'),
+        'last_updated': (serializers.DateField, None, '_last_updated'),
+        'manifest_url': (serializers.CharField, 'manifest_url',
+                         '_manifest_url'),
+        'modified': (serializers.DateField, None, '_modified'),
+        'premium_type': (ReverseChoiceField, None, '_premium_type'),
+        'public_stats': (serializers.BooleanField, None, '_public_stats'),
+        'reviewed': (serializers.DateField, None, '_reviewed'),
+        'slug': (serializers.CharField, 'app_slug', '_slug'),
+        'status': (serializers.IntegerField, None, '_status'),
+    }
+
+    # Field name -> (field source, ES key) for translated fields.
+    translation_fields = {
+        'banner_message': ('geodata.banner_message_translations',
+                           'banner_message_translations'),
+        'description': (None, 'description_translations'),
+        'group': (None, 'group_translations'),
+        'homepage': (None, 'homepage_translations'),
+        'name': (None, 'name_translations'),
+        'release_notes': ('current_version.releasenotes_translations',
+                          'release_notes_translations'),
+        'support_email': (None, 'support_email_translations'),
+        'support_url': (None, 'support_url_translations'),
+    }
+
+    # Serializer method -> getter name for SerializerMethodFields. Subclasses
+    # overriding any of those methods are not compiled.
+    method_fields = {
+        AppSerializer.get_device_types.__func__: '_device_types',
+        AppSerializer.get_icons.__func__: '_icons',
+        AppSerializer.get_payment_required.__func__: '_payment_required',
+        AppSerializer.get_price.__func__: '_price',
+        AppSerializer.get_price_locale.__func__: '_price_locale',
+        AppSerializer.get_supported_locales.__func__: '_supported_locales',
+        AppSerializer.get_tags.__func__: '_tags',
+        AppSerializer.get_user_info.__func__: '_user',
+        ESAppSerializer.get_absolute_url.__func__: '_absolute_url',
+        ESAppSerializer.get_content_ratings.__func__: '_content_ratings',
+        ESAppSerializer.get_file_size.__func__: '_file_size',
+        ESAppSerializer.get_package_path.__func__: '_package_path',
+        ESAppSerializer.get_payment_account.__func__: '_payment_account',
+        ESAppSerializer.get_ratings_aggregates.__func__: '_ratings',
+        ESAppSerializer.get_upsell.__func__: '_upsell',
+        ESAppSerializer.get_versions.__func__: '_versions',
+        BaseESAppFeedSerializer.get_icons.__func__: '_feed_icons',
+    }
+
+    # Preview field name -> (field class, field source, ES key or url
+    # setting) for SimplePreviewSerializer.
+    preview_fields = {
+        'filetype': (serializers.CharField, None, 'filetype'),
+        'id': (serializers.IntegerField, 'pk', 'id'),
+        'image_url': (serializers.CharField, None, 'PREVIEW_FULL_URL'),
+        'thumbnail_url': (serializers.CharField, None,
+                          'PREVIEW_THUMBNAIL_URL'),
+    }
+
+    def __init__(self, serializer):
+        from mkt.developers.providers import ALL_PROVIDERS
+
+        self.serializer = serializer
+        self.request = serializer.context['request']
+        self.region_id = serializer._get_region_id()
+        self.provider = (
+            ALL_PROVIDERS[settings.DEFAULT_PAYMENT_PROVIDER].provider)
+        self.banner_regions = Geodata().banner_regions_slugs()
+        self.icon_url = static_url('ADDON_ICON_URL')
+        self.regions_cache = {}
+        self.getters = []
+
+    @classmethod
+    def compile(cls, serializer):
+        """
+        Return a CompiledESAppSerializer for `serializer`, or None if it
+        can't be compiled.
+        """
+        klass = type(serializer)
+        if (serializer.context.get('request') is None or
+                klass.fake_object.__func__ is not
+                ESAppSerializer.fake_object.__func__ or
+                klass.get_field_key.__func__ is not
+                serializers.BaseSerializer.get_field_key.__func__):
+            return None
+
+        compiled = cls(serializer)
+        for name, field in serializer.fields.items():
+            # Same as ModelSerializer.to_native().
+            field.initialize(parent=serializer, field_name=name)
+            if (getattr(field, 'write_only', False) or
+                    callable(getattr(serializer, 'transform_%s' % name,
+                                     None))):
+                return None
+            getter = compiled.compile_field(name, field)
+            if getter is None:
+                return None
+            compiled.getters.append((name, getter))
+        return compiled
+
+    def compile_field(self, name, field):
+        """
+        Return a function returning the serialized value of `field` given ES
+        data, or None if the field isn't supported.
+        """
+        field_class = type(field)
+        if name in self.plain_fields:
+            klass, source, getter = self.plain_fields[name]
+            if field_class is klass and field.source == source:
+                return partial(self._native, field, getattr(self, getter))
+
+        if name in self.translation_fields:
+            source, key = self.translation_fields[name]
+            if (field_class is ESTranslationSerializerField and
+                    field.source == source):
+                return partial(self._translation, key,
+                               field.requested_language)
+
+        if field_class in (serializers.SerializerMethodField,
+                           SemiSerializerMethodField):
+            method = getattr(type(self.serializer), field.method_name, None)
+            getter = self.method_fields.get(getattr(method, '__func__', None))
+            if getter:
+                return partial(self._native, field, getattr(self, getter))
+
+        if (field_class in (serializers.HyperlinkedIdentityField,
+                            LargeTextField) and
+                name in ('privacy_policy', 'resource_uri') and
+                field.lookup_field == 'pk'):
+            return self.compile_url(field)
+
+        if (name == 'regions' and field_class is RegionSerializer and
+                field.many and field.source == 'get_regions'):
+            return partial(self._regions, field)
+
+        if (name == 'previews' and field_class is SimplePreviewSerializer and
+                field.many and field.source == 'all_previews'):
+            return self.compile_previews(field)
+
+    def compile_url(self, field):
+        format = field.context.get('format', None)
+        if isinstance(field, LargeTextField):
+            # Same as HyperlinkedRelatedField.to_native().
+            format = field.format or format
+        elif format and field.format and field.format != format:
+            # Same as HyperlinkedIdentityField.field_to_native().
+            format = field.format
+        url = relations.reverse(field.view_name, kwargs={'pk': self.url_pk},
+                                request=self.request, format=format)
+        if url.count(str(self.url_pk)) != 1:
+            return None
+        return partial(self._url, url.split(str(self.url_pk)))
+
+    def compile_previews(self, serializer):
+        fields = []
+        for name, field in serializer.fields.items():
+            if (name not in self.preview_fields or
+                    callable(getattr(serializer, 'transform_%s' % name,
+                                     None))):
+                return None
+            klass, source, key = self.preview_fields[name]
+            if type(field) is not klass or field.source != source:
+                return None
+            if name.endswith('_url'):
+                key = static_url(key)
+            fields.append((name, field, key))
+        return partial(self._previews, serializer, fields)
+
+    def to_native(self, data):
+        if (not data.get('id') or data.get('status') == mkt.STATUS_DELETED or
+                (self._is_premium(data) and
+                 ('price' not in data or 'payment_account' not in data))):
+            # The fake app would have no current version, or paid apps
+            # indexed before prices were stored in ES need the db.
+            raise self.SlowPath()
+
+        ret = self.serializer._dict_class()
+        for name, getter in self.getters:
+            ret[name] = getter(data)
+        return ret
+
+    def _native(self, field, getter, data):
+        return field.to_native(getter(data))
+
+    def _translation(self, key, lang, data):
+        translations = dict((v.get('lang', ''), v.get('string', ''))
+                            for v in data.get(key, {}) or {})
+        if lang:
+            # Same as ESTranslationSerializerField.fetch_single_translation().
+            return (translations.get(lang) or
+                    translations.get(data.get('default_locale')) or
+                    translations.get(settings.LANGUAGE_CODE) or None)
+        return translations or None
+
+    def _url(self, parts, data):
+        return str(data['id']).join(parts)
+
+    def _regions(self, serializer, data):
+        excluded = data['region_exclusions']
+        key = (translation.get_language(), tuple(excluded or []))
+        if key not in self.regions_cache:
+            # Same as Webapp.get_regions().
+            region_ids = sorted(set(mkt.regions.ALL_REGION_IDS) -
+                                set(excluded or []))
+            regions = sorted(
+                map(mkt.regions.REGIONS_CHOICES_ID_DICT.get, region_ids),
+                key=operator.attrgetter('slug'))
+            self.regions_cache[key] = [serializer.to_native(region)
+                                       for region in regions]
+        return [region.copy() for region in self.regions_cache[key]]
+
+    def _previews(self, serializer, fields, data):
+        previews = []
+        for preview in data['previews']:
+            modified = es_to_datetime(preview['modified'])
+            if not isinstance(modified, (datetime.datetime, type(None))):
+                raise self.SlowPath()
+
+            ret = serializer._dict_class()
+            for name, field, key in fields:
+                if name.endswith('_url'):
+                    value = preview_image_url(key, preview['id'], modified,
+                                              preview['filetype'])
+                else:
+                    value = preview[key]
+                ret[name] = field.to_native(value)
+            previews.append(ret)
+        return previews
+
+    def _is_premium(self, data):
+        return data.get('premium_type') in mkt.ADDON_PREMIUMS
+
+    def _has_premium(self, data):
+        return self._is_premium(data) and bool(data['price'])
+
+    def _price_data(self, data):
+        """Like Webapp.get_price(), without an AddonPremium."""
+        get_price_currency = es_price_currency_getter(
+            Price(id=data['price']['id']), data['price']['currencies'])
+        regions = price_lookup_regions(self.region_id,
+                                       data['region_exclusions'])
+        return find_price_data(get_price_currency, regions=regions,
+                               provider=self.provider)
+
+    def _app_type(self, data):
+        if data['app_type'] == mkt.ADDON_WEBAPP_PRIVILEGED:
+            app_type = mkt.ADDON_WEBAPP_PRIVILEGED
+        elif data['app_type'] != mkt.ADDON_WEBAPP_HOSTED:
+            app_type = mkt.ADDON_WEBAPP_PACKAGED
+        else:
+            app_type = mkt.ADDON_WEBAPP_HOSTED
+        return mkt.ADDON_WEBAPP_TYPES[app_type]
+
+    def _author(self, data):
+        return data['author']
+
+    def _banner_regions(self, data):
+        # Geodata isn't in ES, the fake app never has banner regions.
+        return self.banner_regions
+
+    def _categories(self, data):
+        return data['category']
+
+    def _created(self, data):
+        return es_to_datetime(data.get('created'))
+
+    def _current_version(self, data):
+        return data['current_version']
+
+    def _default_locale(self, data):
+        return data.get('default_locale')
+
+    def _id(self, data):
+        return data['id']
+
+    def _is_disabled(self, data):
+        return data['is_disabled']
+
+    def _is_offline(self, data):
+        return data.get('is_offline')
+
+    def _is_packaged(self, data):
+        return data['app_type'] != mkt.ADDON_WEBAPP_HOSTED
+
+    def _last_updated(self, data):
+        return es_to_datetime(data.get('last_updated'))
+
+    def _manifest_url(self, data):
+        return data.get('manifest_url')
+
+    def _modified(self, data):
+        return es_to_datetime(data.get('modified'))
+
+    def _premium_type(self, data):
+        return data.get('premium_type')
+
+    def _public_stats(self, data):
+        return data['has_public_stats']
+
+    def _reviewed(self, data):
+        return es_to_datetime(data.get('reviewed'))
+
+    def _slug(self, data):
+        return data['app_slug']
+
+    def _status(self, data):
+        return data.get('status')
+
+    def _absolute_url(self, data):
+        return absolutify(reverse('detail', args=[data['app_slug']]))
+
+    def _content_ratings(self, data):
+        return self.serializer._es_content_ratings(data)
+
+    def _device_types(self, data):
+        return [DEVICE_TYPES[d].api_name for d in data['device']]
+
+    def _file_size(self, data):
+        return data.get('file_size')
+
+    def _icon(self, data, size):
+        # ES apps always have an icon.
+        return get_stored_icon_url(self.icon_url, data['id'], size,
+                                   data.get('icon_hash'))
+
+    def _icons(self, data):
+        return dict([(icon_size, self._icon(data, icon_size))
+                     for icon_size in mkt.CONTENT_ICON_SIZES])
+
+    def _feed_icons(self, data):
+        return {
+            '64': self._icon(data, 64)
+        }
+
+    def _package_path(self, data):
+        return data.get('package_path')
+
+    def _payment_account(self, data):
+        if self._is_premium(data) and data['payment_account']:
+            return reverse('payment-account-detail',
+                           args=[data['payment_account']])
+        return None
+
+    def _payment_required(self, data):
+        if self._has_premium(data):
+            return bool(Decimal(data['price']['price']))
+        return False
+
+    def _price(self, data):
+        if self._has_premium(data):
+            return self._price_data(data)[0]
+        return None
+
+    def _price_locale(self, data):
+        if self._has_premium(data):
+            price, currency = self._price_data(data)
+            if price is not None and currency is not None:
+                return price_locale(price, currency)
+        return None
+
+    def _ratings(self, data):
+        return data.get('ratings', {})
+
+    def _supported_locales(self, data):
+        locs = data['supported_locales']
+        if locs:
+            return locs.split(',') if isinstance(locs, basestring) else locs
+        else:
+            return []
+
+    def _tags(self, data):
+        return data['tags']
+
+    def _upsell(self, data):
+        return self.serializer._es_upsell(data)
+
+    def _user(self, data):
+        if self.request.user.is_authenticated():
+            # Only the pk is needed to look up the user's relationships.
+            return self.serializer.get_user_info(Webapp(id=data['id']))
+
+    def _versions(self, data):
+        return dict((v['version'], v['resource_uri'])
+                    for v in data['versions'])
+
+
 class RocketbarESAppSerializer(serializers.Serializer):
     """Used by Firefox OS's Rocketbar apps viewer."""
     name = ESTranslationSerializerField()
@@ -35,7 +35,7 @@ from mkt.reviewers.models import EscalationQueue, RereviewQueue
 from mkt.site.decorators import set_task_user, use_master, write
 from mkt.site.helpers import absolutify
 from mkt.site.mail import send_mail_jinja
-from mkt.site.utils import chunked, JSONEncoder
+from mkt.site.utils import chunked, chunked_ids, JSONEncoder
 from mkt.users.models import UserProfile
 from mkt.users.utils import get_task_user
 from mkt.webapps.indexers import WebappIndexer
@@ -419,10 +419,8 @@ def rm_directory(path):
 
 
 def dump_all_apps_tasks():
-    all_pks = (Webapp.objects.visible()
-                             .values_list('pk', flat=True)
-                             .order_by('pk'))
-    return [dump_apps.si(pks) for pks in chunked(all_pks, 100)]
+    return [dump_apps.si(pks)
+            for pks in chunked_ids(Webapp.objects.visible(), 100)]
 
 
 @task
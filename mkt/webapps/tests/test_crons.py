@@ -20,8 +20,10 @@ from mkt.site.fixtures import fixture
 from mkt.users.models import UserProfile
 from mkt.versions.models import Version
 from mkt.webapps import cron
-from mkt.webapps.cron import (_get_installs, _get_trending, clean_old_signed,
-                              mkt_gc, update_app_installs, update_app_trending)
+from mkt.webapps.cron import (_get_installs, _get_installs_for_apps,
+                              _get_trending, _get_trending_for_apps,
+                              clean_old_signed, mkt_gc, update_app_installs,
+                              update_app_trending)
 from mkt.webapps.models import Installs, Trending, Webapp
 
 
@@ -244,9 +246,9 @@ class TestUpdateInstalls(mkt.site.tests.TestCase):
     def setUp(self):
         self.app = Webapp.objects.create(status=mkt.STATUS_PUBLIC)
 
-    @mock.patch('mkt.webapps.cron._get_installs')
+    @mock.patch('mkt.webapps.cron._get_installs_for_apps')
     def test_installs_saved(self, _mock):
-        _mock.return_value = {'all': 12.0}
+        _mock.return_value = {self.app.id: {'all': 12.0}}
         update_app_installs()
 
         eq_(get_popularity(self.app), 12.0)
@@ -257,7 +259,7 @@ class TestUpdateInstalls(mkt.site.tests.TestCase):
                 eq_(get_popularity(self.app, region=region), 0.0)
 
         # Test running again updates the values as we'd expect.
-        _mock.return_value = {'all': 2.0}
+        _mock.return_value = {self.app.id: {'all': 2.0}}
         update_app_installs()
         eq_(get_popularity(self.app), 2.0)
         for region in mkt.regions.REGIONS_DICT.values():
@@ -266,11 +268,11 @@ class TestUpdateInstalls(mkt.site.tests.TestCase):
             else:
                 eq_(get_popularity(self.app, region=region), 0.0)
 
-    @mock.patch('mkt.webapps.cron._get_installs')
+    @mock.patch('mkt.webapps.cron._get_installs_for_apps')
     def test_installs_deleted(self, _mock):
         self.app.trending.get_or_create(region=0, value=12.0)
 
-        _mock.return_value = {'all': 0.0}
+        _mock.return_value = {self.app.id: {'all': 0.0}}
         update_app_installs()
 
         with self.assertRaises(Installs.DoesNotExist):
@@ -305,15 +307,65 @@ class TestUpdateInstalls(mkt.site.tests.TestCase):
 
         eq_(_get_installs(self.app.id), {})
 
+    @mock.patch('mkt.webapps.cron.get_monolith_client')
+    def test_get_installs_for_apps(self, _mock):
+        client = FakeMonolithClient({
+            self.app.id: {'popular': 123, 'br': 12},
+            42: {'popular': 5},
+        })
+        _mock.return_value = client
+
+        res = _get_installs_for_apps([self.app.id, 42, 43])
+        eq_(res, {self.app.id: {'all': 123, 'br': 12}, 42: {'all': 5}})
+        eq_(len(client.queries), 1)
+        eq_(client.queries[0]['query']['filtered']['filter'],
+            {'terms': {'app-id': [self.app.id, 42, 43]}})
+
+    @mock.patch('mkt.webapps.cron.get_monolith_client')
+    def test_get_installs_for_apps_error(self, _mock):
+        client = mock.Mock()
+        client.raw.side_effect = ValueError
+        _mock.return_value = client
+
+        eq_(_get_installs_for_apps([self.app.id]), {})
+
+    @mock.patch('mkt.webapps.cron._get_installs')
+    @mock.patch('mkt.webapps.cron.get_monolith_client')
+    def test_get_installs_for_apps_error_one_by_one(self, _mock,
+                                                    _get_installs_mock):
+        client = mock.Mock()
+        client.raw.side_effect = ValueError
+        _mock.return_value = client
+        _get_installs_mock.side_effect = (
+            lambda app_id: {'all': 3} if app_id == 42 else {})
+
+        eq_(_get_installs_for_apps([self.app.id, 42]), {42: {'all': 3}})
+        eq_(_get_installs_mock.call_count, 2)
+
+    @mock.patch('mkt.webapps.cron.get_monolith_client')
+    def test_update_app_installs_requests(self, _mock):
+        """The number of Monolith queries depends on the number of chunks,
+        not on the number of apps."""
+        apps = [self.app] + [Webapp.objects.create(status=mkt.STATUS_PUBLIC)
+                             for i in range(4)]
+        client = FakeMonolithClient(
+            dict((app.id, {'popular': 10}) for app in apps))
+        _mock.return_value = client
+
+        update_app_installs()
+        eq_(len(client.queries), 1)
+        for app in apps:
+            eq_(get_popularity(app), 10.0)
+
 
 class TestUpdateTrending(mkt.site.tests.TestCase):
 
     def setUp(self):
         self.app = Webapp.objects.create(status=mkt.STATUS_PUBLIC)
 
-    @mock.patch('mkt.webapps.cron._get_trending')
+    @mock.patch('mkt.webapps.cron._get_trending_for_apps')
     def test_trending_saved(self, _mock):
-        _mock.return_value = {'all': 12.0}
+        _mock.return_value = {self.app.id: {'all': 12.0}}
         update_app_trending()
 
         eq_(get_trending(self.app), 12.0)
@@ -324,7 +376,7 @@ class TestUpdateTrending(mkt.site.tests.TestCase):
                 eq_(get_trending(self.app, region=region), 0.0)
 
         # Test running again updates the values as we'd expect.
-        _mock.return_value = {'all': 2.0}
+        _mock.return_value = {self.app.id: {'all': 2.0}}
         update_app_trending()
         eq_(get_trending(self.app), 2.0)
         for region in mkt.regions.REGIONS_DICT.values():
@@ -333,11 +385,11 @@ class TestUpdateTrending(mkt.site.tests.TestCase):
             else:
                 eq_(get_trending(self.app, region=region), 0.0)
 
-    @mock.patch('mkt.webapps.cron._get_trending')
+    @mock.patch('mkt.webapps.cron._get_trending_for_apps')
     def test_trending_deleted(self, _mock):
         self.app.trending.get_or_create(region=0, value=12.0)
 
-        _mock.return_value = {'all': 0.0}
+        _mock.return_value = {self.app.id: {'all': 0.0}}
         update_app_trending()
 
         with self.assertRaises(Trending.DoesNotExist):
@@ -452,3 +504,80 @@ class TestUpdateTrending(mkt.site.tests.TestCase):
         _mock.return_value = client
 
         eq_(_get_trending(self.app.id), {})
+
+    @mock.patch('mkt.webapps.cron.get_monolith_client')
+    def test_get_trending_for_apps(self, _mock):
+        client = FakeMonolithClient({
+            self.app.id: {'week1': 102, 'week3': 102,
+                          'br': {'week1': 255, 'week3': 102}},
+            42: {'week1': 99, 'week3': 2},
+        })
+        _mock.return_value = client
+
+        res = _get_trending_for_apps([self.app.id, 42, 43])
+        eq_(res, {self.app.id: {'all': 2.0, 'br': 6.5}, 42: {}})
+        eq_(len(client.queries), 1)
+
+    @mock.patch('mkt.webapps.cron._get_trending')
+    @mock.patch('mkt.webapps.cron.get_monolith_client')
+    def test_get_trending_for_apps_error_one_by_one(self, _mock,
+                                                    _get_trending_mock):
+        client = mock.Mock()
+        client.raw.side_effect = ValueError
+        _mock.return_value = client
+        _get_trending_mock.side_effect = (
+            lambda app_id: {'all': 2.0} if app_id == 42 else {})
+
+        eq_(_get_trending_for_apps([self.app.id, 42]), {42: {'all': 2.0}})
+        eq_(_get_trending_mock.call_count, 2)
+
+    @mock.patch('mkt.webapps.cron.get_monolith_client')
+    def test_update_app_trending_requests(self, _mock):
+        apps = [self.app] + [Webapp.objects.create(status=mkt.STATUS_PUBLIC)
+                             for i in range(4)]
+        client = FakeMonolithClient(
+            dict((app.id, {'week1': 255, 'week3': 255}) for app in apps))
+        _mock.return_value = client
+
+        update_app_trending()
+        eq_(len(client.queries), 1)
+        for app in apps:
+            eq_(get_trending(app), 2.0)
+
+
+class FakeMonolithClient(object):
+    """
+    Answers the queries made by _get_installs_for_apps() and
+    _get_trending_for_apps() from `data`, recording each query made.
+
+    `data` maps app ids to a dict of aggregation name -> installs value, plus
+    region slug -> dict of aggregation name -> installs value.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.queries = []
+
+    def _bucket(self, values):
+        bucket = {}
+        regions = []
+        for key, value in values.items():
+            if isinstance(value, dict):
+                region = self._bucket(value)
+                region['key'] = key
+                regions.append(region)
+            else:
+                bucket[key] = {'total_installs': {'value': value}}
+        bucket['region'] = {'buckets': regions}
+        return bucket
+
+    def raw(self, query):
+        self.queries.append(query)
+        app_ids = query['query']['filtered']['filter']['terms']['app-id']
+        buckets = []
+        for app_id in app_ids:
+            if app_id in self.data:
+                bucket = self._bucket(self.data[app_id])
+                bucket['key'] = app_id
+                buckets.append(bucket)
+        return {'aggregations': {'app': {'buckets': buckets}}}
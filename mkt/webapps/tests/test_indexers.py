@@ -1,16 +1,20 @@
 # -*- coding: utf-8 -*-
-from django.test.utils import override_settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
 
 import json
 from nose.tools import eq_, ok_
 
 import mkt
 from mkt.constants.applications import DEVICE_TYPES
+from mkt.constants.payments import PROVIDER_BANGO, PROVIDER_REFERENCE
+from mkt.developers.models import (AddonPaymentAccount, PaymentAccount,
+                                   SolitudeSeller)
 from mkt.reviewers.models import EscalationQueue, RereviewQueue
 from mkt.search.utils import get_boost
 from mkt.site.fixtures import fixture
 from mkt.site.tests import ESTestCase, TestCase
-from mkt.site.utils import version_factory
+from mkt.site.utils import app_factory, version_factory
 from mkt.translations.utils import to_language
 from mkt.users.models import UserProfile
 from mkt.webapps.indexers import WebappIndexer
@@ -144,6 +148,41 @@ class TestWebappIndexer(TestCase):
         eq_(doc['is_rereviewed'], True)
         self.assertCloseToNow(doc['rereview_date'])
 
+    def test_extract_no_price(self):
+        obj, doc = self._get_doc()
+        eq_(doc['price'], None)
+        eq_(doc['price_tier'], None)
+        eq_(doc['payment_account'], None)
+
+    def test_extract_price(self):
+        premium = self.make_premium(self.app)
+        obj, doc = self._get_doc()
+        eq_(doc['price_tier'], premium.price.name)
+        eq_(doc['price']['id'], premium.price.pk)
+        eq_(doc['price']['price'], '1.00')
+        eq_(sorted((c['region'], c['currency'], c['price'], c['provider'])
+                   for c in doc['price']['currencies']),
+            [(mkt.regions.RESTOFWORLD.id, 'USD', '1.00', PROVIDER_REFERENCE),
+             (mkt.regions.USA.id, 'USD', '1.00', PROVIDER_REFERENCE)])
+
+    def test_extract_price_inactive_tier(self):
+        premium = self.make_premium(self.app)
+        premium.price.update(active=False)
+        obj, doc = self._get_doc()
+        eq_(doc['price']['currencies'], [])
+
+    def test_extract_payment_account(self):
+        seller = SolitudeSeller.objects.create(
+            resource_uri='/path/to/sel', uuid='seller-id', user=self.user)
+        account = PaymentAccount.objects.create(
+            user=self.user, uri='asdf', name='test', inactive=False,
+            solitude_seller=seller, account_id=123, provider=PROVIDER_BANGO)
+        AddonPaymentAccount.objects.create(
+            addon=self.app, account_uri='foo', payment_account=account,
+            product_uri='bpruri')
+        obj, doc = self._get_doc()
+        eq_(doc['payment_account'], account.pk)
+
     def test_extract_is_priority(self):
         self.app.update(priority_review=True)
         obj, doc = self._get_doc()
@@ -251,6 +290,45 @@ class TestWebappIndexer(TestCase):
         ok_('trending_2' not in doc)
 
 
+class TestWebappIndexerBulkExtraction(TestCase):
+
+    def _create_apps(self, num):
+        apps = []
+        for i in range(num):
+            app = app_factory()
+            version_factory(addon=app, version='2.0')
+            app.addonexcludedregion.create(region=mkt.regions.GBR.id)
+            app.popularity.create(region=0, value=42.0)
+            EscalationQueue.objects.create(addon=app)
+            apps.append(app)
+        return apps
+
+    def _count_queries(self, apps):
+        objs = list(Webapp.with_deleted.no_cache()
+                    .filter(id__in=[app.pk for app in apps]))
+        with CaptureQueriesContext(connection) as ctx:
+            docs = WebappIndexer.extract_documents(objs)
+        eq_(len(docs), len(apps))
+        return len(ctx.captured_queries)
+
+    def test_num_queries_does_not_depend_on_chunk_size(self):
+        apps = self._create_apps(5)
+        eq_(self._count_queries(apps[:2]), self._count_queries(apps))
+
+    def test_same_documents_as_extract_document(self):
+        apps = self._create_apps(2)
+        objs = list(Webapp.with_deleted.no_cache()
+                    .filter(id__in=[app.pk for app in apps]).order_by('pk'))
+        docs = WebappIndexer.extract_documents(objs)
+        for app, doc in zip(apps, docs):
+            obj = Webapp.with_deleted.no_cache().get(pk=app.pk)
+            eq_(doc, WebappIndexer.extract_document(obj.pk, obj))
+            eq_(doc['is_escalated'], True)
+            eq_(doc['popularity'], 42)
+            eq_(doc['region_exclusions'], [mkt.regions.GBR.id])
+            eq_(len(doc['versions']), 2)
+
+
 class TestExcludedFields(ESTestCase):
     fixtures = fixture('webapp_337141')
 
@@ -16,13 +16,17 @@ from django import forms
 from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
 from django.core import mail
+from django.core.cache import cache
 from django.core.files.storage import default_storage as storage
+from django.core.signals import request_finished
 from django.core.urlresolvers import reverse
+from django.db import transaction
 from django.db.models.signals import post_delete, post_save
 from django.test.utils import override_settings
 from django.utils import translation
 
 import elasticsearch
+from cache_nuggets.lib import memoize_key
 import mock
 from mock import patch
 from nose.tools import eq_, ok_, raises
@@ -58,9 +62,11 @@ from mkt.webapps.indexers import WebappIndexer
 from mkt.webapps.models import (AddonDeviceType, AddonExcludedRegion,
                                 AddonUpsell, AppFeatures, AppManifest,
                                 BlockedSlug, ContentRating, Geodata,
-                                get_excluded_in, IARCInfo, Installed, Preview,
-                                RatingDescriptors, RatingInteractives,
-                                version_changed, Webapp)
+                                get_excluded_in, IARCInfo, Installed, Installs,
+                                Preview, preview_image_url,
+                                price_lookup_regions, RatingDescriptors,
+                                RatingInteractives, Trending, version_changed,
+                                Webapp)
 from mkt.webapps.signals import version_changed as version_changed_signal
 
 
@@ -521,6 +527,33 @@ class TestPreviewModel(mkt.site.tests.TestCase):
         assert 'png' in self.preview.thumbnail_path
         assert 'webm' in self.preview.image_path
 
+    def test_image_url_matches_preview_image_url(self):
+        self.preview.update(filetype='video/webm')
+        preview = self.preview
+        url = preview_image_url(static_url('PREVIEW_FULL_URL'), preview.id,
+                                preview.modified, preview.filetype)
+        eq_(self.preview.image_url, url)
+        assert '.webm' in url
+
+    def test_preview_image_url_no_modified(self):
+        eq_(preview_image_url('/%s/%s.%s?modified=%s', 1234, None, ''),
+            '/1/1234.png?modified=0')
+
+
+class TestPriceLookupRegions(TestCase):
+
+    def test_regions(self):
+        eq_(price_lookup_regions(mkt.regions.USA.id, []),
+            [mkt.regions.USA.id, RESTOFWORLD.id])
+
+    def test_region_excluded(self):
+        eq_(price_lookup_regions(mkt.regions.USA.id, [mkt.regions.USA.id]),
+            [RESTOFWORLD.id])
+
+    def test_restofworld(self):
+        eq_(price_lookup_regions(RESTOFWORLD.id, []), [RESTOFWORLD.id])
+        eq_(price_lookup_regions(RESTOFWORLD.id, [RESTOFWORLD.id]), [])
+
 
 class TestRemoveLocale(mkt.site.tests.TestCase):
 
@@ -1499,6 +1532,96 @@ class TestExclusions(TestCase):
         ok_(mkt.regions.DEU.id in excluded)
 
 
+class TestExcludedIn(TestCase):
+
+    def setUp(self):
+        self.app = app_factory()
+        self.geodata = self.app._geodata
+        # Build the sets before making changes.
+        eq_(get_excluded_in(mkt.regions.BRA.id), set())
+        eq_(get_excluded_in(mkt.regions.DEU.id), set())
+
+    def commit(self):
+        # The sets are updated once the request's transaction is committed.
+        request_finished.send(sender=self.__class__)
+
+    def test_aer_added(self):
+        self.app.addonexcludedregion.create(region=mkt.regions.BRA.id)
+        self.commit()
+        with self.assertNumQueries(0):
+            eq_(get_excluded_in(mkt.regions.BRA.id), set([self.app.id]))
+            eq_(get_excluded_in(mkt.regions.DEU.id), set())
+
+    def test_aer_added_not_committed(self):
+        self.app.addonexcludedregion.create(region=mkt.regions.BRA.id)
+        with self.assertNumQueries(0):
+            eq_(get_excluded_in(mkt.regions.BRA.id), set())
+
+    def test_aer_added_rolled_back(self):
+        try:
+            with transaction.atomic():
+                self.app.addonexcludedregion.create(region=mkt.regions.BRA.id)
+                raise ValueError
+        except ValueError:
+            pass
+        self.commit()
+        eq_(get_excluded_in(mkt.regions.BRA.id), set())
+
+    def test_aer_deleted(self):
+        aer = self.app.addonexcludedregion.create(region=mkt.regions.BRA.id)
+        aer.delete()
+        self.commit()
+        with self.assertNumQueries(0):
+            eq_(get_excluded_in(mkt.regions.BRA.id), set())
+
+    def test_aer_deleted_geodata_still_excludes(self):
+        aer = self.app.addonexcludedregion.create(region=mkt.regions.DEU.id)
+        self.geodata.update(region_de_usk_exclude=True)
+        aer.delete()
+        self.commit()
+        with self.assertNumQueries(0):
+            eq_(get_excluded_in(mkt.regions.DEU.id), set([self.app.id]))
+
+    def test_geodata(self):
+        self.geodata.update(region_br_iarc_exclude=True)
+        self.commit()
+        with self.assertNumQueries(0):
+            eq_(get_excluded_in(mkt.regions.BRA.id), set([self.app.id]))
+            eq_(get_excluded_in(mkt.regions.DEU.id), set())
+
+        self.geodata.update(region_br_iarc_exclude=False,
+                            region_de_iarc_exclude=True)
+        self.commit()
+        with self.assertNumQueries(0):
+            eq_(get_excluded_in(mkt.regions.BRA.id), set())
+            eq_(get_excluded_in(mkt.regions.DEU.id), set([self.app.id]))
+
+    def test_not_built(self):
+        cache.clear()
+        self.app.addonexcludedregion.create(region=mkt.regions.BRA.id)
+        self.commit()
+        eq_(cache.get(memoize_key('get_excluded_in', mkt.regions.BRA.id)),
+            None)
+        eq_(get_excluded_in(mkt.regions.BRA.id), set([self.app.id]))
+
+    def test_concurrent_update(self):
+        key = memoize_key('get_excluded_in', mkt.regions.BRA.id)
+        # Someone else is updating the set, ours gets dropped instead.
+        cache.add('%s:lock' % key, 1)
+        self.app.addonexcludedregion.create(region=mkt.regions.BRA.id)
+        self.commit()
+        eq_(cache.get(key), None)
+        eq_(get_excluded_in(mkt.regions.BRA.id), set([self.app.id]))
+
+    def test_rebuild_during_update(self):
+        key = memoize_key('get_excluded_in', mkt.regions.BRA.id)
+        cache.delete(key)
+        # Someone else is updating the set, the rebuilt one isn't stored.
+        cache.add('%s:lock' % key, 1)
+        eq_(get_excluded_in(mkt.regions.BRA.id), set())
+        eq_(cache.get(key), None)
+
+
 class TestPackagedAppManifestUpdates(mkt.site.tests.TestCase):
     # Note: More extensive tests for `.update_names` are above.
 
@@ -2216,6 +2339,50 @@ class TestInstalled(mkt.site.tests.TestCase):
         assert self.m(install_type=apps.INSTALL_TYPE_REVIEWER)[1]
 
 
+class TestRegionalValues(mkt.site.tests.TestCase):
+
+    def setUp(self):
+        self.app = Webapp.objects.create()
+        self.other_app = Webapp.objects.create()
+
+    def values(self, model, app):
+        return dict(model.objects.filter(addon=app)
+                    .values_list('region', 'value'))
+
+    def test_insert(self):
+        changed = Installs.bulk_set_values({
+            self.app.id: {0: 12.0, 7: 3.0, 2: 0.0},
+            self.other_app.id: {0: None},
+        })
+        eq_(changed, set([self.app.id]))
+        eq_(self.values(Installs, self.app), {0: 12.0, 7: 3.0})
+        eq_(self.values(Installs, self.other_app), {})
+
+    def test_update_and_delete(self):
+        self.app.trending.create(region=0, value=12.0)
+        self.app.trending.create(region=7, value=3.0)
+        self.app.trending.create(region=2, value=3.0)
+        self.other_app.trending.create(region=0, value=5.0)
+
+        with self.assertNumQueries(3):
+            changed = Trending.bulk_set_values({
+                self.app.id: {0: 2.0, 7: 0.0},
+                self.other_app.id: {0: 5.0},
+            })
+        eq_(changed, set([self.app.id]))
+        # Region 2 wasn't passed, it's left alone.
+        eq_(self.values(Trending, self.app), {0: 2.0, 2: 3.0})
+        eq_(self.values(Trending, self.other_app), {0: 5.0})
+
+    def test_unchanged_rows_are_touched(self):
+        installs = self.app.popularity.create(region=0, value=12.0)
+        Installs.objects.filter(pk=installs.pk).update(
+            modified=self.days_ago(2))
+
+        eq_(Installs.bulk_set_values({self.app.id: {0: 12.0}}), set())
+        self.assertCloseToNow(Installs.objects.get(pk=installs.pk).modified)
+
+
 class TestAppFeatures(DynamicBoolFieldsTestMixin, mkt.site.tests.TestCase):
 
     def setUp(self):
@@ -8,9 +8,11 @@ from django.test.utils import override_settings
 
 import mock
 from nose.tools import eq_, ok_
+from rest_framework import serializers
 
 import mkt
 import mkt.site.tests
+from mkt.api.renderers import SuccinctJSONRenderer
 from mkt.constants import ratingsbodies, regions
 from mkt.constants.payments import PROVIDER_REFERENCE
 from mkt.constants.regions import RESTOFWORLD
@@ -18,13 +20,17 @@ from mkt.developers.models import (AddonPaymentAccount, PaymentAccount,
                                    SolitudeSeller)
 from mkt.prices.models import PriceCurrency
 from mkt.regions.middleware import RegionMiddleware
+from mkt.search.utils import source_fields
 from mkt.site.fixtures import fixture
 from mkt.users.models import UserProfile
 from mkt.versions.models import Version
 from mkt.webapps.indexers import WebappIndexer
 from mkt.webapps.models import AddonDeviceType, Installed, Preview, Webapp
-from mkt.webapps.serializers import (AppSerializer, ESAppSerializer,
-                                     SimpleESAppSerializer)
+from mkt.webapps.serializers import (AppSerializer, CompiledESAppSerializer,
+                                     ESAppFeedCollectionSerializer,
+                                     ESAppFeedSerializer, ESAppSerializer,
+                                     SimpleESAppSerializer,
+                                     SuggestionsESAppSerializer)
 
 
 class TestAppSerializer(mkt.site.tests.TestCase):
@@ -538,6 +544,31 @@ class TestESAppSerializer(mkt.site.tests.ESTestCase):
         eq_(res['price_locale'], '$1.00')
         eq_(res['payment_required'], True)
 
+    def test_has_price_no_queries(self):
+        self.make_premium(self.app)
+        self.app.save()
+        self.refresh('webapp')
+        self.request.user = AnonymousUser()
+
+        obj = self.get_obj()
+        with self.assertNumQueries(0):
+            res = ESAppSerializer(obj, context={'request': self.request}).data
+        eq_(res['price'], Decimal('1.00'))
+        eq_(res['price_locale'], '$1.00')
+        eq_(res['payment_required'], True)
+
+    def test_has_price_old_index(self):
+        self.make_premium(self.app)
+        self.app.save()
+        self.refresh('webapp')
+
+        # Documents indexed before the price was stored fall back to the db.
+        obj = self.get_obj()
+        obj.to_dict().pop('price')
+        res = ESAppSerializer(obj, context={'request': self.request}).data
+        eq_(res['price'], Decimal('1.00'))
+        eq_(res['price_locale'], '$1.00')
+
     def test_not_paid(self):
         self.make_premium(self.app)
         PriceCurrency.objects.update(paid=False)
@@ -698,3 +729,166 @@ class TestSimpleESAppSerializer(mkt.site.tests.ESTestCase):
 
     def test_categories_present(self):
         ok_('categories' in self.serializer.data)
+
+
+class TestCompiledESAppSerializer(mkt.site.tests.ESTestCase):
+    fixtures = fixture('user_2519', 'webapp_337141')
+
+    def setUp(self):
+        self.profile = UserProfile.objects.get(pk=2519)
+        self.request = RequestFactory().get('/')
+        self.request.REGION = mkt.regions.USA
+        self.request.user = AnonymousUser()
+        self.app = Webapp.objects.get(pk=337141)
+        self.app.update(categories=['books', 'social'])
+        Preview.objects.all().delete()
+        Preview.objects.create(filetype='image/png', addon=self.app,
+                               position=0)
+        Preview.objects.create(filetype='video/webm', addon=self.app,
+                               position=1)
+        self.app.description = {
+            'en-US': u'XSS attempt <script>alert(1)</script>',
+            'fr': u'Déscriptîon in frènch'
+        }
+        self.app.save()
+        self.refresh('webapp')
+
+    def get_obj(self):
+        return WebappIndexer.search().filter(
+            'term', id=self.app.pk).execute().hits[0]
+
+    def check(self, serializer_class=ESAppSerializer, **data):
+        fast_obj, slow_obj = self.get_obj(), self.get_obj()
+        fast_obj.to_dict().update(data)
+        slow_obj.to_dict().update(data)
+        fast = serializer_class(fast_obj, context={'request': self.request})
+        slow = serializer_class(slow_obj, context={'request': self.request})
+        slow.fast_path = False
+
+        eq_(fast.data, slow.data)
+        eq_(SuccinctJSONRenderer().render(fast.data),
+            SuccinctJSONRenderer().render(slow.data))
+        ok_(fast._compiled)
+        eq_(slow._compiled, None)
+        return fast.data
+
+    def check_all(self, **data):
+        for serializer_class in (ESAppSerializer, SimpleESAppSerializer,
+                                 ESAppFeedSerializer):
+            self.check(serializer_class, **data)
+
+    def test_free(self):
+        self.check_all()
+
+    def test_user(self):
+        self.request.user = self.profile
+        self.app.addonuser_set.create(user=self.profile)
+        self.profile.installed_set.create(addon=self.app)
+        self.app.save()
+        self.refresh('webapp')
+        eq_(self.check()['user'],
+            {'developed': True, 'installed': True, 'purchased': False})
+
+    def test_lang(self):
+        self.request = RequestFactory().get('/?lang=es')
+        self.request.REGION = mkt.regions.USA
+        self.request.user = AnonymousUser()
+        self.check_all()
+        self.check_all(default_locale='fr')
+
+    def test_premium(self):
+        self.make_premium(self.app)
+        self.app.save()
+        self.refresh('webapp')
+        eq_(self.check()['price'], Decimal('1.00'))
+        self.check_all()
+
+        self.request.REGION = mkt.regions.BRA
+        self.check_all()
+        self.check_all(region_exclusions=[RESTOFWORLD.id])
+
+    def test_packaged(self):
+        self.check_all(app_type=mkt.ADDON_WEBAPP_PACKAGED,
+                       package_path='/path/to/package.zip', file_size=123)
+        self.check_all(app_type=mkt.ADDON_WEBAPP_PRIVILEGED,
+                       package_path='/path/to/package.zip', file_size=123)
+
+    def test_region_exclusions(self):
+        self.check_all(region_exclusions=[mkt.regions.USA.id,
+                                          mkt.regions.BRA.id])
+
+    def test_no_previews(self):
+        self.check_all(previews=[])
+
+    def test_slow_path(self):
+        data = self.get_obj().to_dict()
+        data['status'] = mkt.STATUS_DELETED
+        serializer = ESAppSerializer(context={'request': self.request})
+        compiled = CompiledESAppSerializer.compile(serializer)
+        with self.assertRaises(CompiledESAppSerializer.SlowPath):
+            compiled.to_native(data)
+
+    def test_unknown_override(self):
+        class VersionlessESAppSerializer(ESAppSerializer):
+            def get_versions(self, obj):
+                return {}
+
+        serializer = VersionlessESAppSerializer(
+            self.get_obj(), context={'request': self.request})
+        eq_(serializer.data['versions'], {})
+        eq_(serializer._compiled, False)
+
+
+class TestESAppSerializerSourceFields(mkt.site.tests.ESTestCase):
+    fixtures = fixture('webapp_337141')
+
+    def setUp(self):
+        self.request = RequestFactory().get('/')
+        self.request.REGION = mkt.regions.USA
+        self.request.user = AnonymousUser()
+        self.app = Webapp.objects.get(pk=337141)
+        self.refresh('webapp')
+
+    def get_obj(self, serializer_class=None):
+        search = WebappIndexer.search().filter('term', id=self.app.pk)
+        if serializer_class:
+            search = source_fields(search, serializer_class)
+        return search.execute().hits[0]
+
+    def test_get_source_fields(self):
+        eq_(ESAppFeedCollectionSerializer.get_source_fields(),
+            sorted(ESAppSerializer.base_source_fields))
+        fields = SuggestionsESAppSerializer.get_source_fields()
+        ok_('description_translations' in fields)
+        ok_('name_translations' in fields)
+        for key in ('features', 'name_suggest', 'previews', 'versions'):
+            ok_(key not in fields)
+
+    def test_get_source_fields_unknown_field(self):
+        class ExtraESAppSerializer(SimpleESAppSerializer):
+            extra = serializers.SerializerMethodField('get_extra')
+
+            class Meta(SimpleESAppSerializer.Meta):
+                fields = ['id', 'extra']
+
+            def get_extra(self, obj):
+                return obj.es_data.get('extra')
+
+        eq_(ExtraESAppSerializer.get_source_fields(), None)
+
+    def test_projected(self):
+        for serializer_class in (ESAppSerializer, SimpleESAppSerializer,
+                                 ESAppFeedSerializer,
+                                 ESAppFeedCollectionSerializer,
+                                 SuggestionsESAppSerializer):
+            full = serializer_class(self.get_obj(),
+                                    context={'request': self.request})
+            projected = serializer_class(self.get_obj(serializer_class),
+                                         context={'request': self.request})
+            eq_(projected.data, full.data)
+
+            # The regular serializer copes with the projected hits as well.
+            projected = serializer_class(self.get_obj(serializer_class),
+                                         context={'request': self.request})
+            projected.fast_path = False
+            eq_(projected.data, full.data)
@@ -23,7 +23,8 @@ from mkt.files.models import FileUpload
 from mkt.regions import get_region
 from mkt.submit.views import PreviewViewSet
 from mkt.tags.models import Tag
-from mkt.webapps.models import AddonUser, get_excluded_in, Webapp
+from mkt.webapps.models import (AddonUser, get_excluded_in,
+                                preload_translations, Webapp)
 from mkt.webapps.serializers import AppSerializer
 
 
@@ -43,10 +44,11 @@ class AppViewSet(CORSMixin, SlugOrIdMixin, MarketplaceView,
 
     def get_queryset(self):
         return Webapp.objects.all().exclude(
-            id__in=get_excluded_in(get_region().id))
+            id__in=get_excluded_in(get_region().id)).transform(
+                preload_translations)
 
     def get_base_queryset(self):
-        return Webapp.objects.all()
+        return Webapp.objects.all().transform(preload_translations)
 
     def get_object(self, queryset=None):
         try:
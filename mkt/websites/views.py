@@ -69,6 +69,7 @@ class ReviewersWebsiteSearchView(WebsiteSearchView):
                        SortingFilter]
     serializer_class = ReviewerESWebsiteSerializer
     form_class = ReviewersWebsiteSearchForm
+    cursor_pagination = True
 
 
 class WebsiteMetadataScraperView(CORSMixin, MarketplaceView, APIView):
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""
+Benchmarks serializing ES app hits with the regular ESAppSerializer, which
+builds fake Webapp, Version, Preview, etc. instances for every hit, against
+the compiled fast path (CompiledESAppSerializer).
+
+Run from the root of zamboni: python scripts/bench_es_app_serializer.py
+"""
+import optparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mkt.settings')
+
+
+def make_hit(pk):
+    """A fake ES app document, like WebappIndexer.extract_document() does."""
+    import mkt
+
+    def translations(s):
+        return [{'lang': 'en-US', 'string': s},
+                {'lang': 'fr', 'string': u'%s en fran\xe7ais' % s}]
+
+    return {
+        'id': pk,
+        'app_slug': 'app-%s' % pk,
+        'app_type': mkt.ADDON_WEBAPP_HOSTED,
+        'author': 'Mozilla',
+        'category': ['games', 'social'],
+        'content_descriptors': ['has_generic_violence'],
+        'content_ratings': {'generic': {'body': 1, 'rating': 5}},
+        'created': '2014-01-01T00:00:00',
+        'current_version': '1.0',
+        'default_locale': 'en-US',
+        'description_translations': translations('Description'),
+        'device': [mkt.DEVICE_GAIA.id],
+        'file_size': None,
+        'has_public_stats': False,
+        'homepage_translations': translations('http://example.com'),
+        'icon_hash': 'abcdef',
+        'interactive_elements': ['has_shares_info'],
+        'is_disabled': False,
+        'is_offline': False,
+        'last_updated': '2014-01-02T00:00:00',
+        'manifest_url': 'http://example.com/manifest.webapp',
+        'modified': '2014-01-03T00:00:00',
+        'name_translations': translations('App %s' % pk),
+        'package_path': None,
+        'payment_account': None,
+        'premium_type': mkt.ADDON_FREE,
+        'previews': [{'id': pk * 10 + i, 'filetype': 'image/png',
+                      'modified': '2014-01-03T00:00:00'} for i in range(3)],
+        'price': None,
+        'ratings': {'average': 4.5, 'count': 42},
+        'region_exclusions': [],
+        'reviewed': '2014-01-02T00:00:00',
+        'status': mkt.STATUS_PUBLIC,
+        'support_email_translations': translations('support@example.com'),
+        'support_url_translations': translations('http://example.com/help'),
+        'supported_locales': 'en-US,fr',
+        'tags': ['tag'],
+        'upsell': False,
+        'versions': [{'version': '1.0',
+                      'resource_uri': '/api/v2/apps/versions/%s/' % pk}],
+    }
+
+
+def timed(label, number, func):
+    start = time.time()
+    func()
+    total = time.time() - start
+    print '%-40s %8.2fms total %8.3fms per hit' % (
+        label, total * 1000, total * 1000 / number)
+
+
+def main():
+    p = optparse.OptionParser(usage='%prog\n\n' + __doc__)
+    p.add_option('--number', help='Hits to serialize. Default: %default',
+                 default=1000, type=int)
+    (options, args) = p.parse_args()
+
+    import django
+    django.setup()
+
+    from django.contrib.auth.models import AnonymousUser
+    from django.test.client import RequestFactory
+
+    import mkt
+    from mkt.api.patch import patch
+    from mkt.webapps.serializers import (ESAppFeedSerializer,
+                                         ESAppSerializer,
+                                         SimpleESAppSerializer)
+    patch()
+
+    request = RequestFactory().get('/')
+    request.REGION = mkt.regions.USA
+    request.user = AnonymousUser()
+
+    hits = [make_hit(pk) for pk in xrange(1, options.number + 1)]
+
+    def serialize(serializer_class, fast_path):
+        def run():
+            # Like a search view: one serializer for all the hits.
+            serializer = serializer_class(hits, many=True,
+                                          context={'request': request})
+            serializer.fast_path = fast_path
+            serializer.data
+        return run
+
+    print 'Serializing %s hits' % options.number
+    for serializer_class in (ESAppSerializer, SimpleESAppSerializer,
+                             ESAppFeedSerializer):
+        for fast_path in (False, True):
+            timed('%s%s' % (serializer_class.__name__,
+                            ' (compiled)' if fast_path else ''),
+                  options.number, serialize(serializer_class, fast_path))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""
+Benchmarks the size and JSON decoding time of a page of ES app hits when
+fetching whole documents against fetching only the source fields the
+serializer reads (see BaseESSerializer.get_source_fields()).
+
+Run from the root of zamboni: python scripts/bench_es_source_fields.py
+"""
+import json
+import optparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mkt.settings')
+
+from bench_es_app_serializer import make_hit  # noqa
+
+
+def make_document(pk):
+    """
+    A fake ES app document with the keys make_hit() leaves out because no
+    serializer reads them.
+    """
+    doc = make_hit(pk)
+    doc.update({
+        'banner_message_translations': [],
+        'banner_regions': [],
+        'guid': '{%s-aaaa-bbbb-cccc}' % pk,
+        'installs_allowed_from': ['*'],
+        'is_escalated': False,
+        'is_priority': False,
+        'is_rereviewed': False,
+        'latest_version': {'status': 4, 'is_privileged': False,
+                           'has_editor_comment': False,
+                           'has_info_request': False,
+                           'nomination_date': '2014-01-01T00:00:00'},
+        'name_suggest': {'input': ['App %s' % pk, 'App'],
+                         'output': pk, 'weight': 42,
+                         'payload': {'default_locale': 'en-US',
+                                     'icon_hash': 'abcdef', 'id': pk,
+                                     'manifest_url': doc['manifest_url'],
+                                     'modified': doc['modified'],
+                                     'name_translations':
+                                         doc['name_translations'],
+                                     'slug': doc['app_slug']}},
+        'release_notes_translations': [
+            {'lang': 'en-US', 'string': 'Fixed bugs. ' * 20}],
+    })
+    return doc
+
+
+def project(doc, fields):
+    """Same as ES applying a `_source` include list to top-level keys."""
+    if fields is None:
+        return doc
+    return dict((k, v) for k, v in doc.items() if k in fields)
+
+
+def timed(label, func, number):
+    start = time.time()
+    for x in xrange(number):
+        size = func()
+    total = (time.time() - start) * 1000 / number
+    print '%-40s %8d bytes %8.2fms' % (label, size, total)
+
+
+def main():
+    p = optparse.OptionParser(usage='%prog\n\n' + __doc__)
+    p.add_option('--hits', help='Hits in a page. Default: %default',
+                 default=25, type=int)
+    p.add_option('--number', help='Times to decode each page. '
+                 'Default: %default', default=200, type=int)
+    (options, args) = p.parse_args()
+
+    import django
+    django.setup()
+
+    from mkt.lookup.serializers import AppLookupSerializer
+    from mkt.reviewers.serializers import ReviewersESAppSerializer
+    from mkt.webapps.serializers import (ESAppFeedCollectionSerializer,
+                                         ESAppFeedSerializer, ESAppSerializer,
+                                         SimpleESAppSerializer,
+                                         SuggestionsESAppSerializer)
+
+    docs = [make_document(pk) for pk in xrange(1, options.hits + 1)]
+
+    def decode(fields):
+        body = json.dumps({'hits': {'hits': [
+            {'_id': doc['id'], '_source': project(doc, fields)}
+            for doc in docs]}})
+
+        def run():
+            json.loads(body)
+            return len(body)
+        return run
+
+    print 'Decoding pages of %s hits' % options.hits
+    timed('whole documents', decode(None), options.number)
+    for serializer_class in (ESAppSerializer, SimpleESAppSerializer,
+                             ESAppFeedSerializer,
+                             ESAppFeedCollectionSerializer,
+                             SuggestionsESAppSerializer, AppLookupSerializer,
+                             ReviewersESAppSerializer):
+        timed(serializer_class.__name__,
+              decode(serializer_class.get_source_fields()), options.number)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+"""
+Benchmarks comparing two versions of a synthetic packaged app in the file
+viewer.
+
+Compares listing the changes by building and comparing the full file listings
+of both versions (how DiffHelper used to work) with DiffHelper's fingerprints,
+and reading a changed file with and without the contents cache.
+
+Run from the root of zamboni: python scripts/bench_file_diff.py
+"""
+import optparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mkt.settings')
+
+
+class FakeVersion(object):
+    addon = None
+    version = '1.0'
+
+
+class FakeFile(object):
+    """Just enough of a File for the FileViewer."""
+    status = None
+
+    def __init__(self, pk, file_path):
+        self.id = pk
+        self.file_path = file_path
+        self.version = FakeVersion()
+
+
+def make_package(path, entries, changed=0, added=0, deleted=0):
+    """
+    Writes a zip of `entries` files spread over directories, changing,
+    adding and deleting some of them.
+    """
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zip_:
+        zip_.writestr('manifest.webapp', '{"name": "Bench"}')
+        for x in xrange(deleted, entries + added):
+            contents = 'var x = %s;\n' % x * 50
+            if x < deleted + changed:
+                contents += '// changed\n'
+            zip_.writestr('js/%s/file-%s.js' % (x % 100, x), contents)
+
+
+def timed(label, func, number=1):
+    start = time.time()
+    for x in xrange(number):
+        func()
+    total = (time.time() - start) * 1000 / number
+    print '%-40s %8.2fms' % (label, total)
+
+
+def main():
+    p = optparse.OptionParser(usage='%prog\n\n' + __doc__)
+    p.add_option('--entries', help='Files in the package. Default: %default',
+                 default=5000, type=int)
+    p.add_option('--changed', help='Files changed, added and deleted '
+                 'between the versions. Default: %default',
+                 default=20, type=int)
+    p.add_option('--number', help='Times to run each benchmark. '
+                 'Default: %default', default=5, type=int)
+    (options, args) = p.parse_args()
+
+    import django
+    django.setup()
+
+    from django.core.cache import cache
+
+    from mkt.files.helpers import DiffHelper
+
+    tmp = tempfile.mkdtemp()
+    left, right = os.path.join(tmp, 'left.zip'), os.path.join(tmp, 'right.zip')
+    make_package(right, options.entries)
+    make_package(left, options.entries, changed=options.changed,
+                 added=options.changed, deleted=options.changed)
+
+    def helper():
+        return DiffHelper(FakeFile(1, left), FakeFile(2, right))
+
+    def full_listings():
+        diff = helper()
+        left_files, right_files = diff.left.get_files(), diff.right.get_files()
+        for key, file in left_files.items():
+            file['url'] = diff.get_url(file['short'])
+            file['diff'] = (file['hash'] !=
+                            right_files.get(key, {}).get('hash'))
+        [key for key in right_files if key not in left_files]
+
+    def fingerprints():
+        diff = helper()
+        diff.get_files()
+        diff.get_deleted_files()
+
+    def changes():
+        helper().get_changes()
+
+    key = 'js/%s/file-%s.js' % (options.changed % 100, options.changed)
+
+    def read_file(cached):
+        def run():
+            diff = helper()
+            diff.select(key)
+            if not cached:
+                cache.delete(diff._contents_cache_key())
+            diff.read_file()
+        return run
+
+    print ('Comparing two packages of %s files, %s changed, added and '
+           'deleted' % (options.entries, options.changed))
+    try:
+        timed('index both packages', helper().extract)
+        timed('compare full listings', full_listings, options.number)
+        timed('compare fingerprints (with listing)', fingerprints,
+              options.number)
+        timed('compare fingerprints (changes only)', changes, options.number)
+        timed('read a changed file', read_file(False), options.number)
+        timed('read a changed file (cached)', read_file(True),
+              options.number)
+    finally:
+        helper().cleanup()
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    main()
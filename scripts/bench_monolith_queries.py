@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+"""
+Benchmarks the Monolith queries made to compute installs and trending
+(mkt.webapps.cron) against a local fake Monolith client.
+
+For each number of apps, compares one query per app (_get_installs() and
+_get_trending()) with one query per chunk of apps (_get_installs_for_apps()
+and _get_trending_for_apps(), as used by update_app_installs and
+update_app_trending), printing the number of requests and the time taken.
+
+Run from the root of zamboni: python scripts/bench_monolith_queries.py
+"""
+import optparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mkt.settings')
+
+# Same as update_app_installs and update_app_trending.
+CHUNK_SIZE = 100
+AGGREGATIONS = ('popular', 'week1', 'week3')
+REGIONS = ('br', 'es', 'us', 'pl')
+
+
+class FakeMonolithClient(object):
+    """
+    Answers per-app and per-chunk queries with random installs, counting the
+    requests and waiting `latency` seconds for each of them.
+    """
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.requests = 0
+
+    def _bucket(self, key, regions=True):
+        bucket = dict((name, {'total_installs': {
+            'value': float(random.randint(0, 1000))}})
+            for name in AGGREGATIONS)
+        bucket['key'] = key
+        if regions:
+            bucket['region'] = {'buckets': [self._bucket(region, False)
+                                            for region in REGIONS]}
+        return bucket
+
+    def raw(self, query):
+        self.requests += 1
+        time.sleep(self.latency)
+        filter_ = query['query']['filtered']['filter']
+        if 'terms' in filter_:
+            return {'aggregations': {'app': {'buckets': [
+                self._bucket(app_id)
+                for app_id in filter_['terms']['app-id']]}}}
+        return {'aggregations': self._bucket(filter_['term']['app-id'])}
+
+
+def main():
+    p = optparse.OptionParser(usage='%prog\n\n' + __doc__)
+    p.add_option('--apps', help='Comma-separated numbers of apps. '
+                 'Default: %default', default='100,1000,5000')
+    p.add_option('--latency', help='Seconds Monolith takes to answer each '
+                 'request. Default: %default', default=0.001, type=float)
+    (options, args) = p.parse_args()
+
+    import django
+    django.setup()
+
+    from mkt.webapps import cron
+
+    def per_app(get_scores, app_ids):
+        for app_id in app_ids:
+            get_scores(app_id)
+
+    def per_chunk(get_scores, app_ids):
+        for i in xrange(0, len(app_ids), CHUNK_SIZE):
+            get_scores(app_ids[i:i + CHUNK_SIZE])
+
+    print '%-10s %-30s %10s %10s' % ('apps', 'path', 'requests', 'time')
+    for number in [int(n) for n in options.apps.split(',')]:
+        app_ids = range(1, number + 1)
+        for label, run, get_scores in (
+                ('installs, per app', per_app, cron._get_installs),
+                ('installs, per chunk', per_chunk,
+                 cron._get_installs_for_apps),
+                ('trending, per app', per_app, cron._get_trending),
+                ('trending, per chunk', per_chunk,
+                 cron._get_trending_for_apps)):
+            client = FakeMonolithClient(options.latency)
+            cron.get_monolith_client = lambda: client
+            start = time.time()
+            run(get_scores, app_ids)
+            print '%-10s %-30s %10d %9.2fs' % (
+                number, label, client.requests, time.time() - start)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""
+Benchmarks signing receipts against a local stub signing server.
+
+Compares posting every receipt on a fresh connection (how receipts used to be
+signed) with lib.crypto.receipt.sign over the pooled session, and with
+lib.crypto.receipt.sign_many for the whole batch.
+
+Run from the root of zamboni: python scripts/bench_receipt_signing.py
+"""
+import json
+import multiprocessing
+import optparse
+import os
+import sys
+import time
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class StubSigningHandler(BaseHTTPRequestHandler):
+    """Pretends to sign receipts, keeping connections alive like nginx."""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    latency = 0
+
+    def do_POST(self):
+        data = self.rfile.read(int(self.headers['Content-Length']))
+        time.sleep(self.latency)
+        body = json.dumps({'receipt': 'signed~%s' % len(data)})
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubSigningServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def timed(label, number, func):
+    start = time.time()
+    func()
+    total = time.time() - start
+    print '%-28s %8.2fms total %8.3fms per receipt' % (
+        label, total * 1000, total * 1000 / number)
+
+
+def main():
+    p = optparse.OptionParser(usage='%prog\n\n' + __doc__)
+    p.add_option('--number', help='Receipts to sign. Default: %default',
+                 default=500, type=int)
+    p.add_option('--latency', help='Seconds the stub server takes to sign '
+                 'each receipt. Default: %default', default=0.01, type=float)
+    p.add_option('--pool-size', help='Signing connection pool size. '
+                 'Default: %default', default=10, type=int)
+    (options, args) = p.parse_args()
+
+    StubSigningHandler.latency = options.latency
+    httpd = StubSigningServer(('127.0.0.1', 0), StubSigningHandler)
+    # Serve from another process so the stub doesn't compete with the
+    # client for the GIL.
+    server = multiprocessing.Process(target=httpd.serve_forever)
+    server.start()
+    httpd.socket.close()
+    destination = 'http://127.0.0.1:%s' % httpd.server_address[1]
+
+    from django.conf import settings
+    settings.configure(SIGNING_SERVER=destination,
+                       SIGNING_SERVER_TIMEOUT=10,
+                       SIGNING_SERVER_POOL_SIZE=options.pool_size,
+                       SIGNING_SERVER_RETRIES=0,
+                       SIGNING_SERVER_RETRY_BACKOFF=0,
+                       STATSD_CLIENT='django_statsd.clients.null')
+
+    import requests
+    from lib.crypto import receipt
+
+    receipts = [{'typ': 'purchase-receipt', 'user': {'value': str(x)}}
+                for x in xrange(options.number)]
+
+    def fresh_connections():
+        for data in receipts:
+            requests.post(destination + '/1.0/sign', data=json.dumps(data),
+                          headers={'Content-Type': 'application/json'})
+
+    def pooled():
+        for data in receipts:
+            receipt.sign(data)
+
+    def batch():
+        receipt.sign_many(receipts)
+
+    print 'Signing %s receipts, stub latency %sms, pool size %s' % (
+        options.number, options.latency * 1000, options.pool_size)
+    timed('new connection per receipt', options.number, fresh_connections)
+    timed('pooled sign', options.number, pooled)
+    timed('pooled sign_many', options.number, batch)
+    receipt.reset_session()
+    server.terminate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+"""
+Benchmarks answering Rocketbar requests from the in-process prefix index
+(mkt.search.suggest) against the ES completion suggester.
+
+By default the prefix index is built from synthetic apps. With --es, it is
+built from the apps index of the configured ES, and the same queries are
+also sent to the ES completion suggester.
+
+Run from the root of zamboni: python scripts/bench_rocketbar.py
+"""
+import optparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mkt.settings')
+
+SYLLABLES = ('an', 'bo', 'ca', 'di', 'el', 'fo', 'gu', 'ha', 'ir', 'jo',
+             'ka', 'li', 'mo', 'nu', 'or', 'pa', 're', 'si', 'to', 'ux',
+             'va', 'we', 'xi', 'yo', 'za')
+
+
+def make_word():
+    return ''.join(random.choice(SYLLABLES)
+                   for x in xrange(random.randint(2, 4)))
+
+
+def make_name_suggest(pk):
+    """A fake `name_suggest` value, like WebappIndexer.extract_document()."""
+    name = u' '.join(make_word().title()
+                     for x in xrange(random.randint(1, 3)))
+    return {
+        'input': [name, u'%s %s' % (name, pk)],
+        'output': unicode(pk),
+        'weight': random.randint(1, 20),
+        'payload': {'id': pk, 'slug': 'app-%s' % pk},
+    }
+
+
+def percentiles(label, timings):
+    timings = sorted(timings)
+    print '%-30s p50 %9.1fus  p99 %9.1fus  max %9.1fus' % (
+        label, timings[len(timings) / 2] * 1e6,
+        timings[int(len(timings) * 0.99)] * 1e6, timings[-1] * 1e6)
+
+
+def timed(func, queries):
+    timings = []
+    for q in queries:
+        start = time.time()
+        func(q)
+        timings.append(time.time() - start)
+    return timings
+
+
+def main():
+    p = optparse.OptionParser(usage='%prog\n\n' + __doc__)
+    p.add_option('--apps', help='Synthetic apps to index. Default: %default',
+                 default=20000, type=int)
+    p.add_option('--queries', help='Queries to run. Default: %default',
+                 default=5000, type=int)
+    p.add_option('--limit', help='Suggestions per query. Default: %default',
+                 default=5, type=int)
+    p.add_option('--es', help='Use the apps indexed in ES and compare with '
+                 'the ES completion suggester', action='store_true')
+    (options, args) = p.parse_args()
+
+    import django
+    django.setup()
+
+    from mkt.search.suggest import PrefixIndex, RocketbarIndex
+    from mkt.webapps.indexers import WebappIndexer
+
+    start = time.time()
+    if options.es:
+        rocketbar_index = RocketbarIndex()
+        rocketbar_index.rebuild()
+        index = rocketbar_index.index
+    else:
+        index = PrefixIndex()
+        for pk in xrange(1, options.apps + 1):
+            index.update(pk, make_name_suggest(pk))
+    print 'Indexed %s apps in %.2fs' % (len(index), time.time() - start)
+    if not len(index):
+        return
+
+    # Like someone typing: prefixes of 1 to 10 characters of app names.
+    keys = [key for key, pk in index.keys]
+    queries = []
+    for x in xrange(options.queries):
+        key = random.choice(keys)
+        queries.append(key[:random.randint(1, min(len(key), 10))])
+
+    def prefix_index(q):
+        index.memo = {}
+        index.suggest(q, options.limit)
+
+    percentiles('prefix index', timed(prefix_index, queries))
+    percentiles('prefix index (memoized)',
+                timed(lambda q: index.suggest(q, options.limit), queries))
+
+    if options.es:
+        es = WebappIndexer.get_es()
+
+        def completion(q):
+            es.suggest(index=WebappIndexer.get_index(), body={
+                'apps': {'completion': {'field': 'name_suggest',
+                                        'size': options.limit},
+                         'text': q}})
+
+        percentiles('ES completion suggester', timed(completion, queries))
+
+
+if __name__ == '__main__':
+    main()
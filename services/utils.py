@@ -1,6 +1,9 @@
 import logging
 import logging.config
 import os
+import threading
+import time
+from collections import OrderedDict
 
 
 # get the right settings module
@@ -22,7 +25,7 @@ settings = importlib.import_module(settingmodule)
 
 from mkt.constants.payments import (  # noqa
     CONTRIB_CHARGEBACK, CONTRIB_NO_CHARGE,
-    CONTRIB_PURCHASE, CONTRIB_REFUND)
+    CONTRIB_PURCHASE, CONTRIB_REFUND, REFUNDS_COUNTER_CACHE_KEY)
 
 from lib.log_settings_base import formatters, handlers  # noqa
 
@@ -66,3 +69,41 @@ def log_exception(data):
 def log_info(msg):
     error_log = logging.getLogger('z.receipt')
     error_log.info(msg)
+
+
+class ExpiringLRUCache(object):
+    """
+    A small in-process LRU cache, whose entries also expire after `timeout`
+    seconds.
+    """
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                value, expires = self.data.pop(key)
+            except KeyError:
+                return default
+            if expires < time.time():
+                return default
+            # Put it back as the most recently used.
+            self.data[key] = (value, expires)
+            return value
+
+    def set(self, key, value, timeout=None):
+        if timeout is None:
+            timeout = self.timeout
+        with self.lock:
+            self.data.pop(key, None)
+            self.data[key] = (value, time.time() + timeout)
+            while len(self.data) > self.size:
+                self.data.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
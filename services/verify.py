@@ -1,4 +1,5 @@
 import calendar
+import hashlib
 import json
 from datetime import datetime
 import sys
@@ -8,6 +9,7 @@ from wsgiref.handlers import format_date_time
 
 import jwt
 from browserid.errors import ExpiredSignatureError
+from django.core.cache import cache
 from django_statsd.clients import statsd
 from receipts import certs
 
@@ -18,8 +20,8 @@ from lib.utils import static_url
 from services.utils import settings
 
 from utils import (CONTRIB_CHARGEBACK, CONTRIB_NO_CHARGE, CONTRIB_PURCHASE,
-                   CONTRIB_REFUND, log_configure, log_exception, log_info,
-                   mypool)
+                   CONTRIB_REFUND, ExpiringLRUCache, log_configure,
+                   log_exception, log_info, mypool, REFUNDS_COUNTER_CACHE_KEY)
 
 # Go configure the log.
 log_configure()
@@ -30,10 +32,28 @@ import receipts  # noqa
 status_codes = {
     200: '200 OK',
     204: '204 OK',
+    400: '400 Bad Request',
     405: '405 Method Not Allowed',
     500: '500 Internal Server Error',
 }
 
+# Receipts can be verified in batches by posting a JSON list of receipts to
+# their verify URL with this suffix.
+BATCH_SUFFIX = 'batch/'
+# The maximum number of receipts that can be verified in one batch.
+BATCH_MAX_RECEIPTS = 100
+
+# The certificate chains we verified. A handful of them sign all the receipts.
+cert_chain_cache = ExpiringLRUCache(size=100, timeout=60 * 60)
+# The results of Verify.check_full, by receipt and verify path. The timeout is
+# settings.WEBAPPS_RECEIPT_RESULT_CACHE_TIMEOUT.
+result_cache = ExpiringLRUCache(size=10000, timeout=0)
+# The messages logged to CEF for the results served from result_cache.
+CACHED_RESULT_CEF_MESSAGES = {
+    'invalid': 'Invalid receipt',
+    'refunded': 'Refunded receipt',
+}
+
 
 class VerificationError(Exception):
     pass
@@ -60,16 +80,53 @@ class Verify:
         # This is so the unit tests can override the connection.
         self.conn, self.cursor = None, None
 
+        # Set by BatchVerify, which fetches the purchases of all the receipts
+        # at once.
+        self.prefetched, self.purchase = False, None
+
     def check_full(self):
         """
         This is the default that verify will use, this will
         do the entire stack of checks.
-        """
-        receipt_domain = urlparse(static_url('WEBAPPS_RECEIPT_URL')).netloc
+
+        The results are cached for a short while, unless a refund or a
+        chargeback is recorded in the meantime.
+        """
+        timeout = settings.WEBAPPS_RECEIPT_RESULT_CACHE_TIMEOUT
+        if not timeout:
+            return self._check_full()
+
+        key = hashlib.sha1('%s:%s' % (self.environ['PATH_INFO'],
+                                      self.receipt)).hexdigest()
+        generation = get_refunds_generation()
+        cached = result_cache.get(key)
+        if cached and cached[0] == generation:
+            statsd.incr('services.verify.cache.hit')
+            generation, app_id, result = cached
+            if result['status'] in CACHED_RESULT_CEF_MESSAGES:
+                receipt_cef.log(self.environ, app_id, 'verify',
+                                CACHED_RESULT_CEF_MESSAGES[result['status']])
+            return dict(result)
+
+        statsd.incr('services.verify.cache.miss')
+        result = self._check_full()
+        if result['status'] == 'ok':
+            # Don't serve an ok result past the expiry of the receipt.
+            timeout = min(timeout, int(self.decoded.get('exp', 0)) -
+                          calendar.timegm(gmtime()) - 10)
+        elif result['status'] == 'expired':
+            # Expired receipts might get a new receipt every time.
+            timeout = 0
+        if timeout > 0:
+            result_cache.set(key, (generation,
+                                   self.get_app_id(raise_exception=False),
+                                   dict(result)),
+                             timeout)
+        return result
+
+    def _check_full(self):
         try:
-            self.decoded = self.decode()
-            self.check_type('purchase-receipt')
-            self.check_url(receipt_domain)
+            self.check_receipt()
             self.check_purchase()
         except InvalidReceipt, err:
             return self.invalid(str(err))
@@ -78,6 +135,16 @@ class Verify:
 
         return self.ok_or_expired()
 
+    def check_receipt(self):
+        """
+        Verifies that the receipt can be decoded and is a purchase receipt
+        for this verifier.
+        """
+        receipt_domain = urlparse(static_url('WEBAPPS_RECEIPT_URL')).netloc
+        self.decoded = self.decode()
+        self.check_type('purchase-receipt')
+        self.check_url(receipt_domain)
+
     def check_without_purchase(self):
         """
         This is what the developer and reviewer receipts do, we aren't
@@ -240,15 +307,7 @@ class Verify:
         """
         Verifies that the inapp has been purchased.
         """
-        self.setup_db()
-        sql = """SELECT i.guid, c.type FROM stats_contributions c
-                 JOIN inapp_products i ON i.id=c.inapp_product_id
-                 WHERE c.id = %(contribution_id)s LIMIT 1;"""
-        self.cursor.execute(
-            sql,
-            {'contribution_id': self.get_contribution_id()}
-        )
-        result = self.cursor.fetchone()
+        result = self.get_purchase_inapp()
         if not result:
             log_info('Invalid in-app receipt, no purchase')
             raise InvalidReceipt('NO_PURCHASE')
@@ -257,6 +316,22 @@ class Verify:
         self.check_purchase_type(purchase_type)
         self.check_inapp_product(contribution_inapp_id)
 
+    def get_purchase_inapp(self):
+        """
+        Returns the (inapp guid, contribution type) of the inapp purchase,
+        or None.
+        """
+        if self.prefetched:
+            return self.purchase
+
+        params = {'contribution_id': self.get_contribution_id()}
+        self.setup_db()
+        sql = """SELECT i.guid, c.type FROM stats_contributions c
+                 JOIN inapp_products i ON i.id=c.inapp_product_id
+                 WHERE c.id = %(contribution_id)s LIMIT 1;"""
+        self.cursor.execute(sql, params)
+        return self.cursor.fetchone()
+
     def check_inapp_product(self, contribution_inapp_id):
         if contribution_inapp_id != self.get_inapp_id():
             log_info('Invalid receipt, inapp_id does not match')
@@ -266,19 +341,28 @@ class Verify:
         """
         Verifies that the app has been purchased by the user.
         """
-        self.setup_db()
-        sql = """SELECT type FROM addon_purchase
-                 WHERE addon_id = %(app_id)s
-                 AND uuid = %(uuid)s LIMIT 1;"""
-        self.cursor.execute(sql, {'app_id': self.get_app_id(),
-                                  'uuid': self.get_user()})
-        result = self.cursor.fetchone()
+        result = self.get_purchase_app()
         if not result:
             log_info('Invalid app receipt, no purchase')
             raise InvalidReceipt('NO_PURCHASE')
 
         self.check_purchase_type(result[0])
 
+    def get_purchase_app(self):
+        """
+        Returns the (purchase type,) of the user's app purchase, or None.
+        """
+        if self.prefetched:
+            return self.purchase
+
+        params = {'app_id': self.get_app_id(), 'uuid': self.get_user()}
+        self.setup_db()
+        sql = """SELECT type FROM addon_purchase
+                 WHERE addon_id = %(app_id)s
+                 AND uuid = %(uuid)s LIMIT 1;"""
+        self.cursor.execute(sql, params)
+        return self.cursor.fetchone()
+
     def check_purchase_type(self, purchase_type):
         """
         Verifies that the purchase type is of a valid type.
@@ -356,6 +440,97 @@ class Verify:
         return {'status': 'expired'}
 
 
+class BatchVerify:
+
+    def __init__(self, receipt_list, environ):
+        self.verifiers = [Verify(receipt, environ)
+                          for receipt in receipt_list]
+
+        # This is so the unit tests can override the connection.
+        self.conn, self.cursor = None, None
+
+    def check_full(self):
+        """
+        Does the same checks as Verify.check_full for every receipt, but
+        fetches all their purchases with a single query per table. Returns
+        the list of results, in the order of the receipts.
+        """
+        results = [None] * len(self.verifiers)
+        for i, verifier in enumerate(self.verifiers):
+            try:
+                verifier.check_receipt()
+            except InvalidReceipt, err:
+                results[i] = verifier.invalid(str(err))
+
+        self.prefetch_purchases([verifier for i, verifier
+                                 in enumerate(self.verifiers)
+                                 if results[i] is None])
+
+        for i, verifier in enumerate(self.verifiers):
+            if results[i] is not None:
+                continue
+            try:
+                verifier.check_purchase()
+            except InvalidReceipt, err:
+                results[i] = verifier.invalid(str(err))
+            except RefundedReceipt:
+                results[i] = verifier.refund()
+            else:
+                results[i] = verifier.ok_or_expired()
+        return results
+
+    def setup_db(self):
+        if not self.cursor:
+            self.conn = mypool.connect()
+            self.cursor = self.conn.cursor()
+
+    def prefetch_purchases(self, verifiers):
+        """
+        Fetches the app and inapp purchases of the verifiers, so that
+        checking them doesn't hit the database again.
+        """
+        apps, inapps = {}, {}
+        for verifier in verifiers:
+            try:
+                if 'contrib' in verifier.get_storedata():
+                    key = verifier.get_contribution_id()
+                    inapps.setdefault(key, []).append(verifier)
+                else:
+                    key = (verifier.get_app_id(), verifier.get_user())
+                    apps.setdefault(key, []).append(verifier)
+            except InvalidReceipt:
+                # Verify.check_purchase will report it.
+                continue
+
+        purchases = {}
+        if apps:
+            self.setup_db()
+            app_ids = set(app_id for app_id, uuid in apps)
+            uuids = set(uuid for app_id, uuid in apps)
+            sql = """SELECT addon_id, uuid, type FROM addon_purchase
+                     WHERE addon_id IN ({0}) AND uuid IN ({1});""".format(
+                ', '.join(['%s'] * len(app_ids)),
+                ', '.join(['%s'] * len(uuids)))
+            self.cursor.execute(sql, list(app_ids) + list(uuids))
+            for app_id, uuid, purchase_type in self.cursor.fetchall():
+                purchases.setdefault((app_id, uuid), (purchase_type,))
+
+        if inapps:
+            self.setup_db()
+            sql = """SELECT c.id, i.guid, c.type FROM stats_contributions c
+                     JOIN inapp_products i ON i.id=c.inapp_product_id
+                     WHERE c.id IN ({0});""".format(
+                ', '.join(['%s'] * len(inapps)))
+            self.cursor.execute(sql, list(inapps))
+            for contribution_id, guid, purchase_type in self.cursor.fetchall():
+                purchases[contribution_id] = (guid, purchase_type)
+
+        for key, key_verifiers in apps.items() + inapps.items():
+            for verifier in key_verifiers:
+                verifier.prefetched = True
+                verifier.purchase = purchases.get(key)
+
+
 def get_headers(length):
     return [('Access-Control-Allow-Origin', '*'),
             ('Access-Control-Allow-Methods', 'POST'),
@@ -366,6 +541,44 @@ def get_headers(length):
             ('Last-Modified', format_date_time(time()))]
 
 
+def get_refunds_generation():
+    """
+    Returns the value of the counter bumped whenever a refund or chargeback is
+    recorded. Cached results from another generation are stale.
+    """
+    generation = cache.get(REFUNDS_COUNTER_CACHE_KEY)
+    if generation is None:
+        # Start from a value a cached result can't have been stored with.
+        cache.add(REFUNDS_COUNTER_CACHE_KEY, int(time() * 1000), None)
+        generation = cache.get(REFUNDS_COUNTER_CACHE_KEY)
+    return generation
+
+
+class ReceiptVerifier(certs.ReceiptVerifier):
+    """
+    Caches the certificate chains it verified, so that the same few chains
+    aren't checked (and their root key fetched) for every receipt.
+    """
+
+    def verify_certificate_chain(self, certificates, now=None):
+        if now is None:
+            now = int(time())
+
+        key = hashlib.sha1(repr((
+            sorted(self.valid_issuers),
+            [(cert.signed_data, cert.signature) for cert in certificates]
+        ))).hexdigest()
+        cert = cert_chain_cache.get(key)
+        # The certificates might have expired since we verified them.
+        if cert and all(c.payload['exp'] >= now for c in certificates):
+            return cert
+
+        cert = super(ReceiptVerifier, self).verify_certificate_chain(
+            certificates, now=now)
+        cert_chain_cache.set(key, cert)
+        return cert
+
+
 def decode_receipt(receipt):
     """
     Cracks the receipt using the private key. This will probably change
@@ -373,7 +586,7 @@ def decode_receipt(receipt):
     """
     with statsd.timer('services.decode'):
         if settings.SIGNING_SERVER_ACTIVE:
-            verifier = certs.ReceiptVerifier(
+            verifier = ReceiptVerifier(
                 valid_issuers=settings.SIGNING_VALID_ISSUERS)
             try:
                 result = verifier.verify(receipt)
@@ -421,6 +634,30 @@ def receipt_check(environ):
     return output
 
 
+def batch_receipt_check(environ):
+    with statsd.timer('services.verify_batch'):
+        data = environ['wsgi.input'].read()
+        try:
+            receipt_list = json.loads(data)
+        except ValueError:
+            return 400, ''
+        if (not isinstance(receipt_list, list) or
+                len(receipt_list) > BATCH_MAX_RECEIPTS or
+                not all(isinstance(r, basestring) for r in receipt_list)):
+            return 400, ''
+
+        # The receipts are expected to be verified at the URL without the
+        # batch suffix.
+        environ = dict(environ,
+                       PATH_INFO=environ['PATH_INFO'][:-len(BATCH_SUFFIX)])
+        try:
+            verify = BatchVerify([str(r) for r in receipt_list], environ)
+            return 200, json.dumps(verify.check_full())
+        except:
+            log_exception('<none>')
+            return 500, ''
+
+
 def application(environ, start_response):
     body = ''
     path = environ.get('PATH_INFO', '')
@@ -429,7 +666,9 @@ def application(environ, start_response):
     else:
         # Only allow POST per verifier spec but also OPTIONS for CORS.
         method = environ.get('REQUEST_METHOD')
-        if method == 'POST':
+        if method == 'POST' and path.endswith(BATCH_SUFFIX):
+            status, body = batch_receipt_check(environ)
+        elif method == 'POST':
             status, body = receipt_check(environ)
         elif method == 'OPTIONS':
             status = 204
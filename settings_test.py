@@ -66,10 +66,20 @@ PASSWORD_HASHERS = (
 PAYMENT_PROVIDERS = ['bango', 'reference']
 # This is a precaution in case something isn't mocked right.
 PRE_GENERATE_APK_URL = 'http://you-should-never-load-this.com/'
+# Tests change the queues behind the invalidation signals' back.
+REVIEWER_QUEUE_STATS_CACHE_TIMEOUT = 0
+# Tests expect the review aggregates to be up to date right away.
+REVIEW_AGGREGATES_DELAY = 0
+# Tests see the changes to the apps right away.
+ROCKETBAR_PREFIX_INDEX_REFRESH = 0
 RUN_ES_TESTS = True
+# Cached search results would leak between tests.
+SEARCH_CACHE_TIMEOUT = 0
 SEND_REAL_EMAIL = True
 SITE_URL = 'http://testserver'
 STATIC_URL = SITE_URL + '/'
 TASK_USER_ID = '4043307'
 TEMPLATE_DEBUG = False
 VIDEO_LIBRARIES = ['lib.video.dummy']
+# Cached receipt verification results would leak between tests.
+WEBAPPS_RECEIPT_RESULT_CACHE_TIMEOUT = 0